@@ -0,0 +1,114 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# USPS Publication 28 directional abbreviations
+DIRECTIONALS = {
+    'NORTH': 'N', 'SOUTH': 'S', 'EAST': 'E', 'WEST': 'W',
+    'NORTHEAST': 'NE', 'NORTHWEST': 'NW', 'SOUTHEAST': 'SE', 'SOUTHWEST': 'SW',
+}
+
+# USPS Publication 28 street suffix abbreviations (common forms seen in the
+# SNAP, permit and appraisal files)
+STREET_SUFFIXES = {
+    'ALLEY': 'ALY', 'AVENUE': 'AVE', 'AV': 'AVE', 'BOULEVARD': 'BLVD', 'BLV': 'BLVD',
+    'BYPASS': 'BYP', 'CIRCLE': 'CIR', 'CIRCL': 'CIR', 'COURT': 'CT', 'COVE': 'CV',
+    'CROSSING': 'XING', 'DRIVE': 'DR', 'DRV': 'DR', 'EXPRESSWAY': 'EXPY', 'EXPRESS': 'EXPY',
+    'EXPWY': 'EXPY', 'FREEWAY': 'FWY', 'FRWY': 'FWY', 'HIGHWAY': 'HWY', 'HIWAY': 'HWY',
+    'LANE': 'LN', 'LOOP': 'LOOP', 'PARKWAY': 'PKWY', 'PKY': 'PKWY', 'PLACE': 'PL',
+    'PLAZA': 'PLZ', 'POINT': 'PT', 'ROAD': 'RD', 'SQUARE': 'SQ', 'STREET': 'ST',
+    'STR': 'ST', 'TERRACE': 'TER', 'TRAIL': 'TRL', 'TRL': 'TRL', 'TURNPIKE': 'TPKE',
+    'WAY': 'WAY',
+}
+
+ABBREVIATIONS = {**DIRECTIONALS, **STREET_SUFFIXES}
+
+# Unit designators; the designator and everything after it is dropped, as long as
+# at least two tokens precede it (so '1 SUITE CT' is left alone)
+UNIT_DESIGNATORS = [
+    'APT', 'APARTMENT', 'BLDG', 'BUILDING', 'DEPT', 'FL', 'FLOOR', 'RM', 'ROOM',
+    'SPC', 'SPACE', 'STE', 'SUITE', 'UNIT'
+]
+
+_PUNCTUATION = str.maketrans({char: ' ' for char in ".,;:'\"()"})
+_UNIT = re.compile(r'(\S\s+\S+)\s*(?:#|\b(?:' + '|'.join(UNIT_DESIGNATORS) + r')\b).*$')
+_ABBREVIATION = re.compile(r'\b(' + '|'.join(ABBREVIATIONS) + r')\b')
+
+
+def _normalize_unique(values, steps):
+    """
+    Applies the normalization steps to each distinct value once and maps the
+    results back onto the full column. Each step works on a Series of
+    distinct uppercased strings; after each step the values are deduplicated
+    again, so later steps only see what is still distinct.
+    """
+    codes, uniques = pd.factorize(values)
+    normalized = pd.Series(uniques, dtype=object).astype(str).str.upper()
+    for step in steps:
+        step_codes, step_uniques = pd.factorize(step(normalized))
+        codes = np.where(codes >= 0, step_codes[codes], -1)
+        normalized = pd.Series(step_uniques, dtype=object)
+    # Missing values normalize to an empty string
+    normalized = np.append(normalized.to_numpy(dtype=object), '')
+    return pd.Series(normalized[codes], index=values.index)
+
+
+def _clean_punctuation(col):
+    # Punctuation becomes whitespace, and runs of whitespace collapse to one space
+    return col.map(lambda value: ' '.join(value.translate(_PUNCTUATION).split()))
+
+
+def _strip_units(col):
+    return _clean_punctuation(col).str.replace(_UNIT, r'\1', regex=True)
+
+
+def _abbreviate(col):
+    col = col.str.replace(_ABBREVIATION, lambda m: ABBREVIATIONS[m.group(1)], regex=True)
+    return col.str.strip()
+
+
+def normalize_street(address):
+    """
+    Normalizes a street address column: uppercase, punctuation removed,
+    unit/suite designators and what follows them stripped, and directionals
+    and street suffixes abbreviated to their USPS forms.
+    '123 North Main Street Ste 4' -> '123 N MAIN ST'
+    """
+    # Stripping units collapses most suite variants of an address, so the
+    # abbreviation pass runs on a much smaller set of distinct values
+    return _normalize_unique(address, [_strip_units, _abbreviate])
+
+
+def normalize_city(city):
+    """
+    Uppercases a city column and cleans punctuation and whitespace.
+    """
+    return _normalize_unique(city, [_clean_punctuation])
+
+
+def zip5(zip_code):
+    """
+    Truncates ZIP / ZIP+4 values (strings or numbers) to their first five digits.
+    """
+    return zip_code.astype(str).str.extract(r'(\d{5})', expand=False).fillna('')
+
+
+def address_key(address, city=None, state=None, zip_code=None):
+    """
+    Builds a compact hashed key from normalized address columns.
+    Any of city, state and zip_code may be left out.
+    Returns a uint64 Series, so joins on it are integer hash joins.
+    """
+    parts = [normalize_street(address)]
+    if city is not None:
+        parts.append(normalize_city(city))
+    if state is not None:
+        parts.append(normalize_city(state))
+    if zip_code is not None:
+        parts.append(zip5(zip_code))
+
+    key = parts[0]
+    for part in parts[1:]:
+        key = key + '|' + part
+    return pd.Series(pd.util.hash_array(key.to_numpy(dtype=object)), index=address.index)
@@ -1,5 +1,9 @@
-import pandas as pd
-import re
+import argparse
+
+from artifacts import read_artifact, write_artifact
+from classification_cache import CACHE_DIR
+from cuisine_classifier import classify_stores, drop_excluded_stores
+from run_report import start_run, step, write_run_report
 
 # ==============================================================================
 # UPDATED KEYWORD DICTIONARY
@@ -137,70 +141,64 @@ CUISINE_KEYWORDS = {
     ]
 }
 
-def classify_cuisine(row):
-    """
-    Classifies the cuisine type based on store name and store type.
-    1. Prioritizes ethnic/specific food type matches by store name.
-    2. Uses STORE_TYPE for a general category fallback.
-    """
-    store_name = str(row['STORE_NAME']).lower()
-    store_type = str(row['STORE_TYPE']).lower() if 'STORE_TYPE' in row else ''
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classify retail locations by cuisine from store names")
+    parser.add_argument('--workers', type=int,
+                        help="Processes matching store names (default: all cores for large inputs, else one)")
+    parser.add_argument('--cache-dir', default=CACHE_DIR,
+                        help="Where store name matches are kept between runs, one file per keyword table")
+    parser.add_argument('--no-cache', action='store_true', help="Match every store name afresh")
+    parser.add_argument('--refresh-cache', action='store_true', help="Clear the cache before classifying")
+    args = parser.parse_args()
 
-    for cuisine, keywords in CUISINE_KEYWORDS.items():
-        for keyword in keywords:
-            pattern = r'(?<![a-z])' + re.escape(keyword) + r'(?![a-z])'
-            if re.search(pattern, store_name):
-                return cuisine
-    
-    
-    if 'liquor' in store_type or 'liquor' in store_name:
-        return 'Liquor Store'
-        
-    if 'convenience' in store_type or 'gas' in store_type or 'supermarket' in store_type or 'market' in store_type or 'grocery' in store_type:
-        return 'General Retail/Food/Other'
-    
-    return 'Uncategorized'
+    try:
+        start_run('classify_flat')
+        with step('load') as s:
+            df = read_artifact('foodRetailLocations')
+            s['rows_out'] = len(df)
+        df = drop_excluded_stores(df)
+        print("Data loaded successfully. Shape:", df.shape)
 
-try:
-    df = pd.read_csv('../local-data/foodRetailLocations.csv')
-    df = df[~df['STORE_NAME'].str.contains("BATH & BODY WORKS", case=False, na=False)]    
-    df = df[~df['STORE_NAME'].str.contains("DALLAS NOVELTIES & BEAUTY SUPPLY", case=False, na=False)]
-    print("CSV loaded successfully. Shape:", df.shape)
-
-    print("Classifying rows... this may take a moment.")
-    df['CUISINE_TYPE'] = df.apply(classify_cuisine, axis=1)
+        print("Classifying rows...")
+        with step('classify', rows_in=len(df)):
+            df['CUISINE_TYPE'] = classify_stores(
+                df, CUISINE_KEYWORDS, args.workers, cache_dir=None if args.no_cache else args.cache_dir,
+                refresh_cache=args.refresh_cache
+            )['CUISINE_TYPE']
     
-    output_filename = '../local-data/CuisineRetailLocations2.csv'
-    df.to_csv(output_filename, index=False)
+        with step('write', rows_in=len(df)):
+            output_filename = write_artifact(df, 'CuisineRetailLocations2')
     
-    print(f"\nProcessing complete! New file saved as '{output_filename}'")
+        print(f"\nProcessing complete! New file saved as '{output_filename}'")
     
-    ethnic_categories = [
-        'Mexican', 'Central American', 'South American', 'Latino/Hispanic (General)',
-        'Chinese', 'Vietnamese', 'Korean', 'Japanese', 'Thai', 'Filipino',
-        'Indian/South Asian', 'Middle Eastern', 'African', 'Caribbean',
-        'Eastern European', 'Italian', 'Asian (General)'
-    ]
+        ethnic_categories = [
+            'Mexican', 'Central American', 'South American', 'Latino/Hispanic (General)',
+            'Chinese', 'Vietnamese', 'Korean', 'Japanese', 'Thai', 'Filipino',
+            'Indian/South Asian', 'Middle Eastern', 'African', 'Caribbean',
+            'Eastern European', 'Italian', 'Asian (General)'
+        ]
     
-    print("\n" + "="*60)
-    print("ETHNIC/IMMIGRANT ESTABLISHMENT DISTRIBUTION")
-    print("(Primary categories for census correlation)")
-    print("="*60)
-    ethnic_df = df[df['CUISINE_TYPE'].isin(ethnic_categories)]
-    print(ethnic_df['CUISINE_TYPE'].value_counts())
-    print(f"\nTotal Ethnic Establishments: {len(ethnic_df)}")
+        print("\n" + "="*60)
+        print("ETHNIC/IMMIGRANT ESTABLISHMENT DISTRIBUTION")
+        print("(Primary categories for census correlation)")
+        print("="*60)
+        ethnic_df = df[df['CUISINE_TYPE'].isin(ethnic_categories)]
+        print(ethnic_df['CUISINE_TYPE'].value_counts())
+        print(f"\nTotal Ethnic Establishments: {len(ethnic_df)}")
     
-    print("\n" + "="*60)
-    print("ALL CATEGORIES DISTRIBUTION (Showing Consolidation)")
-    print("="*60)
-    print(df['CUISINE_TYPE'].value_counts())
+        print("\n" + "="*60)
+        print("ALL CATEGORIES DISTRIBUTION (Showing Consolidation)")
+        print("="*60)
+        print(df['CUISINE_TYPE'].value_counts())
     
-    uncategorized = df[df['CUISINE_TYPE'] == 'Uncategorized']['STORE_NAME'].unique()
-    if len(uncategorized) > 0:
-        print(f"\n\nRemaining Uncategorized Stores ({len(uncategorized)}):")
-        print(uncategorized[:50])
+        uncategorized = df[df['CUISINE_TYPE'] == 'Uncategorized']['STORE_NAME'].unique()
+        if len(uncategorized) > 0:
+            print(f"\n\nRemaining Uncategorized Stores ({len(uncategorized)}):")
+            print(uncategorized[:50])
+
+        print(f"\nRun report saved to {write_run_report()}")
 
-except FileNotFoundError:
-    print("Error: 'foodRetailLocations.csv' not found. Please make sure the file is in the correct directory.")
-except Exception as e:
-    print(f"An error occurred: {e}")
\ No newline at end of file
+    except FileNotFoundError:
+        print("Error: foodRetailLocations (.parquet or .csv) not found. Please make sure the file is in the correct directory.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
\ No newline at end of file
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+from address_normalize import address_key
+from retail_merge import standardize_columns
+
+# Rows per chunk when streaming the appraisal roll
+APPRAISAL_CHUNK_SIZE = 250_000
+
+
+def appraisal_address_keys(account_info):
+    """
+    Hashed address keys of ACCOUNT_INFO rows (street number + street name,
+    property city), comparable with address_key(STORE_STREET_ADDRESS, CITY).
+    """
+    street_num = pd.to_numeric(account_info['STREET_NUM'], errors='coerce').astype('Int64').astype('string')
+    return address_key(
+        street_num.fillna('') + " " + account_info['FULL_STREET_NAME'].astype(str),
+        account_info['PROPERTY_CITY']
+    )
+
+
+def _read_columns(file_path):
+    # Standardized column names of a file, for the empty result when no chunk matches
+    return standardize_columns(pd.read_csv(file_path, nrows=0)).columns
+
+
+def _read_chunks(file_path, chunk_size):
+    # Account numbers are kept as text so leading zeros survive
+    header = pd.read_csv(file_path, nrows=0).columns
+    dtype = {col: str for col in header if col.upper().replace(' ', '_') == 'ACCOUNT_NUM'}
+    for chunk in pd.read_csv(file_path, chunksize=chunk_size, dtype=dtype, low_memory=False):
+        yield standardize_columns(chunk)
+
+
+def read_matching_accounts(file_path, keys, chunk_size=APPRAISAL_CHUNK_SIZE):
+    """
+    Streams ACCOUNT_INFO and keeps the accounts whose address key is in keys,
+    with the key in SNAP_COMPOSITE_KEY.
+    """
+    kept, rows_read = [], 0
+    for chunk in _read_chunks(file_path, chunk_size):
+        rows_read += len(chunk)
+        chunk_keys = appraisal_address_keys(chunk)
+        matches = chunk_keys.isin(keys)
+        if matches.any():
+            kept.append(chunk[matches].assign(SNAP_COMPOSITE_KEY=chunk_keys[matches]))
+
+    if kept:
+        accounts = pd.concat(kept, ignore_index=True)
+    else:
+        accounts = pd.DataFrame(columns=[*_read_columns(file_path), 'SNAP_COMPOSITE_KEY'])
+    print(f"ACCOUNT_INFO rows read: {rows_read}, at a retailer address: {len(accounts)}")
+    return accounts
+
+
+def read_matching_details(file_path, account_nums, chunk_size=APPRAISAL_CHUNK_SIZE):
+    """
+    Streams COM_DETAIL and keeps the rows of the given accounts.
+    """
+    kept, rows_read = [], 0
+    for chunk in _read_chunks(file_path, chunk_size):
+        rows_read += len(chunk)
+        chunk = chunk[chunk['ACCOUNT_NUM'].isin(account_nums)]
+        if len(chunk) > 0:
+            kept.append(chunk)
+
+    if kept:
+        details = pd.concat(kept, ignore_index=True)
+    else:
+        details = pd.DataFrame(columns=_read_columns(file_path))
+    print(f"COM_DETAIL rows read: {rows_read}, for those accounts: {len(details)}")
+    return details
+
+
+def pick_primary_property(candidates, key_col='SNAP_COMPOSITE_KEY'):
+    """
+    Resolves addresses with several commercial property records to one: the
+    largest GROSS_BLDG_AREA, then the lowest ACCOUNT_NUM and TAX_OBJ_ID, so
+    the choice doesn't depend on file order. APPRAISAL_MATCHES records how
+    many records the address had.
+    """
+    area = pd.to_numeric(candidates['GROSS_BLDG_AREA'], errors='coerce')
+    order = np.lexsort((
+        candidates['TAX_OBJ_ID'].astype(str).to_numpy(),
+        candidates['ACCOUNT_NUM'].astype(str).to_numpy(),
+        -area.fillna(-np.inf).to_numpy(),
+        candidates[key_col].to_numpy(),
+    ))
+    ranked = candidates.iloc[order]
+    primary = ranked.drop_duplicates(key_col).copy()
+    primary['APPRAISAL_MATCHES'] = primary[key_col].map(candidates[key_col].value_counts())
+    return primary
+
+
+def enrich_with_appraisal(food, account_info_path, com_detail_path, chunk_size=APPRAISAL_CHUNK_SIZE):
+    """
+    Adds Dallas CAD commercial property details to each retail location.
+    The address keys of the retailers are built first and the appraisal
+    files are streamed against them, so only the records at retailer
+    addresses are ever held in memory. Each location keeps its row count:
+    several property records at one address are resolved with
+    pick_primary_property.
+    """
+    food = food.copy()
+    food['FOOD_COMPOSITE_KEY'] = address_key(food['STORE_STREET_ADDRESS'], food['CITY'])
+
+    accounts = read_matching_accounts(account_info_path, food['FOOD_COMPOSITE_KEY'].unique(), chunk_size)
+    details = read_matching_details(com_detail_path, accounts['ACCOUNT_NUM'].unique(), chunk_size)
+
+    candidates = pd.merge(details, accounts, on='ACCOUNT_NUM', how='left')
+    primary = pick_primary_property(candidates)
+    print(f"Addresses with commercial property records: {len(primary)} "
+          f"({(primary['APPRAISAL_MATCHES'] > 1).sum()} with more than one, largest building kept)")
+
+    return pd.merge(food, primary, left_on='FOOD_COMPOSITE_KEY', right_on='SNAP_COMPOSITE_KEY',
+                    how='left', suffixes=('_SNAP', '_FOOD'))
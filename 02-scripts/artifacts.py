@@ -0,0 +1,120 @@
+import os
+
+import pandas as pd
+
+DATA_DIR = "../local-data"
+
+# A UTF-8 byte order mark at the start of the first header, as read with the
+# right encoding, as read with latin-1, and uppercased by standardize_columns
+_BOM_PREFIXES = ('\ufeff', '\u00ef\u00bb\u00bf', '\u00cf\u00bb\u00bf')
+
+
+def strip_bom(columns):
+    """
+    Removes byte order mark remnants from the start of column names ('Ï»¿X' -> 'X').
+    """
+    columns = pd.Index(columns).astype(str)
+    for prefix in _BOM_PREFIXES:
+        columns = columns.str.removeprefix(prefix)
+    return columns
+
+
+def artifact_path(name, data_dir=DATA_DIR):
+    """
+    Path of the Parquet file for a pipeline artifact, e.g. 'merged_data'.
+    """
+    return os.path.join(data_dir, f'{name}.parquet')
+
+
+def read_table(path, columns=None):
+    """
+    Reads a Parquet or CSV file, optionally only the given columns.
+    CSV headers are cleaned of byte order mark remnants first, so columns
+    can be asked for by their clean names.
+    """
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, columns=columns)
+
+    usecols = None if columns is None else (lambda col: strip_bom([col])[0] in columns)
+    df = pd.read_csv(path, encoding='utf-8-sig', usecols=usecols)
+    df.columns = strip_bom(df.columns)
+    return df if columns is None else df[columns]
+
+
+def write_table(df, path):
+    """
+    Writes a Parquet or CSV file depending on the extension of path.
+    The file is written under a temporary name and then renamed, so readers
+    (like store_service.py) never see a partly written file.
+    """
+    tmp_path = path + '.tmp'
+    if path.endswith('.parquet'):
+        _parquet_ready(df).to_parquet(tmp_path, index=False)
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def resolve_artifact(name, data_dir=DATA_DIR):
+    """
+    Path an artifact is read from: its Parquet file, or else a CSV of the
+    same name (the published files, and artifacts written before the
+    pipeline moved to Parquet).
+    """
+    path = artifact_path(name, data_dir)
+    csv_path = os.path.join(data_dir, f'{name}.csv')
+    if not os.path.exists(path) and os.path.exists(csv_path):
+        return csv_path
+    return path
+
+
+def read_artifact(name, columns=None, data_dir=DATA_DIR):
+    """
+    Reads a pipeline artifact (see resolve_artifact), optionally only some columns.
+    """
+    return read_table(resolve_artifact(name, data_dir), columns)
+
+
+def write_artifact(df, name, data_dir=DATA_DIR):
+    """
+    Writes a pipeline artifact as Parquet and returns its path.
+    """
+    return write_table(df, artifact_path(name, data_dir))
+
+
+def export_artifact(name, file_format='csv', output=None, data_dir=DATA_DIR):
+    """
+    Exports an artifact as CSV or XLSX (XLSX needs openpyxl installed).
+    Returns the path written, by default next to the artifact.
+    """
+    df = read_artifact(name, data_dir=data_dir)
+    if output is None:
+        output = os.path.join(data_dir, f'{name}.{file_format}')
+    if file_format == 'xlsx':
+        df.to_excel(output, index=False)
+    elif file_format == 'csv':
+        df.to_csv(output, index=False)
+    else:
+        raise ValueError(f"Unsupported export format: {file_format}")
+    return output
+
+
+def _parquet_ready(df):
+    """
+    Gives object columns that mix Python types one Parquet type: whole
+    numbers (e.g. OBJECTID with None for tax rows) become nullable integers,
+    other numbers floats and anything else strings.
+    """
+    df = df.copy()
+    df.columns = df.columns.astype(str)
+    for col in df.columns[df.dtypes == object]:
+        kind = pd.api.types.infer_dtype(df[col], skipna=True)
+        if kind in ('integer', 'floating', 'mixed-integer-float'):
+            values = pd.to_numeric(df[col])
+            if (values.dropna() % 1 == 0).all():
+                values = values.astype('Int64')
+            df[col] = values
+        elif kind not in ('string', 'boolean', 'empty'):
+            df[col] = df[col].astype('string')
+    return df
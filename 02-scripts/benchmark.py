@@ -0,0 +1,197 @@
+import argparse
+import contextlib
+import json
+import os
+import resource
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+
+from synthetic_data import SCALES, TEXAS_METROS, scale_dir
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(SCRIPTS_DIR, 'benchmark_baselines.json')
+
+# A stage regresses when it is this much slower, or uses this much more
+# peak memory, than its baseline
+TIME_TOLERANCE = 0.25
+MEMORY_TOLERANCE = 0.15
+
+# ...and also at least this much, so the noise of sub-second stages and small
+# allocations on the 10k set doesn't count as a regression
+MIN_SLOWDOWN_SECONDS = 0.1
+MIN_GROWTH_MB = 5
+
+
+def _run_script(script, *args):
+    sys.argv = [script, *args]
+    runpy.run_path(os.path.join(SCRIPTS_DIR, script), run_name='__main__')
+
+
+# Stages import their own dependencies, so a stage's peak memory doesn't
+# include the modules (folium, requests, ...) only other stages need
+
+def _ingest():
+    from permit_ingest import read_food_permits
+    read_food_permits('../local-data/Active_Sales_Tax_Permit_Holders.csv', [metro[0] for metro in TEXAS_METROS])
+
+
+def _geocode_parse():
+    from census_geocoder import parse_geocoder_response
+    with open('../local-data/geocoder_response.csv', 'rb') as f:
+        parse_geocoder_response(f.read())
+
+
+def _map_export():
+    from map_export import export_map
+    from retail_schema import read_stores
+    export_map(read_stores('foodRetailLocations'), '../local-data/benchmark_map.html',
+               group_col='STORE_TYPE', max_bytes=None)
+
+
+# Each stage runs in its own process from the data set's work directory, so
+# the scripts' ../local-data paths point at the synthetic files and peak
+# memory is the stage's own
+BENCHMARK_STAGES = {
+    'ingest': _ingest,
+    'geocode_parse': _geocode_parse,
+    'merge': lambda: _run_script('merge.py'),
+    'classify': lambda: _run_script('categorizing_store_type.py'),
+    'enrich': lambda: _run_script('property_size_merge.py'),
+    'map_export': _map_export,
+}
+
+
+def run_case(stage, data_dir, result_path):
+    """
+    Runs one stage in this process (the child side of measure_stage) and
+    writes its wall time, the process's peak resident memory and how much
+    the stage raised it over what the harness itself took to result_path.
+    """
+    os.chdir(os.path.join(data_dir, 'work'))
+    # ru_maxrss is in kilobytes on Linux
+    harness_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        BENCHMARK_STAGES[stage]()
+    seconds = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    with open(result_path, 'w') as f:
+        json.dump({'seconds': round(seconds, 3), 'peak_mb': round(peak_mb, 1),
+                   'stage_mb': round(peak_mb - harness_mb, 1)}, f)
+
+
+def measure_stage(stage, data_dir, timeout=None):
+    """
+    Runs a stage in a fresh process against a synthetic data set.
+    Returns {'seconds', 'peak_mb', 'stage_mb'}, or {'error'} if it failed.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        result_path = os.path.join(tmp, 'result.json')
+        command = [sys.executable, os.path.abspath(__file__), '--case', stage,
+                   '--data-dir', os.path.abspath(data_dir), '--result', result_path]
+        try:
+            process = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                     text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return {'error': f"timed out after {timeout}s"}
+        if process.returncode != 0:
+            lines = process.stderr.strip().splitlines()
+            return {'error': lines[-1] if lines else f"exit code {process.returncode}"}
+        with open(result_path) as f:
+            return json.load(f)
+
+
+def load_baselines(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baselines(baselines, path=BASELINE_PATH):
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def regressions(result, baseline, time_tolerance=TIME_TOLERANCE, memory_tolerance=MEMORY_TOLERANCE):
+    """
+    Describes how a stage's result exceeds its baseline, if it does.
+    """
+    found = []
+    if result['seconds'] > max(baseline['seconds'] * (1 + time_tolerance),
+                               baseline['seconds'] + MIN_SLOWDOWN_SECONDS):
+        found.append(f"time {result['seconds']:.2f}s vs {baseline['seconds']:.2f}s")
+    # Memory is compared on what the stage itself added; baselines recorded
+    # before stage_mb existed only have the process peak
+    memory = 'stage_mb' if 'stage_mb' in baseline else 'peak_mb'
+    if result[memory] > max(baseline[memory] * (1 + memory_tolerance), baseline[memory] + MIN_GROWTH_MB):
+        found.append(f"memory {result[memory]:.0f} MB vs {baseline[memory]:.0f} MB")
+    return found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time and memory-profile pipeline stages on synthetic data and compare with baselines"
+    )
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=['10k', '100k'])
+    parser.add_argument('--stages', nargs='+', choices=list(BENCHMARK_STAGES), default=list(BENCHMARK_STAGES))
+    parser.add_argument('--geography', choices=['dallas', 'statewide'], default='dallas')
+    parser.add_argument('--data-dir', help="Run against this synthetic data set instead of the scales'")
+    parser.add_argument('--timeout', type=float, help="Seconds before a stage counts as failed")
+    parser.add_argument('--time-tolerance', type=float, default=TIME_TOLERANCE)
+    parser.add_argument('--memory-tolerance', type=float, default=MEMORY_TOLERANCE)
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Record these results as the baselines instead of comparing")
+    parser.add_argument('--case', choices=list(BENCHMARK_STAGES), help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        run_case(args.case, args.data_dir, args.result)
+        sys.exit(0)
+
+    if args.data_dir:
+        data_sets = [(os.path.basename(os.path.normpath(args.data_dir)), args.data_dir)]
+    else:
+        data_sets = [(f'{args.geography}_{scale}', scale_dir(scale, args.geography)) for scale in args.scales]
+        for scale, (_, data_dir) in zip(args.scales, data_sets):
+            if not os.path.exists(os.path.join(data_dir, 'local-data')):
+                print(f"Generating {scale} synthetic data in {data_dir}")
+                # In its own process: Linux carries a process's peak memory over to
+                # the processes it starts, which would inflate every stage's peak
+                subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, 'synthetic_data.py'), scale,
+                                '--geography', args.geography], check=True)
+
+    baselines = load_baselines()
+    failed = False
+    for key, data_dir in data_sets:
+        print(f"\n==== {key} ====")
+        for stage in args.stages:
+            result = measure_stage(stage, data_dir, args.timeout)
+            if 'error' in result:
+                failed = True
+                print(f"{stage:<15} FAILED: {result['error']}")
+                continue
+
+            baseline = baselines.get(key, {}).get(stage)
+            status = ''
+            if args.update_baseline:
+                baselines.setdefault(key, {})[stage] = result
+                status = 'baseline updated'
+            elif baseline is None:
+                status = 'no baseline'
+            else:
+                found = regressions(result, baseline, args.time_tolerance, args.memory_tolerance)
+                failed |= bool(found)
+                status = 'REGRESSION: ' + ', '.join(found) if found else 'ok'
+            print(f"{stage:<15} {result['seconds']:>9.2f}s {result['peak_mb']:>9.0f} MB "
+                  f"{result['stage_mb']:>9.0f} MB   {status}")
+
+    if args.update_baseline:
+        save_baselines(baselines)
+        print(f"\nBaselines saved to {BASELINE_PATH}")
+    sys.exit(1 if failed else 0)
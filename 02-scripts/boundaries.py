@@ -0,0 +1,87 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from artifacts import DATA_DIR
+from spatial_index import build_polygon_index, locate_points
+
+# Census county and tract boundaries as GeoJSON, e.g. the cartographic boundary
+# shapefiles converted with `ogr2ogr -f GeoJSON counties.geojson cb_2023_us_county_500k.shp`
+BOUNDARY_DIR = os.path.join(DATA_DIR, 'boundaries')
+COUNTIES_FILE = os.path.join(BOUNDARY_DIR, 'counties.geojson')
+TRACTS_FILE = os.path.join(BOUNDARY_DIR, 'tracts.geojson')
+
+# State (2) + county (3) digits at the start of tract GEOIDs, and state + county +
+# tract (6) digits at the start of block and block group GEOIDs
+COUNTY_FIPS_LENGTH = 5
+TRACT_GEOID_LENGTH = 11
+DALLAS_COUNTY_FIPS = '48113'
+
+# Feature properties holding the GEOID in Census boundary files, in order of
+# preference, and the parts it is built from when none of them is present
+GEOID_PROPERTIES = ['GEOID', 'GEOID20', 'GEOID10']
+GEOID_PARTS = {'STATEFP': 2, 'COUNTYFP': 3, 'TRACTCE': 6}
+
+
+def feature_geoid(properties, length):
+    """
+    GEOID of a boundary feature: its GEOID property, or the STATEFP, COUNTYFP
+    and TRACTCE properties zero-padded and joined, cut to length digits.
+    """
+    for name in GEOID_PROPERTIES:
+        if properties.get(name):
+            return str(properties[name])[:length]
+    parts = ''.join(str(properties[name]).zfill(width) for name, width in GEOID_PARTS.items()
+                    if properties.get(name) is not None)
+    return parts[:length]
+
+
+def read_boundaries(file_path, length):
+    """
+    Reads a GeoJSON file of Polygon and MultiPolygon boundaries and indexes
+    them for assign_boundaries. Returns a dict with the GEOID (length
+    digits) of each indexed polygon and the polygon index.
+    """
+    with open(file_path) as f:
+        features = json.load(f)['features']
+
+    geoids, polygons = [], []
+    for feature in features:
+        geometry = feature.get('geometry') or {}
+        if geometry.get('type') == 'Polygon':
+            parts = [geometry['coordinates']]
+        elif geometry.get('type') == 'MultiPolygon':
+            parts = geometry['coordinates']
+        else:
+            continue
+        geoid = feature_geoid(feature.get('properties') or {}, length)
+        if len(geoid) != length:
+            raise ValueError(f"{file_path}: feature without a {length}-digit GEOID: {feature.get('properties')}")
+        geoids.extend([geoid] * len(parts))
+        polygons.extend(parts)
+    if not polygons:
+        raise ValueError(f"{file_path} has no Polygon or MultiPolygon features")
+
+    return {'geoids': np.array(geoids, dtype=object), 'index': build_polygon_index(polygons)}
+
+
+def read_counties(file_path=COUNTIES_FILE):
+    return read_boundaries(file_path, COUNTY_FIPS_LENGTH)
+
+
+def read_tracts(file_path=TRACTS_FILE):
+    return read_boundaries(file_path, TRACT_GEOID_LENGTH)
+
+
+def assign_boundaries(boundaries, lat, lon):
+    """
+    GEOID of the boundary containing each point, missing for points outside
+    all of them or without coordinates.
+    """
+    lat = pd.to_numeric(pd.Series(lat), errors='coerce').to_numpy(dtype=float)
+    lon = pd.to_numeric(pd.Series(lon), errors='coerce').to_numpy(dtype=float)
+    located = locate_points(boundaries['index'], lat, lon)
+    geoids = np.where(located >= 0, boundaries['geoids'][np.maximum(located, 0)], None)
+    return pd.array(geoids, dtype='string')
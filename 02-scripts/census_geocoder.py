@@ -0,0 +1,234 @@
+import hashlib
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+import requests
+
+from artifacts import write_table
+from geocode_cache import CACHE_PATH, TTL_DAYS, address_keys, invalidate, lookup, open_cache, store
+from run_report import record
+
+CENSUS_BATCH_URL = "https://geocoding.geo.census.gov/geocoder/locations/addressbatch"
+CENSUS_BENCHMARK = 'Public_AR_Current'
+
+# The Census service rejects files over 10,000 addresses
+MAX_BATCH_SIZE = 10_000
+BATCH_SIZE = 2_500
+MAX_WORKERS = 4
+MAX_RETRIES = 4
+REQUEST_TIMEOUT = 600
+CHECKPOINT_DIR = "../local-data/geocode_checkpoints"
+
+# Columns of the addressbatch input (sent without a header)
+BATCH_INPUT_COLUMNS = ['ID', 'OUTLET_ADDRESS', 'OUTLET_CITY', 'OUTLET_STATE', 'OUTLET_ZIP_CODE']
+
+# Columns of the addressbatch response; No_Match rows only fill the first three
+GEOCODER_COLUMNS = [
+    'ID', 'Input_Address', 'Match_Status', 'Match_Type', 'Matched_Address',
+    'Coordinates', 'TIGER_Line_ID', 'Side'
+]
+
+# Status codes worth retrying; anything else in 4xx is a bad request
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def split_batches(batch_df, batch_size=BATCH_SIZE):
+    """
+    Splits the 5-column geocoder input (ID, address, city, state, zip) into
+    CSV payloads no larger than the service limit.
+    Each payload is named by a hash of its content, so a rerun over the same
+    input finds its earlier checkpoints.
+    """
+    batch_size = min(batch_size, MAX_BATCH_SIZE)
+    batches = []
+    for start in range(0, len(batch_df), batch_size):
+        payload = batch_df.iloc[start:start + batch_size].to_csv(index=False, header=False).encode()
+        digest = hashlib.sha1(payload).hexdigest()[:16]
+        batches.append((f"batch_{digest}", payload, min(batch_size, len(batch_df) - start)))
+    return batches
+
+
+def post_batch(url, payload, benchmark=CENSUS_BENCHMARK, max_retries=MAX_RETRIES,
+               timeout=REQUEST_TIMEOUT):
+    """
+    Sends one CSV payload to the addressbatch endpoint.
+    Retries connection errors, timeouts and 429/5xx responses with
+    exponential backoff (1s, 2s, 4s, ...).
+    Returns (response bytes, number of attempts).
+    """
+    data = {'returntype': 'locations', 'benchmark': benchmark}
+    for attempt in range(1, max_retries + 2):
+        try:
+            files = {'addressFile': ('batch.csv', payload, 'text/csv')}
+            response = requests.post(url, files=files, data=data, timeout=timeout)
+            if response.status_code not in RETRY_STATUS_CODES:
+                response.raise_for_status()
+                return response.content, attempt
+            error = f"HTTP {response.status_code}"
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = str(e)
+        if attempt > max_retries:
+            raise RuntimeError(f"Geocoder batch failed after {attempt} attempts: {error}")
+        time.sleep(2 ** (attempt - 1))
+
+
+def geocode_batches(batch_df, checkpoint_dir=CHECKPOINT_DIR, url=CENSUS_BATCH_URL, benchmark=CENSUS_BENCHMARK,
+                    batch_size=BATCH_SIZE, max_workers=MAX_WORKERS, max_retries=MAX_RETRIES):
+    """
+    Geocodes the batch input through the Census addressbatch endpoint.
+    Batches are sent from a bounded thread pool and each finished response is
+    written to checkpoint_dir, so an interrupted run only resends the batches
+    that never completed.
+    Returns (raw response bytes for all batches, per-batch stats).
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    batches = split_batches(batch_df, batch_size)
+
+    pending = []
+    for batch in batches:
+        if not os.path.exists(os.path.join(checkpoint_dir, batch[0] + '.csv')):
+            pending.append(batch)
+    print(f"Geocoding {len(batch_df)} addresses in {len(batches)} batches "
+          f"({len(batches) - len(pending)} already checkpointed)")
+
+    def run(name, payload, n_addresses):
+        started = time.perf_counter()
+        content, attempts = post_batch(url, payload, benchmark, max_retries)
+        seconds = time.perf_counter() - started
+        # Write then rename so a crash never leaves a partial checkpoint behind
+        checkpoint = os.path.join(checkpoint_dir, name + '.csv')
+        with open(checkpoint + '.tmp', 'wb') as f:
+            f.write(content)
+        os.replace(checkpoint + '.tmp', checkpoint)
+        return {'batch': name, 'addresses': n_addresses,
+                'seconds': seconds, 'attempts': attempts}
+
+    stats = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(run, *batch) for batch in pending]
+        for future in as_completed(futures):
+            batch = future.result()
+            batch['addresses_per_second'] = batch['addresses'] / batch['seconds']
+            stats.append(batch)
+            print(f"  {batch['batch']}: {batch['addresses']} addresses in {batch['seconds']:.1f}s "
+                  f"({batch['addresses_per_second']:.0f}/s, {batch['attempts']} attempt(s))")
+
+    responses = []
+    for name, _, _ in batches:
+        with open(os.path.join(checkpoint_dir, name + '.csv'), 'rb') as f:
+            responses.append(f.read().rstrip(b'\r\n'))
+    content = b'\n'.join(response for response in responses if response) + b'\n'
+    return content, stats
+
+
+def parse_geocoder_response(content):
+    """
+    Parses addressbatch output into a DataFrame with GEOCODER_COLUMNS plus
+    numeric Longitude/Latitude split out of Coordinates.
+    """
+    if not content.strip():
+        geocoded_df = pd.DataFrame(columns=GEOCODER_COLUMNS, dtype=str)
+    else:
+        geocoded_df = pd.read_csv(io.BytesIO(content), header=None, names=GEOCODER_COLUMNS,
+                                  dtype=str)
+    coordinates = geocoded_df['Coordinates'].str.split(',', expand=True).reindex(columns=[0, 1])
+    geocoded_df['Longitude'] = pd.to_numeric(coordinates[0], errors='coerce')
+    geocoded_df['Latitude'] = pd.to_numeric(coordinates[1], errors='coerce')
+    return geocoded_df
+
+
+def match_breakdown(results):
+    """
+    Counts of geocoder results by Match_Status (Match, No_Match, Tie) and, for
+    matches, Match_Type (Exact, Non_Exact), with the share matched.
+    """
+    status = results['Match_Status'].fillna('Missing')
+    matched = status == 'Match'
+    match_type = results.loc[matched, 'Match_Type'].fillna('Missing')
+    return {
+        'rows': len(results),
+        'match_rate': round(float(matched.mean()), 4) if len(results) else None,
+        'status': {str(k): int(v) for k, v in status.value_counts().items()},
+        'match_type': {str(k): int(v) for k, v in match_type.value_counts().items()},
+    }
+
+
+def geocode_permits(df, cache_path=CACHE_PATH, ttl_days=TTL_DAYS, refresh_cache=False,
+                    url=CENSUS_BATCH_URL, benchmark=CENSUS_BENCHMARK, batch_size=BATCH_SIZE,
+                    max_workers=MAX_WORKERS, checkpoint_dir=CHECKPOINT_DIR,
+                    batch_file=None, results_file=None):
+    """
+    Geocodes permit outlets (ID, OUTLET_ADDRESS, OUTLET_CITY, OUTLET_STATE,
+    OUTLET_ZIP_CODE) through the local cache and the Census batch geocoder.
+    Every distinct address is looked up in the cache; only misses are sent
+    to the geocoder, and their results are added to the cache.
+    batch_file and results_file, when given, receive the addresses sent to
+    the geocoder and its parsed results (Parquet or CSV by extension).
+    Returns df with Latitude, Longitude, Match_Status and Match_Type.
+    """
+    print("==== CHECKING GEOCODE CACHE ====")
+    keys = address_keys(
+        df['OUTLET_ADDRESS'], df['OUTLET_CITY'], df['OUTLET_STATE'], df['OUTLET_ZIP_CODE']
+    )
+    cache = open_cache(cache_path)
+    if refresh_cache:
+        print(f"Cleared {invalidate(cache)} cached addresses")
+    cached = lookup(cache, keys.unique(), benchmark, ttl_days=ttl_days)
+    is_miss = ~keys.isin(cached.index) & ~keys.duplicated()
+    misses = df.loc[is_miss, ['ID']].assign(ADDRESS_KEY=keys[is_miss])
+    print(f"Cache hits: {keys.nunique() - len(misses)} addresses, misses: {len(misses)} addresses")
+    record('geocoding', {'addresses': int(keys.nunique()), 'cache_hits': int(keys.nunique() - len(misses)),
+                         'cache_misses': len(misses)})
+
+    # Census Geocoding requires the columns below as csv for batch processing
+    batch_df = pd.DataFrame({
+        0: df.loc[is_miss, 'ID'],
+        1: df.loc[is_miss, 'OUTLET_ADDRESS'],
+        2: df.loc[is_miss, 'OUTLET_CITY'],
+        3: df.loc[is_miss, 'OUTLET_STATE'],
+        4: df.loc[is_miss, 'OUTLET_ZIP_CODE'].astype(str)
+    })
+    if batch_file is not None:
+        write_table(batch_df.set_axis(BATCH_INPUT_COLUMNS, axis=1), batch_file)
+
+    content = b''
+    if len(batch_df) > 0:
+        print("==== SENDING BATCHES TO CENSUS GEOCODER ====")
+        content, batch_stats = geocode_batches(
+            batch_df, checkpoint_dir, url=url, benchmark=benchmark,
+            batch_size=batch_size, max_workers=max_workers
+        )
+        if batch_stats:
+            seconds = [batch['seconds'] for batch in batch_stats]
+            addresses = sum(batch['addresses'] for batch in batch_stats)
+            print(f"Sent {len(batch_stats)} batches: average {addresses / sum(seconds):.0f} addresses/s, "
+                  f"latency min {min(seconds):.1f}s / max {max(seconds):.1f}s")
+            record('geocoding', {
+                'batches_sent': len(batch_stats),
+                'addresses_per_second': round(addresses / sum(seconds), 1),
+                'batch_seconds_min': round(min(seconds), 2),
+                'batch_seconds_max': round(max(seconds), 2),
+                'batch_retries': sum(batch['attempts'] - 1 for batch in batch_stats),
+            })
+
+    geocoded_df = parse_geocoder_response(content)
+    record('geocoding', {'fresh': match_breakdown(geocoded_df)})
+    if results_file is not None:
+        write_table(geocoded_df, results_file)
+
+    # Key the fresh results by address and add them to the cache
+    geocoded_df['ID'] = geocoded_df['ID'].astype(str)
+    geocoded_df = geocoded_df.merge(misses.astype({'ID': str}), on='ID', how='inner')
+    geocoded_df = geocoded_df.set_index('ADDRESS_KEY')
+    store(cache, geocoded_df, benchmark)
+    cache.close()
+
+    # Merge cached and fresh results back onto every permit by address
+    result_cols = ['Latitude', 'Longitude', 'Match_Status', 'Match_Type']
+    results = pd.concat([cached[result_cols], geocoded_df[result_cols]])
+    final_df = df.merge(results, left_on=keys, right_index=True, how='left')
+    record('geocoding', {'permits': match_breakdown(final_df)})
+    return final_df
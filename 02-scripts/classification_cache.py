@@ -0,0 +1,55 @@
+import glob
+import os
+
+import pandas as pd
+
+from artifacts import DATA_DIR, read_table, write_table
+
+# One file per keyword table, named by the table's hash, so editing the keywords
+# starts a new, empty cache and the old file is never read again
+CACHE_DIR = os.path.join(DATA_DIR, 'classification_cache')
+
+# Characters of the keyword table hash used in the file name
+HASH_CHARS = 16
+
+
+def cache_file(keyword_hash, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, f"{keyword_hash[:HASH_CHARS]}.parquet")
+
+
+def load_cache(keyword_hash, cache_dir=CACHE_DIR):
+    """
+    Store name matches made with the keyword table of keyword_hash: a Series
+    of matched cuisines (None where no keyword matched) indexed by
+    normalized store name, empty before the table's first run.
+    """
+    path = cache_file(keyword_hash, cache_dir)
+    if not os.path.exists(path):
+        return pd.Series(dtype=object, index=pd.Index([], dtype=object, name='STORE_NAME'), name='CUISINE')
+    cached = read_table(path)
+    return pd.Series(cached['CUISINE'].to_numpy(dtype=object), name='CUISINE',
+                     index=pd.Index(cached['STORE_NAME'].to_numpy(dtype=object), name='STORE_NAME'))
+
+
+def save_cache(cached, new_names, new_cuisines, keyword_hash, cache_dir=CACHE_DIR):
+    """
+    Adds newly matched store names to a keyword table's cache file.
+    """
+    if len(new_names) == 0:
+        return cache_file(keyword_hash, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    updated = pd.DataFrame({
+        'STORE_NAME': pd.concat([cached.index.to_series(), pd.Series(new_names)], ignore_index=True).to_numpy(object),
+        'CUISINE': pd.concat([cached, pd.Series(new_cuisines, dtype=object)], ignore_index=True).to_numpy(object),
+    })
+    return write_table(updated, cache_file(keyword_hash, cache_dir))
+
+
+def clear_cache(cache_dir=CACHE_DIR):
+    """
+    Deletes the cache files of every keyword table. Returns the number removed.
+    """
+    paths = glob.glob(os.path.join(cache_dir, '*.parquet'))
+    for path in paths:
+        os.remove(path)
+    return len(paths)
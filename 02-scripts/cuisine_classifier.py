@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from classification_cache import clear_cache, load_cache, save_cache
+from keyword_matcher import build_keyword_matcher
+from run_report import count_rows, record
+
+HIERARCHY_COLUMNS = ['CUISINE_TYPE', 'CATEGORY', 'SUBCATEGORY', 'SUB_SUBCATEGORY']
+
+# Fallback labels used when no keyword is found in the store name
+LIQUOR_LABEL = 'Liquor Store'
+GENERAL_LABEL = 'General Retail/Food/Other'
+UNCATEGORIZED_LABEL = 'Uncategorized'
+
+# STORE_TYPE substrings that put an unmatched store under GENERAL_LABEL
+GENERAL_STORE_TYPES = ['convenience', 'gas', 'supermarket', 'market', 'grocery']
+
+# Non-food retailers that show up in the SNAP/tax data and are left out of classification
+EXCLUDED_STORE_NAMES = ["BATH & BODY WORKS", "DALLAS NOVELTIES & BEAUTY SUPPLY"]
+
+# With workers=None, names are matched in a process pool only when there are
+# at least this many distinct ones; below it, starting the pool costs more
+# than it saves
+PARALLEL_MIN_NAMES = 50_000
+
+# Distinct names sent to a worker at a time
+CHUNK_NAMES = 10_000
+
+# The matcher of a pool worker, compiled once when the worker starts
+_worker = {}
+
+
+def drop_excluded_stores(df):
+    """
+    Removes stores whose name contains any of EXCLUDED_STORE_NAMES (case-insensitive).
+    """
+    rows_in = len(df)
+    for name in EXCLUDED_STORE_NAMES:
+        df = df[~df['STORE_NAME'].str.contains(name, case=False, na=False, regex=False)]
+    count_rows('excluded_store_names', rows_in, len(df))
+    return df
+
+
+def keyword_table_hash(keyword_table):
+    """
+    SHA-256 of a keyword table, in its order, since cuisines earlier in the
+    table win. Cached store name matches are only reused under the same hash.
+    """
+    return hashlib.sha256(json.dumps(keyword_table).encode()).hexdigest()
+
+
+def compile_keyword_table(keyword_table):
+    """
+    Prepares a keyword table for classify_stores.
+    Accepts either the flat form (cuisine -> list of keywords) or the
+    hierarchical form (cuisine -> dict with 'keywords', 'category',
+    'subcategory' and 'sub_subcategory'). Flat tables get empty hierarchy levels.
+    """
+    cuisines = list(keyword_table)
+    details = [
+        entry if isinstance(entry, dict) else {'keywords': entry}
+        for entry in keyword_table.values()
+    ]
+    match = build_keyword_matcher(
+        {cuisine: entry['keywords'] for cuisine, entry in zip(cuisines, details)}
+    )
+
+    # One row per label: every cuisine, then the three fallbacks
+    fallbacks = [LIQUOR_LABEL, GENERAL_LABEL, UNCATEGORIZED_LABEL]
+    labels = {'CUISINE_TYPE': np.array(cuisines + fallbacks, dtype=object)}
+    for column, key in zip(HIERARCHY_COLUMNS[1:], ['category', 'subcategory', 'sub_subcategory']):
+        labels[column] = np.array(
+            [entry.get(key) for entry in details] + [None] * len(fallbacks), dtype=object
+        )
+
+    return {
+        'keywords': {cuisine: entry['keywords'] for cuisine, entry in zip(cuisines, details)},
+        'hash': keyword_table_hash(keyword_table),
+        'match': match,
+        'index': {cuisine: i for i, cuisine in enumerate(cuisines)},
+        'labels': labels,
+    }
+
+
+def _init_worker(keyword_lists, index):
+    # The matcher is a closure over a compiled regex and can't be pickled, so
+    # each worker builds its own from the keyword lists it is started with
+    _worker['match'] = build_keyword_matcher(keyword_lists)
+    _worker['index'] = index
+
+
+def _match_names(names, match, index):
+    return np.fromiter((index.get(match(name), -1) for name in names), dtype=np.int64, count=len(names))
+
+
+def _match_chunk(names):
+    return _match_names(names, _worker['match'], _worker['index'])
+
+
+def _match_unique_names(uniques, compiled, workers):
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(uniques) >= PARALLEL_MIN_NAMES else 1
+    workers = min(workers, -(-len(uniques) // CHUNK_NAMES))
+
+    if workers > 1:
+        chunks = [uniques[start:start + CHUNK_NAMES] for start in range(0, len(uniques), CHUNK_NAMES)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(compiled['keywords'], compiled['index'])) as pool:
+            return np.concatenate(list(pool.map(_match_chunk, chunks)))
+    return _match_names(uniques, compiled['match'], compiled['index'])
+
+
+def match_store_names(store_names, compiled, workers=None, cache_dir=None):
+    """
+    Runs the keyword matcher over a column of lowercased store names.
+    Each distinct name is matched once and the result is broadcast back.
+    With cache_dir (see classification_cache), names already matched with
+    the same keyword table in an earlier run are taken from its cache file,
+    and only new ones are matched and added to it.
+    With workers > 1 the distinct names are matched in chunks by a pool of
+    that many processes, each compiling the keyword table once when it
+    starts; chunks come back in order, so the result is the same as in one
+    process. workers=None uses every core when there are at least
+    PARALLEL_MIN_NAMES distinct names, and one process otherwise.
+    Returns the cuisine index per row, -1 where nothing matched.
+    """
+    codes, uniques = pd.factorize(store_names)
+    # factorize marks missing values with -1; store_names is filled beforehand
+    return _match_distinct_names(np.asarray(uniques, dtype=object), compiled, workers, cache_dir)[codes]
+
+
+def _match_distinct_names(uniques, compiled, workers, cache_dir):
+    if cache_dir is None:
+        return _match_unique_names(uniques, compiled, workers)
+
+    cached = load_cache(compiled['hash'], cache_dir)
+    # Cached cuisines as indexes into the table, -1 for cached non-matches and
+    # (through the appended entry) for names not in the cache
+    cached_hits = np.append(cached.map(compiled['index']).fillna(-1).to_numpy(dtype=np.int64), -1)
+    positions = cached.index.get_indexer(uniques)
+    is_new = positions < 0
+    unique_hits = cached_hits[positions]
+    new_names = uniques[is_new]
+    unique_hits[is_new] = _match_unique_names(new_names, compiled, workers)
+
+    cuisines = np.array(list(compiled['index']) + [None], dtype=object)
+    save_cache(cached, new_names, cuisines[unique_hits[is_new]], compiled['hash'], cache_dir)
+    print(f"Classification cache: {len(uniques) - len(new_names)} store names cached, {len(new_names)} classified")
+    record('classification_cache', {'store_names': len(uniques), 'cached': len(uniques) - len(new_names),
+                                    'classified': len(new_names)})
+    return unique_hits
+
+
+def _normalized_codes(values, strip=False):
+    # Lowercases (and strips) each distinct value once; returns codes into the distinct results
+    raw_codes, raw_values = pd.factorize(values.fillna(''))
+    normalized = pd.Series(np.asarray(raw_values, dtype=object)).astype(str).str.lower()
+    if strip:
+        normalized = normalized.str.strip()
+    codes, uniques = pd.factorize(normalized)
+    return codes[raw_codes], pd.Series(np.asarray(uniques, dtype=object))
+
+
+def classify_stores(df, keyword_table, workers=None, cache_dir=None, refresh_cache=False):
+    """
+    Classifies every store in df at once.
+    1. Prioritizes ethnic/specific food type matches by store name.
+    2. Uses STORE_TYPE for a general category fallback.
+    Each distinct (store name, STORE_TYPE) pair is classified once and the
+    result broadcast back to its rows; store names are lowercased and
+    stripped first.
+    workers sets the processes matching store names, and cache_dir keeps
+    their matches across runs (see match_store_names); refresh_cache
+    clears the cache first.
+    Returns a DataFrame aligned to df.index with CUISINE_TYPE, CATEGORY,
+    SUBCATEGORY and SUB_SUBCATEGORY.
+    """
+    compiled = keyword_table if 'labels' in keyword_table else compile_keyword_table(keyword_table)
+    if cache_dir is not None and refresh_cache:
+        print(f"Cleared {clear_cache(cache_dir)} classification cache file(s)")
+
+    name_codes, store_names = _normalized_codes(df['STORE_NAME'], strip=True)
+    if 'STORE_TYPE' in df.columns:
+        type_codes, store_types = _normalized_codes(df['STORE_TYPE'])
+    else:
+        type_codes, store_types = np.zeros(len(df), dtype=np.int64), pd.Series([''], dtype=object)
+
+    # Distinct (name, type) pairs, as codes into store_names and store_types
+    pair_codes, pairs = pd.factorize(name_codes * len(store_types) + type_codes)
+    pair_names, pair_types = pairs // len(store_types), pairs % len(store_types)
+
+    hits = _match_distinct_names(store_names.to_numpy(), compiled, workers, cache_dir)[pair_names]
+
+    n_cuisines = len(compiled['index'])
+    is_liquor = (
+        store_types.str.contains('liquor', regex=False).to_numpy()[pair_types]
+        | store_names.str.contains('liquor', regex=False).to_numpy()[pair_names]
+    )
+    is_general = store_types.str.contains('|'.join(GENERAL_STORE_TYPES)).to_numpy()[pair_types]
+
+    codes = np.where(
+        hits >= 0, hits,
+        np.where(is_liquor, n_cuisines,
+                 np.where(is_general, n_cuisines + 1, n_cuisines + 2))
+    )[pair_codes]
+
+    return pd.DataFrame(
+        {column: values[codes] for column, values in compiled['labels'].items()},
+        index=df.index
+    )
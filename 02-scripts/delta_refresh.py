@@ -0,0 +1,174 @@
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from artifacts import read_artifact, write_artifact
+from boundaries import COUNTIES_FILE, DALLAS_COUNTY_FIPS, read_counties
+from categorizing_store_type import CUISINE_KEYWORDS
+from classification_cache import CACHE_DIR
+from census_geocoder import BATCH_SIZE, CENSUS_BATCH_URL, CHECKPOINT_DIR, MAX_WORKERS, geocode_permits
+from cuisine_classifier import HIERARCHY_COLUMNS, classify_stores, drop_excluded_stores
+from geocode_cache import CACHE_PATH
+from permit_ingest import DALLAS_COUNTY_CODE, read_food_permits
+from record_ids import (
+    assign_record_ids, load_crosswalk, lookup_record_ids, save_crosswalk, snap_source_keys, tax_source_keys,
+    update_crosswalk
+)
+from record_linkage import link_records
+from retail_merge import (
+    clean_coordinates, find_spatial_duplicates, find_unmatched_tax, prepare_snap, prepare_tax,
+    tax_to_snap_schema
+)
+from snapshot_delta import (
+    CHANGE_REMOVED, PERMIT_KEY, SNAP_KEY, diff_snapshots, patch_rows,
+    previous_versions, retail_row_keys, summarize_changes
+)
+from store_history import HISTORY_DIR, record_snapshot, untracked_stores
+from tiger_geocoder import fill_unmatched, read_address_ranges, tiger_files
+
+parser = argparse.ArgumentParser(
+    description="Refresh foodRetailLocations and CuisineRetailLocations2 from the "
+                "records that changed between two permit/SNAP snapshots"
+)
+parser.add_argument('--permits', required=True, help="New Active Sales Tax Permit Holders CSV")
+parser.add_argument('--previous-permits', required=True, help="Previous permit snapshot")
+parser.add_argument('--snap', default="../local-data/SNAP_Retailer_Location_data.csv",
+                    help="New SNAP retailer CSV")
+parser.add_argument('--previous-snap', required=True, help="Previous SNAP retailer snapshot")
+parser.add_argument('--counties', nargs='+', default=[DALLAS_COUNTY_CODE],
+                    help="Outlet county codes to keep (default: 57, Dallas)")
+parser.add_argument('--county-boundaries', default=COUNTIES_FILE,
+                    help="County boundaries (GeoJSON) to keep new tax records inside, as in merge.py")
+parser.add_argument('--county-fips', default=DALLAS_COUNTY_FIPS)
+parser.add_argument('--geocoder-url', default=CENSUS_BATCH_URL)
+parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+parser.add_argument('--checkpoint-dir', default=CHECKPOINT_DIR)
+parser.add_argument('--cache', default=CACHE_PATH)
+parser.add_argument('--tiger', nargs='+', default=tiger_files(),
+                    help="TIGER/Line address range files (GeoJSON) for addresses the Census geocoder leaves unmatched")
+parser.add_argument('--snapshot', default=time.strftime('%Y-%m-%d'),
+                    help="Label of the new snapshots, recorded in the RECORD_ID crosswalk and, as "
+                         "the snapshot date, in the store history")
+parser.add_argument('--history-dir', default=HISTORY_DIR,
+                    help="Store history to record the patched retail locations in")
+args = parser.parse_args()
+
+
+def read_snap(file_path):
+    snap = pd.read_csv(file_path, encoding='latin-1')
+    snap = snap[(snap['County'] == 'DALLAS') & (snap['State'] == 'TX')]
+    return prepare_snap(snap)
+
+
+# ==== DIFF SNAPSHOTS ====
+print("==== DIFFING SNAPSHOTS ====")
+permits = read_food_permits(args.permits, args.counties)
+previous_permits = read_food_permits(args.previous_permits, args.counties)
+permit_changes = diff_snapshots(previous_permits, permits, PERMIT_KEY)
+
+snap = read_snap(args.snap)
+previous_snap = read_snap(args.previous_snap)
+snap_changes = diff_snapshots(previous_snap, snap, SNAP_KEY)
+
+for source, changes in [('Permits', permit_changes), ('SNAP', snap_changes)]:
+    print(f"{source}: {changes['CHANGE'].value_counts().to_dict()}")
+
+# Write the change set as its own artifact
+change_log = pd.concat([
+    summarize_changes(permit_changes, 'TAX', PERMIT_KEY, 'OUTLET_NAME',
+                      ['OUTLET_ADDRESS', 'OUTLET_CITY', 'OUTLET_STATE', 'OUTLET_ZIP_CODE']),
+    summarize_changes(snap_changes, 'SNAP', SNAP_KEY, 'STORE_NAME',
+                      ['STORE_STREET_ADDRESS', 'CITY', 'STATE', 'ZIP_CODE']),
+], ignore_index=True)
+changes_file = write_artifact(change_log, 'snapshot_changes')
+print(f"Change set saved to {changes_file}")
+
+# ==== SELECT RECORDS TO REPROCESS ====
+# Changed permits, plus unchanged permits at addresses where a SNAP store appeared or
+# disappeared, since their SNAP match may have flipped
+affected_snap_keys = set(snap_changes['SNAP_COMPOSITE_KEY'])
+affected_snap_keys |= set(previous_versions(previous_snap, snap_changes, SNAP_KEY)['SNAP_COMPOSITE_KEY'])
+
+tax_all = prepare_tax(permits.copy())
+changed_permit_keys = permit_changes.loc[permit_changes['CHANGE'] != CHANGE_REMOVED, PERMIT_KEY]
+reprocess = tax_all.merge(changed_permit_keys, on=PERMIT_KEY, how='left', indicator=True)
+reprocess = reprocess[
+    (reprocess['_merge'] == 'both') | reprocess['TAX_COMPOSITE_KEY'].isin(affected_snap_keys)
+].drop(columns='_merge')
+reprocess = permits.merge(reprocess[PERMIT_KEY], on=PERMIT_KEY)
+print(f"Permits to reprocess: {len(reprocess)}")
+
+# RECORD_IDs of the rows to drop from the published files: changed SNAP records, and
+# the crosswalk ids of changed/removed permits and of every reprocessed permit
+crosswalk = load_crosswalk()
+old_permits = previous_versions(previous_permits, permit_changes, PERMIT_KEY)
+drop_keys = set(lookup_record_ids(pd.concat([tax_source_keys(old_permits), tax_source_keys(reprocess)]),
+                                  crosswalk))
+drop_keys |= set(pd.to_numeric(snap_changes['RECORD_ID'], errors='coerce').dropna().astype('int64'))
+
+# ==== GEOCODE AND MATCH CHANGED PERMITS ====
+reprocess = reprocess.reset_index(drop=True)
+reprocess['ID'] = reprocess.index.astype(str)
+if len(reprocess) > 0:
+    reprocess = geocode_permits(
+        reprocess, cache_path=args.cache, url=args.geocoder_url, batch_size=args.batch_size,
+        max_workers=args.workers, checkpoint_dir=args.checkpoint_dir
+    )
+    if args.tiger:
+        reprocess = fill_unmatched(reprocess, read_address_ranges(args.tiger))
+else:
+    reprocess = reprocess.assign(Latitude=None, Longitude=None, Match_Status=None, Match_Type=None)
+
+tax_unmatched = find_unmatched_tax(prepare_tax(reprocess), snap)
+tax_unmatched = tax_unmatched.drop(index=link_records(tax_unmatched, snap)[0].index.unique())
+if os.path.exists(args.county_boundaries):
+    tax_unmatched = clean_coordinates(tax_unmatched, counties=read_counties(args.county_boundaries),
+                                      county_fips=args.county_fips)
+else:
+    tax_unmatched = clean_coordinates(tax_unmatched)
+tax_unmatched = tax_unmatched.drop(index=find_spatial_duplicates(tax_unmatched, snap).index)
+tax_keys = tax_source_keys(tax_unmatched)
+tax_ids = assign_record_ids(tax_keys, tax_unmatched['TAX_COMPOSITE_KEY'], crosswalk)
+new_rows = [tax_to_snap_schema(tax_unmatched, tax_ids)]
+
+# Added and modified SNAP records go in as they are
+new_snap = snap_changes[snap_changes['CHANGE'] != CHANGE_REMOVED]
+new_rows.append(new_snap.drop(columns=['SNAP_COMPOSITE_KEY', 'CHANGE']))
+new_rows = pd.concat(new_rows, ignore_index=True)
+
+# ==== PATCH PUBLISHED FILES ====
+print("==== PATCHING PUBLISHED FILES ====")
+retail = read_artifact('foodRetailLocations')
+patched_retail = patch_rows(retail, drop_keys, new_rows)
+retail_file = write_artifact(patched_retail, 'foodRetailLocations')
+print(f"{retail_file}: {len(retail)} -> {len(patched_retail)} rows "
+      f"({(retail_row_keys(retail).isin(drop_keys)).sum()} replaced or removed, {len(new_rows)} added or updated)")
+
+# Only the new rows are classified, and of those only store names the classification
+# cache hasn't seen; everything else keeps its earlier classification
+new_cuisine = drop_excluded_stores(new_rows.reindex(columns=retail.columns))
+new_cuisine[HIERARCHY_COLUMNS] = classify_stores(new_cuisine, CUISINE_KEYWORDS, cache_dir=CACHE_DIR)
+cuisine = read_artifact('CuisineRetailLocations2')
+patched_cuisine = patch_rows(cuisine, drop_keys, new_cuisine)
+cuisine_file = write_artifact(patched_cuisine, 'CuisineRetailLocations2')
+print(f"{cuisine_file}: {len(cuisine)} -> {len(patched_cuisine)} rows "
+      f"({len(new_cuisine)} classified)")
+
+crosswalk = update_crosswalk(
+    crosswalk, pd.concat([new_snap['RECORD_ID'], tax_ids]), pd.concat([snap_source_keys(new_snap), tax_keys]),
+    pd.concat([new_snap['SNAP_COMPOSITE_KEY'], tax_unmatched['TAX_COMPOSITE_KEY']]), args.snapshot
+)
+print(f"RECORD_ID crosswalk saved to {save_crosswalk(crosswalk)}")
+
+# Only the stores that changed since the last recorded snapshot go into its change log
+try:
+    history = record_snapshot(patched_retail, args.snapshot, args.history_dir)
+    print(f"Store history for {args.snapshot}: {history['CHANGE'].value_counts().to_dict()}")
+    if untracked_stores(patched_retail):
+        print(f"{untracked_stores(patched_retail)} stores without a stable RECORD_ID were left out of the "
+              f"history; rerun merge.py to give them one")
+except ValueError as e:
+    print(f"Store history not updated: {e}")
@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+
+# Zoom levels of the web map tile quadtree the stores are counted at. A zoom z
+# tile is 1/2^z of the world's width: about 130 km across in Texas at zoom 8,
+# 8 km at 12 and 2 km at 14. Each tile splits into four at the next zoom.
+DENSITY_ZOOMS = (8, 10, 12, 14)
+
+# Attributes the counts are broken down by
+DENSITY_GROUP_COLUMNS = ['STORE_TYPE', 'CATEGORY', 'CUISINE_TYPE']
+
+# Latitude limit of the web mercator projection
+_MAX_LATITUDE = 85.05112878
+
+# Cell of stores without coordinates, kept so totals match the raw counts
+NO_CELL = -1
+
+
+def _spread_bits(values):
+    # Spreads the low 32 bits of values to the even bit positions of a uint64
+    v = values.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    for shift, mask in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF),
+                        (4, 0x0F0F0F0F0F0F0F0F), (2, 0x3333333333333333), (1, 0x5555555555555555)):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def _compact_bits(values):
+    # Inverse of _spread_bits
+    v = values.astype(np.uint64) & np.uint64(0x5555555555555555)
+    for shift, mask in ((1, 0x3333333333333333), (2, 0x0F0F0F0F0F0F0F0F), (4, 0x00FF00FF00FF00FF),
+                        (8, 0x0000FFFF0000FFFF), (16, 0x00000000FFFFFFFF)):
+        v = (v | (v >> np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def tile_xy(lat, lon, zoom):
+    """
+    Web map tile column and row of each point at a zoom level.
+    """
+    lat = np.clip(np.asarray(lat, dtype=float), -_MAX_LATITUDE, _MAX_LATITUDE)
+    lon = np.asarray(lon, dtype=float)
+    n = 2 ** zoom
+    x = np.floor((lon + 180) / 360 * n)
+    y = np.floor((1 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2 * n)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+
+def cell_ids(lat, lon, zoom):
+    """
+    Quadtree cell of each point at a zoom level, as the integer form of its
+    quadkey (tile column and row bits interleaved), or NO_CELL when the
+    point has no coordinates. The cell containing it at a coarser zoom z is
+    cell >> 2 * (zoom - z).
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    missing = np.isnan(lat) | np.isnan(lon)
+    x, y = tile_xy(np.where(missing, 0, lat), np.where(missing, 0, lon), zoom)
+    cells = (_spread_bits(x) | (_spread_bits(y) << np.uint64(1))).astype(np.int64)
+    return np.where(missing, NO_CELL, cells)
+
+
+def parent_cells(cells, zoom, parent_zoom):
+    """
+    Cells at parent_zoom containing the given cells at zoom.
+    """
+    cells = np.asarray(cells, dtype=np.int64)
+    return np.where(cells == NO_CELL, NO_CELL, cells >> (2 * (zoom - parent_zoom)))
+
+
+def cell_bounds(cells, zoom):
+    """
+    Returns (south, west, north, east) arrays of the cells' corners in degrees.
+    """
+    cells = np.asarray(cells, dtype=np.int64).astype(np.uint64)
+    x = _compact_bits(cells).astype(float)
+    y = _compact_bits(cells >> np.uint64(1)).astype(float)
+    n = 2 ** zoom
+
+    def latitude(row):
+        return np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * row / n))))
+
+    return latitude(y + 1), x / n * 360 - 180, latitude(y), (x + 1) / n * 360 - 180
+
+
+def density_pyramid(stores, zooms=DENSITY_ZOOMS, group_cols=DENSITY_GROUP_COLUMNS):
+    """
+    Store counts per quadtree cell and combination of group_cols, at every
+    zoom in zooms. Stores are counted once at the finest zoom and each
+    coarser level is summed from the one below it.
+    Returns ZOOM, CELL, the group columns (as categoricals, missing values
+    kept) and STORES, sorted by ZOOM and CELL; no rows when there are no
+    stores.
+    """
+    zooms = sorted(zooms, reverse=True)
+    lat = pd.to_numeric(stores['LATITUDE'], errors='coerce').to_numpy()
+    lon = pd.to_numeric(stores['LONGITUDE'], errors='coerce').to_numpy()
+
+    keys = stores[group_cols].astype('category')
+    keys.insert(0, 'CELL', cell_ids(lat, lon, zooms[0]))
+    level = keys.groupby(list(keys.columns), dropna=False, observed=True).size().rename('STORES').reset_index()
+
+    levels = []
+    for previous, zoom in zip([None] + zooms, zooms):
+        if previous is not None:
+            level = level.assign(CELL=parent_cells(level['CELL'], previous, zoom))
+            level = level.groupby(['CELL'] + group_cols, dropna=False, observed=True)['STORES'].sum().reset_index()
+        levels.append(level.assign(ZOOM=np.int8(zoom)))
+
+    pyramid = pd.concat(levels, ignore_index=True)
+    pyramid['STORES'] = pyramid['STORES'].astype(np.int32)
+    pyramid = pyramid[['ZOOM', 'CELL'] + group_cols + ['STORES']]
+    return pyramid.sort_values(['ZOOM', 'CELL'], kind='stable').reset_index(drop=True)
+
+
+def cell_counts(pyramid, zoom, **filters):
+    """
+    Stores per cell at a zoom, counting only the rows whose group columns
+    match filters (a value or a list of values), e.g.
+    cell_counts(pyramid, 12, STORE_TYPE='Supermarket', CATEGORY=['Americas', 'Asia']).
+    Returns CELL and STORES.
+    """
+    rows = pyramid[pyramid['ZOOM'] == zoom]
+    for col, value in filters.items():
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        rows = rows[rows[col].isin(values)]
+    return rows.groupby('CELL', observed=True)['STORES'].sum().reset_index()
+
+
+def totals(pyramid, by, **filters):
+    """
+    Store counts by one or more group columns over the whole area, the
+    pre-aggregated equivalent of value_counts. Stores without coordinates
+    are included.
+    """
+    rows = pyramid[pyramid['ZOOM'] == pyramid['ZOOM'].min()]
+    for col, value in filters.items():
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        rows = rows[rows[col].isin(values)]
+    return rows.groupby(by, dropna=False, observed=True)['STORES'].sum().sort_values(ascending=False)
+
+
+def cells_geojson(counts, zoom):
+    """
+    GeoJSON FeatureCollection of the cells in a cell_counts result, with CELL
+    and STORES properties, for choropleth maps (e.g. folium.Choropleth with
+    key_on='feature.properties.CELL').
+    """
+    counts = counts[counts['CELL'] != NO_CELL]
+    south, west, north, east = cell_bounds(counts['CELL'].to_numpy(), zoom)
+    features = []
+    for cell, stores, s, w, n, e in zip(counts['CELL'].tolist(), counts['STORES'].tolist(),
+                                        south.tolist(), west.tolist(), north.tolist(), east.tolist()):
+        features.append({
+            'type': 'Feature',
+            'properties': {'CELL': cell, 'STORES': stores},
+            'geometry': {'type': 'Polygon', 'coordinates': [[[w, s], [e, s], [e, n], [w, n], [w, s]]]},
+        })
+    return {'type': 'FeatureCollection', 'features': features}
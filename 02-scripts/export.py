@@ -0,0 +1,14 @@
+import argparse
+
+from artifacts import DATA_DIR, export_artifact
+
+parser = argparse.ArgumentParser(description="Export pipeline artifacts (Parquet) as CSV or XLSX")
+parser.add_argument('artifacts', nargs='+',
+                    help="Artifact names, e.g. foodRetailLocations CuisineRetailLocations2")
+parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv',
+                    help="xlsx needs openpyxl installed")
+parser.add_argument('--data-dir', default=DATA_DIR)
+args = parser.parse_args()
+
+for name in args.artifacts:
+    print(f"Exported {name} to {export_artifact(name, args.format, data_dir=args.data_dir)}")
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+from boundaries import TRACT_GEOID_LENGTH
+from spatial_index import nearest_within
+
+# Store types that count as a supermarket, supercenter or large grocery store
+SUPERMARKET_STORE_TYPES = ['Supermarket', 'Super Store']
+
+# Columns of the retail locations needed to find and report supermarkets
+STORE_COLUMNS = ['RECORD_ID', 'STORE_NAME', 'STORE_TYPE', 'LATITUDE', 'LONGITUDE']
+
+# Distances reported for every population point; 1 and 10 miles are the USDA
+# urban and rural low-access distances, 0.5 miles its walking distance
+ACCESS_RADII_MILES = (0.5, 1, 10)
+
+# USDA urban low-access tract: at least 500 people, or a third of the population,
+# more than one mile from the nearest supermarket
+LOW_ACCESS_MILES = 1
+LOW_ACCESS_MIN_POPULATION = 500
+LOW_ACCESS_MIN_SHARE = 1 / 3
+
+
+def radius_label(miles):
+    """
+    Column suffix for a distance: 0.5 -> '0_5MI', 10 -> '10MI'.
+    """
+    return f'{miles:g}'.replace('.', '_') + 'MI'
+
+
+def select_supermarkets(stores, store_types=SUPERMARKET_STORE_TYPES):
+    """
+    Returns the stores of the given STORE_TYPEs that have coordinates.
+    """
+    supermarkets = stores[stores['STORE_TYPE'].isin(store_types)].copy()
+    supermarkets['LATITUDE'] = pd.to_numeric(supermarkets['LATITUDE'], errors='coerce')
+    supermarkets['LONGITUDE'] = pd.to_numeric(supermarkets['LONGITUDE'], errors='coerce')
+    return supermarkets.dropna(subset=['LATITUDE', 'LONGITUDE']).reset_index(drop=True)
+
+
+def read_population(file_path, lat_col='LATITUDE', lon_col='LONGITUDE', pop_col='POPULATION',
+                    tract_col='TRACT', geoid_col='GEOID'):
+    """
+    Reads a population grid or block/block group centroid file.
+    The tract comes from tract_col if present, else from the first 11 digits
+    of geoid_col, else from the STATEFP, COUNTYFP and TRACTCE columns of the
+    Census centers of population files.
+    Returns TRACT, POPULATION, LATITUDE and LONGITUDE columns.
+    """
+    header = pd.read_csv(file_path, nrows=0).columns
+    if tract_col in header:
+        tract_cols = [tract_col]
+    elif geoid_col in header:
+        tract_cols = [geoid_col]
+    elif {'STATEFP', 'COUNTYFP', 'TRACTCE'} <= set(header):
+        tract_cols = ['STATEFP', 'COUNTYFP', 'TRACTCE']
+    else:
+        raise ValueError(f"{file_path} has no {tract_col}, {geoid_col} or STATEFP/COUNTYFP/TRACTCE columns")
+
+    df = pd.read_csv(file_path, usecols=[lat_col, lon_col, pop_col] + tract_cols,
+                     dtype={col: str for col in tract_cols})
+    if tract_cols == [tract_col]:
+        tract = df[tract_col]
+    elif tract_cols == [geoid_col]:
+        tract = df[geoid_col].str[:TRACT_GEOID_LENGTH]
+    else:
+        tract = df['STATEFP'].str.zfill(2) + df['COUNTYFP'].str.zfill(3) + df['TRACTCE'].str.zfill(6)
+
+    return pd.DataFrame({
+        'TRACT': tract,
+        'POPULATION': pd.to_numeric(df[pop_col], errors='coerce').fillna(0),
+        'LATITUDE': pd.to_numeric(df[lat_col], errors='coerce'),
+        'LONGITUDE': pd.to_numeric(df[lon_col], errors='coerce'),
+    })
+
+
+def point_access(points, supermarkets, radii=ACCESS_RADII_MILES, cell_miles=0.25):
+    """
+    Adds the nearest supermarket (RECORD_ID, name, distance in miles) and the
+    number of supermarkets within each radius to every population point.
+    """
+    nearest, distance, counts = nearest_within(
+        points['LATITUDE'].to_numpy(), points['LONGITUDE'].to_numpy(),
+        supermarkets['LATITUDE'].to_numpy(), supermarkets['LONGITUDE'].to_numpy(),
+        radii, cell_miles
+    )
+    found = nearest >= 0
+    # np.where evaluates both branches, so points without a supermarket index the first
+    # one; with no supermarkets at all there is nothing to index
+    at_nearest = np.where(found, nearest, 0)
+    points = points.copy()
+    for col, store_col in [('NEAREST_STORE_RECORD_ID', 'RECORD_ID'), ('NEAREST_STORE_NAME', 'STORE_NAME')]:
+        if len(supermarkets):
+            points[col] = np.where(found, supermarkets[store_col].to_numpy()[at_nearest], None)
+        else:
+            points[col] = None
+    points['NEAREST_STORE_MILES'] = distance
+    for j, radius in enumerate(radii):
+        points[f'STORES_WITHIN_{radius_label(radius)}'] = counts[:, j]
+    return points
+
+
+def tract_low_access(points, radii=ACCESS_RADII_MILES, low_access_miles=LOW_ACCESS_MILES,
+                     min_population=LOW_ACCESS_MIN_POPULATION, min_share=LOW_ACCESS_MIN_SHARE):
+    """
+    Aggregates point_access output to tracts: population, population-weighted
+    mean distance to the nearest supermarket, and for each radius the
+    population (and share of it) farther than that from any supermarket.
+    LOW_ACCESS flags tracts meeting the USDA low-access test at
+    low_access_miles. Points without coordinates are left out.
+    """
+    points = points.dropna(subset=['NEAREST_STORE_MILES'])
+    population = points['POPULATION']
+    columns = {
+        'POPULATION': population,
+        'POINTS': 1,
+        'WEIGHTED_MILES': points['NEAREST_STORE_MILES'] * population,
+    }
+    for radius in radii:
+        far = points['NEAREST_STORE_MILES'] > radius
+        columns[f'LOW_ACCESS_POP_{radius_label(radius)}'] = population.where(far, 0)
+    columns['LOW_ACCESS_TEST_POP'] = population.where(points['NEAREST_STORE_MILES'] > low_access_miles, 0)
+
+    tracts = pd.DataFrame(columns).groupby(points['TRACT']).sum()
+    total = tracts['POPULATION'].replace(0, np.nan)
+    tracts['MEAN_NEAREST_STORE_MILES'] = tracts.pop('WEIGHTED_MILES') / total
+    for radius in radii:
+        label = radius_label(radius)
+        tracts[f'LOW_ACCESS_SHARE_{label}'] = (tracts[f'LOW_ACCESS_POP_{label}'] / total).fillna(0)
+
+    far_population = tracts.pop('LOW_ACCESS_TEST_POP')
+    tracts['LOW_ACCESS'] = (
+        (far_population >= min_population) | ((far_population / total).fillna(0) >= min_share)
+    )
+    return tracts.reset_index()
@@ -0,0 +1,108 @@
+import sqlite3
+import time
+
+import pandas as pd
+
+from address_normalize import normalize_city, normalize_street, zip5
+
+CACHE_PATH = "../local-data/geocode_cache.sqlite"
+
+# Matches are kept for half a year; failed lookups are retried sooner in case
+# the Census address ranges were updated
+TTL_DAYS = 180
+NO_MATCH_TTL_DAYS = 30
+
+CACHE_COLUMNS = ['Latitude', 'Longitude', 'Match_Status', 'Match_Type', 'Benchmark']
+
+
+def address_keys(address, city, state, zip_code):
+    """
+    Builds the cache key from address columns with the address_normalize
+    rules the record matching uses, so suffix, directional and unit
+    variants of an address ('123 North Main Street Ste 4') share one entry.
+    Returns a Series of 'STREET|CITY|STATE|ZIP5' strings.
+    """
+    return (normalize_street(address) + '|' + normalize_city(city) + '|' + normalize_city(state)
+            + '|' + zip5(zip_code))
+
+
+def open_cache(path=CACHE_PATH):
+    """
+    Opens (and creates if needed) the SQLite geocode cache.
+    """
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS geocode_cache (
+            address_key TEXT PRIMARY KEY,
+            latitude REAL,
+            longitude REAL,
+            match_status TEXT,
+            match_type TEXT,
+            benchmark TEXT,
+            geocoded_at REAL
+        )
+    """)
+    return conn
+
+
+def lookup(conn, keys, benchmark, ttl_days=TTL_DAYS, no_match_ttl_days=NO_MATCH_TTL_DAYS):
+    """
+    Looks up address keys in the cache.
+    Entries from another benchmark or older than their TTL count as misses.
+    Returns a DataFrame indexed by address_key with CACHE_COLUMNS.
+    """
+    now = time.time()
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (address_key TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM wanted")
+    conn.executemany("INSERT OR IGNORE INTO wanted VALUES (?)", ((key,) for key in keys))
+    hits = pd.read_sql_query(
+        """
+        SELECT c.address_key, c.latitude AS Latitude, c.longitude AS Longitude,
+               c.match_status AS Match_Status, c.match_type AS Match_Type,
+               c.benchmark AS Benchmark
+        FROM geocode_cache c JOIN wanted w ON c.address_key = w.address_key
+        WHERE c.benchmark = ?
+          AND c.geocoded_at >= CASE WHEN c.match_status = 'Match' THEN ? ELSE ? END
+        """,
+        conn,
+        params=(benchmark, now - ttl_days * 86400, now - no_match_ttl_days * 86400),
+    )
+    return hits.set_index('address_key')
+
+
+def store(conn, results, benchmark):
+    """
+    Writes geocoder results (indexed by address_key, with Latitude,
+    Longitude, Match_Status, Match_Type) into the cache, replacing older entries.
+    """
+    now = time.time()
+    rows = [
+        (key,
+         None if pd.isna(row.Latitude) else float(row.Latitude),
+         None if pd.isna(row.Longitude) else float(row.Longitude),
+         None if pd.isna(row.Match_Status) else row.Match_Status,
+         None if pd.isna(row.Match_Type) else row.Match_Type,
+         benchmark, now)
+        for key, row in zip(results.index, results[CACHE_COLUMNS[:4]].itertuples(index=False))
+    ]
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO geocode_cache VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def invalidate(conn, older_than_days=None, benchmark=None):
+    """
+    Deletes cache entries older than older_than_days and/or entries from a
+    given benchmark. With no arguments the whole cache is cleared.
+    Returns the number of entries removed.
+    """
+    clauses, params = [], []
+    if older_than_days is not None:
+        clauses.append("geocoded_at < ?")
+        params.append(time.time() - older_than_days * 86400)
+    if benchmark is not None:
+        clauses.append("benchmark = ?")
+        params.append(benchmark)
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    with conn:
+        removed = conn.execute("DELETE FROM geocode_cache" + where, params).rowcount
+    return removed
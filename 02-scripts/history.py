@@ -0,0 +1,68 @@
+import argparse
+import time
+
+from artifacts import read_artifact, read_table
+from store_history import (
+    CHANGE_OPENED, HISTORY_DIR, as_of, count_changes, openings_and_closures, record_snapshot,
+    recorded_snapshots, untracked_stores
+)
+
+parser = argparse.ArgumentParser(
+    description="Record snapshots of foodRetailLocations as change logs and query the store history"
+)
+parser.add_argument('--history-dir', default=HISTORY_DIR)
+commands = parser.add_subparsers(dest='command', required=True)
+
+record_parser = commands.add_parser('record', help="Record the current retail locations as a snapshot")
+record_parser.add_argument('--snapshot', default=time.strftime('%Y-%m-%d'), help="Snapshot date (YYYY-MM-DD)")
+record_parser.add_argument('--stores', help="Retail locations file (default: the foodRetailLocations artifact)")
+
+as_of_parser = commands.add_parser('as-of', help="Stores open on a date")
+as_of_parser.add_argument('date', help="Date (YYYY-MM-DD)")
+as_of_parser.add_argument('--by', nargs='+', default=['STORE_TYPE'], help="Columns to count the stores by")
+as_of_parser.add_argument('--output', help="CSV file for the stores")
+
+changes_parser = commands.add_parser('changes', help="Stores opened or closed between two dates")
+changes_parser.add_argument('start', help="Changes after this date (YYYY-MM-DD)")
+changes_parser.add_argument('end', nargs='?', default=time.strftime('%Y-%m-%d'),
+                            help="Changes up to this date (default: today)")
+changes_parser.add_argument('--zip', nargs='+', help="ZIP codes to keep")
+changes_parser.add_argument('--city', nargs='+', help="Cities to keep (any case)")
+changes_parser.add_argument('--store-type', nargs='+', help="Store types to keep")
+changes_parser.add_argument('--by', nargs='+', default=['ZIP_CODE', 'STORE_TYPE'],
+                            help="Columns to count openings and closures by")
+changes_parser.add_argument('--output', help="CSV file for the changed stores")
+args = parser.parse_args()
+
+if args.command == 'record':
+    # Read at full precision, so coordinates compare equal to those recorded by delta_refresh.py
+    stores = read_table(args.stores) if args.stores else read_artifact('foodRetailLocations')
+    untracked = untracked_stores(stores)
+    if untracked:
+        print(f"{untracked} of {len(stores)} stores have no stable RECORD_ID and are left out of the history; "
+              f"rerun merge.py to give them one")
+    start = time.perf_counter()
+    changes = record_snapshot(stores, args.snapshot, args.history_dir)
+    print(f"Recorded snapshot {args.snapshot} of {len(stores)} stores in {time.perf_counter() - start:.1f}s: "
+          f"{changes['CHANGE'].value_counts().to_dict()}")
+    print(f"Snapshots recorded: {', '.join(recorded_snapshots(args.history_dir))}")
+
+elif args.command == 'as-of':
+    state = as_of(args.date, args.history_dir)
+    print(f"Stores open on {args.date}: {len(state)}")
+    if len(state):
+        print(state.groupby(args.by, dropna=False).size().sort_values(ascending=False).to_string())
+    if args.output:
+        state.to_csv(args.output, index=False)
+        print(f"Stores saved to {args.output}")
+
+else:
+    changes = openings_and_closures(args.start, args.end, args.history_dir, ZIP_CODE=args.zip,
+                                    CITY=args.city, STORE_TYPE=args.store_type)
+    opened = (changes['CHANGE'] == CHANGE_OPENED).sum()
+    print(f"After {args.start} up to {args.end}: {opened} opened, {len(changes) - opened} closed")
+    if len(changes):
+        print(count_changes(changes, args.by).to_string(index=False))
+    if args.output:
+        changes.to_csv(args.output, index=False)
+        print(f"Changed stores saved to {args.output}")
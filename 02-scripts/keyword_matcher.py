@@ -0,0 +1,44 @@
+import re
+
+
+def build_keyword_matcher(keyword_lists):
+    """
+    Compiles a keyword table into a single regex, once, instead of building
+    one pattern per keyword per row.
+    keyword_lists maps each cuisine to its keywords, in priority order.
+    Returns a function that takes a lowercased store name and returns the
+    highest-priority cuisine with a keyword in it (or None).
+    """
+    cuisines = list(keyword_lists)
+
+    # Keep the first cuisine a keyword belongs to, so shared keywords
+    # (e.g. 'bbq') still resolve in dict order
+    keyword_priority = {}
+    for priority, cuisine in enumerate(cuisines):
+        for keyword in keyword_lists[cuisine]:
+            keyword_priority.setdefault(keyword, priority)
+
+    # Alternatives are grouped by first character, so only one group can
+    # apply at any position, and ordered by priority inside each group.
+    # The lookahead makes every match zero-width, so each word start is tried
+    # and overlapping keywords are never hidden behind an earlier match.
+    by_first_char = {}
+    for keyword in sorted(keyword_priority, key=keyword_priority.get):
+        by_first_char.setdefault(keyword[0], []).append(keyword[1:])
+    alternation = '|'.join(
+        re.escape(first) + '(?:' + '|'.join(re.escape(rest) for rest in rests) + ')'
+        for first, rests in by_first_char.items()
+    )
+    pattern = re.compile(r'(?<![a-z])(?=(' + alternation + r')(?![a-z]))')
+
+    def match(store_name):
+        best = None
+        for hit in pattern.finditer(store_name):
+            priority = keyword_priority[hit.group(1)]
+            if best is None or priority < best:
+                best = priority
+                if best == 0:
+                    break
+        return cuisines[best] if best is not None else None
+
+    return match
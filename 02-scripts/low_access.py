@@ -0,0 +1,52 @@
+import argparse
+import time
+
+from artifacts import write_table
+from food_access import (
+    ACCESS_RADII_MILES, LOW_ACCESS_MILES, STORE_COLUMNS, SUPERMARKET_STORE_TYPES, point_access,
+    read_population, select_supermarkets, tract_low_access
+)
+from retail_schema import read_stores
+
+parser = argparse.ArgumentParser(
+    description="Distance from population points to the nearest supermarket, aggregated to "
+                "tract-level low-access (food desert) metrics"
+)
+parser.add_argument('--population', required=True,
+                    help="Population grid or block/block group centroid CSV")
+parser.add_argument('--stores', help="Retail locations file (default: the foodRetailLocations artifact)")
+parser.add_argument('--store-types', nargs='+', default=SUPERMARKET_STORE_TYPES,
+                    help="STORE_TYPE values counted as supermarkets")
+parser.add_argument('--lat-col', default='LATITUDE')
+parser.add_argument('--lon-col', default='LONGITUDE')
+parser.add_argument('--pop-col', default='POPULATION')
+parser.add_argument('--tract-col', default='TRACT')
+parser.add_argument('--geoid-col', default='GEOID',
+                    help="Block or block group GEOID to take the tract from when there is no tract column")
+parser.add_argument('--low-access-miles', type=float, default=LOW_ACCESS_MILES)
+parser.add_argument('--points-output',
+                    help="Also write the per-point distances and counts here (.parquet or .csv)")
+parser.add_argument('--output', default="../local-data/tract_low_access.csv")
+args = parser.parse_args()
+
+stores = read_stores('foodRetailLocations', STORE_COLUMNS, path=args.stores)
+supermarkets = select_supermarkets(stores, args.store_types)
+print(f"Supermarkets ({', '.join(args.store_types)}): {len(supermarkets)}")
+
+points = read_population(args.population, args.lat_col, args.lon_col, args.pop_col,
+                         args.tract_col, args.geoid_col)
+print(f"Population points: {len(points)} ({points['POPULATION'].sum():,.0f} people)")
+print(f"Points missing coordinates: {points['LATITUDE'].isna().sum()}")
+
+start = time.perf_counter()
+points = point_access(points, supermarkets, ACCESS_RADII_MILES)
+print(f"Nearest supermarket distances computed in {time.perf_counter() - start:.1f}s")
+
+tracts = tract_low_access(points, ACCESS_RADII_MILES, args.low_access_miles)
+print(f"Tracts: {len(tracts)}, low access: {tracts['LOW_ACCESS'].sum()}")
+
+tracts.to_csv(args.output, index=False)
+print(f"Tract metrics saved to {args.output}")
+if args.points_output:
+    write_table(points, args.points_output)
+    print(f"Point metrics saved to {args.points_output}")
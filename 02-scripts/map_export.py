@@ -0,0 +1,149 @@
+import argparse
+import json
+import time
+
+import folium
+import numpy as np
+import pandas as pd
+from folium.plugins import FastMarkerCluster
+
+from density_grid import cell_counts, cells_geojson
+from retail_schema import read_stores
+
+MAP_CENTER = [32.7767, -96.7970]
+
+# Marker colors, cycled over the layers
+MARKER_COLORS = ['#d63e2a', '#38aadd', '#72b026', '#d252b9', '#f69730', '#a23336', '#ff8e7f',
+                 '#ffcb92', '#0067a3', '#728224', '#436978', '#5b396b', '#575757', '#ff91ea',
+                 '#8adaff', '#bbf970', '#a3a3a3', '#303030']
+
+# Fields shown in a store's popup, when present
+POPUP_COLUMNS = ['STORE_NAME', 'STORE_TYPE', 'CUISINE_TYPE', 'STORE_STREET_ADDRESS', 'CITY']
+
+# Coordinates are rounded to 5 decimals (about a meter), which is plenty for a
+# store marker and keeps the embedded data small
+COORDINATE_DECIMALS = 5
+
+# Largest HTML file export_map writes; browsers stay responsive well below this
+MAP_SIZE_BUDGET_BYTES = 15_000_000
+
+# Builds each marker on the client from its data row [lat, lon, *popup fields].
+# The popup content is a function, so Leaflet only builds it when it is opened.
+# The layer's own value is the same for every row, so it is written once here.
+_MARKER_CALLBACK = """function (row) {
+    var fields = %(fields)s;
+    var group = %(group)s;
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+        radius: 6, weight: 1, color: '%(color)s', fillColor: '%(color)s', fillOpacity: 0.8
+    });
+    marker.bindPopup(function () {
+        var popup = document.createElement('div');
+        for (var i = 0; i < fields.length; i++) {
+            var value = row[i + 2];
+            if (value === null || value === '') { continue; }
+            var line = document.createElement(i === 0 ? 'b' : 'div');
+            line.textContent = i === 0 ? value : fields[i] + ': ' + value;
+            popup.appendChild(line);
+        }
+        var groupLine = document.createElement('div');
+        groupLine.textContent = group;
+        popup.appendChild(groupLine);
+        return popup;
+    }, {maxWidth: 300});
+    return marker;
+}"""
+
+
+def marker_rows(stores, popup_columns, decimals=COORDINATE_DECIMALS):
+    """
+    Data rows for FastMarkerCluster: [lat, lon, *popup fields], with missing
+    popup values as None. Stores without coordinates are left out.
+    """
+    lat = pd.to_numeric(stores['LATITUDE'], errors='coerce').astype(float).round(decimals)
+    lon = pd.to_numeric(stores['LONGITUDE'], errors='coerce').astype(float).round(decimals)
+    located = lat.notna().to_numpy() & lon.notna().to_numpy()
+
+    fields = stores.loc[located, popup_columns].astype(object)
+    fields = fields.where(fields.notna(), None)
+    coords = np.column_stack([lat.to_numpy()[located], lon.to_numpy()[located]]).tolist()
+    return [coord + values for coord, values in zip(coords, fields.to_numpy().tolist())]
+
+
+def store_map(stores, group_col='CUISINE_TYPE', popup_columns=POPUP_COLUMNS,
+              center=MAP_CENTER, zoom_start=10, show=False):
+    """
+    Map of the stores with one clustered marker layer per value of group_col,
+    switchable in the layer control. Markers are created in the browser from
+    compact data rows instead of one folium.Marker each.
+    """
+    popup_columns = [col for col in popup_columns if col in stores.columns and col != group_col]
+    retail_map = folium.Map(location=center, zoom_start=zoom_start)
+
+    groups = stores[group_col].astype('string').fillna('Unknown')
+    for i, (group, group_stores) in enumerate(stores.groupby(groups, sort=True)):
+        callback = _MARKER_CALLBACK % {
+            'fields': json.dumps([col.replace('_', ' ').title() for col in popup_columns]),
+            'group': json.dumps(f"{group_col.replace('_', ' ').title()}: {group}"),
+            'color': MARKER_COLORS[i % len(MARKER_COLORS)],
+        }
+        layer = FastMarkerCluster([], callback=callback, name=f"{group} ({len(group_stores)})",
+                                  show=show, chunkedLoading=True)
+        # Set after construction: the constructor validates every row in Python,
+        # which marker_rows already guarantees
+        layer.data = marker_rows(group_stores, popup_columns)
+        layer.add_to(retail_map)
+
+    folium.LayerControl(collapsed=False).add_to(retail_map)
+    return retail_map
+
+
+def density_map(pyramid, zoom, center=MAP_CENTER, zoom_start=10, **filters):
+    """
+    Choropleth of store counts per quadtree cell from a density pyramid (see
+    density_grid.density_pyramid), optionally filtered like cell_counts.
+    """
+    counts = cell_counts(pyramid, zoom, **filters)
+    retail_map = folium.Map(location=center, zoom_start=zoom_start)
+    folium.Choropleth(
+        geo_data=cells_geojson(counts, zoom), data=counts, columns=['CELL', 'STORES'],
+        key_on='feature.properties.CELL', fill_color='YlOrRd', fill_opacity=0.6, line_weight=0,
+        legend_name=f"Stores per zoom {zoom} cell"
+    ).add_to(retail_map)
+    return retail_map
+
+
+def export_map(stores, output, group_col='CUISINE_TYPE', popup_columns=POPUP_COLUMNS,
+               max_bytes=MAP_SIZE_BUDGET_BYTES, **kwargs):
+    """
+    Writes store_map as a standalone HTML file and returns its size in bytes.
+    Raises ValueError, without writing, if the file would exceed max_bytes.
+    """
+    html = store_map(stores, group_col, popup_columns, **kwargs).get_root().render()
+    size = len(html.encode('utf-8'))
+    if max_bytes is not None and size > max_bytes:
+        raise ValueError(
+            f"Map would be {size / 1e6:.1f} MB, over the {max_bytes / 1e6:.1f} MB budget; "
+            f"use fewer popup columns or fewer stores"
+        )
+    with open(output, 'w', encoding='utf-8') as f:
+        f.write(html)
+    return size
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export retail locations as an interactive clustered map")
+    parser.add_argument('--stores', help="Retail locations file (default: the CuisineRetailLocations2 artifact)")
+    parser.add_argument('--group-col', default='CUISINE_TYPE',
+                        help="Column giving each store's layer, e.g. STORE_TYPE")
+    parser.add_argument('--popup-columns', nargs='+', default=POPUP_COLUMNS)
+    parser.add_argument('--max-mb', type=float, default=MAP_SIZE_BUDGET_BYTES / 1e6,
+                        help="Output size budget in MB")
+    parser.add_argument('--output', default="../graphs/cuisine_map.html")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stores = read_stores('CuisineRetailLocations2', path=args.stores)
+    size = export_map(stores, args.output, args.group_col, args.popup_columns,
+                      max_bytes=int(args.max_mb * 1e6))
+    print(f"Map of {len(stores)} stores ({stores[args.group_col].nunique()} layers) saved to "
+          f"{args.output}: {size / 1e6:.1f} MB in {time.perf_counter() - start:.1f}s")
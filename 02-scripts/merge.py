@@ -1,156 +1,130 @@
-import pandas as pd 
-import uuid
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from artifacts import artifact_path, read_artifact, write_artifact
+from boundaries import COUNTIES_FILE, DALLAS_COUNTY_FIPS, read_counties
+from record_ids import (
+    assign_record_ids, load_crosswalk, save_crosswalk, snap_source_keys, tax_source_keys, update_crosswalk
+)
+from record_linkage import LINKAGE_MIN_NAME_SIMILARITY, link_records
+from retail_merge import (
+    DEDUP_MIN_NAME_SIMILARITY, DEDUP_RADIUS_MILES, TAX_COLUMNS, clean_coordinates, combine_records,
+    find_spatial_duplicates, find_unmatched_tax, prepare_snap, prepare_tax, tax_to_snap_schema
+)
+from run_report import count_rows, record, start_run, step, write_run_report
+
+parser = argparse.ArgumentParser(description="Merge SNAP retailers with geocoded tax permits")
+parser.add_argument('--dedup-radius-miles', type=float, default=DEDUP_RADIUS_MILES,
+                    help="Tax records this close to a similarly named SNAP store are duplicates")
+parser.add_argument('--min-name-similarity', type=float, default=DEDUP_MIN_NAME_SIMILARITY,
+                    help="Name similarity (0-1) needed for a nearby SNAP store to count as the same store")
+parser.add_argument('--link-min-name-similarity', type=float, default=LINKAGE_MIN_NAME_SIMILARITY,
+                    help="Name similarity (0-1) needed to link a tax record to a SNAP store in the "
+                         "same ZIP and house number or geohash cell")
+parser.add_argument('--county-boundaries', default=COUNTIES_FILE,
+                    help="County boundaries (GeoJSON) to keep the tax records inside; without the file, "
+                         "records are checked against a Dallas area lat/lon box")
+parser.add_argument('--county-fips', default=DALLAS_COUNTY_FIPS, help="County the merged records must be in")
+parser.add_argument('--snapshot', default=time.strftime('%Y-%m-%d'),
+                    help="Label of the source snapshots, recorded in the RECORD_ID crosswalk")
+args = parser.parse_args()
+start_run('merge')
 
 # Read the datasets
-snap = pd.read_csv("../local-data/SNAP_Retailer_Location_data.csv", encoding='latin-1')
-tax = pd.read_csv("../local-data/final_geocoded_output.csv")  # Using the geocoded output
+with step('load') as s:
+    snap = pd.read_csv("../local-data/SNAP_Retailer_Location_data.csv", encoding='latin-1')
+    tax = read_artifact("final_geocoded_output", columns=TAX_COLUMNS)  # Using the geocoded output
+    s['rows_out'] = len(snap) + len(tax)
 
 # Filter SNAP data for Dallas County, TX
+snap_rows = len(snap)
 snap = snap[(snap['County'] == 'DALLAS') & (snap['State'] == 'TX')]
+count_rows('snap_dallas_county', snap_rows, len(snap))
 
-# Standardize column names - convert to uppercase and replace spaces with underscores
-snap.columns = snap.columns.str.upper().str.replace(' ', '_')
-tax.columns = tax.columns.str.upper().str.replace(' ', '_')
-
-# Standardize address fields to uppercase for better matching
-snap_upper_cols = ['STORE_STREET_ADDRESS', 'CITY', 'STATE']
-for col in snap_upper_cols:
-    if col in snap.columns:
-        snap[col] = snap[col].astype(str).str.upper()
-
-tax_upper_cols = ['OUTLET_ADDRESS', 'OUTLET_CITY', 'OUTLET_STATE']
-for col in tax_upper_cols:
-    if col in tax.columns:
-        tax[col] = tax[col].astype(str).str.upper()
-
-# Create composite keys for matching
-snap['SNAP_COMPOSITE_KEY'] = (
-    snap['STORE_STREET_ADDRESS'].astype(str) + " " + 
-    snap['CITY'].astype(str) + " " + 
-    snap['STATE'].astype(str)
-)
-
-tax['TAX_COMPOSITE_KEY'] = (
-    tax['OUTLET_ADDRESS'].astype(str) + " " +  
-    tax['OUTLET_CITY'].astype(str) + " " + 
-    tax['OUTLET_STATE'].astype(str)
-)
-
-# Enhanced NAICS to store type mapping
-naics_to_store_type = {
-    445110: 'Supermarket',
-    445120: 'Convenience Store',
-    445210: 'Meat Market',
-    445220: 'Seafood Market',
-    445230: 'Produce Market',
-    445291: 'Bakery',
-    445292: 'Confectionery',
-    445299: 'Specialty Food',
-    445310: 'Liquor Store',
-    445000: 'Food Store',
-    445100: 'Grocery Store'
-}
-
-# Convert NAICS codes to numeric and map to store types
-tax['OUTLET_NAICS_CODE_NUMERIC'] = pd.to_numeric(tax['OUTLET_NAICS_CODE'], errors='coerce')
-tax['STORE_TYPE'] = tax['OUTLET_NAICS_CODE_NUMERIC'].map(naics_to_store_type)
-
-# Fill remaining unmapped with 'Other'
-tax['STORE_TYPE'] = tax['STORE_TYPE'].fillna('Other')
+# Standardize column names and address fields, create composite keys for matching
+# and map NAICS codes to store types
+with step('prepare', rows_in=len(snap) + len(tax)):
+    snap = prepare_snap(snap)
+    tax = prepare_tax(tax)
 
 # Find unmatched tax records
-tax_unmatched = tax[~tax['TAX_COMPOSITE_KEY'].isin(snap['SNAP_COMPOSITE_KEY'])].copy()
+with step('address_match', rows_in=len(tax)) as s:
+    tax_unmatched = find_unmatched_tax(tax, snap)
+    s['rows_out'] = len(tax_unmatched)
 
 print("Diagnostic information:")
 print(f"Original SNAP records (Dallas County): {len(snap)}")
 print(f"Original tax records (Dallas County, NAICS 445*): {len(tax)}")
 print(f"Unmatched tax records: {len(tax_unmatched)}")
 
+# Link remaining tax records to SNAP stores with a similar name in the same block
+# (ZIP + house number, or geohash cell); scored candidates are saved for review
+with step('record_linkage', rows_in=len(tax_unmatched)) as s:
+    link_candidates, link_stats = link_records(tax_unmatched, snap, args.link_min_name_similarity)
+    count_rows('record_linkage', len(tax_unmatched), len(tax_unmatched) - link_stats['linked_records'])
+    tax_unmatched = tax_unmatched.drop(index=link_candidates.index.unique())
+    link_candidates.to_csv("../local-data/record_linkage_candidates.csv")
+    s['rows_out'] = len(tax_unmatched)
+record('record_linkage', link_stats)
+print(f"Record linkage: {link_stats['pairs_scored']} candidate pairs scored "
+      f"(of {link_stats['all_pairs']} tax x SNAP pairs), {link_stats['candidates']} above threshold")
+print(f"Tax records linked to SNAP stores: {link_stats['linked_records']}")
+print(f"Unlinked tax records: {len(tax_unmatched)}")
+
 # Clean coordinate data
 print(f"\nCoordinate checks:")
 print(f"Records with missing Latitude: {tax_unmatched['LATITUDE'].isnull().sum()}")
 print(f"Records with missing Longitude: {tax_unmatched['LONGITUDE'].isnull().sum()}")
 
-# Remove records with missing or invalid coordinates
-tax_unmatched = tax_unmatched.dropna(subset=['LATITUDE', 'LONGITUDE'])
-tax_unmatched['LATITUDE'] = pd.to_numeric(tax_unmatched['LATITUDE'], errors='coerce')
-tax_unmatched['LONGITUDE'] = pd.to_numeric(tax_unmatched['LONGITUDE'], errors='coerce')
-tax_unmatched = tax_unmatched.dropna(subset=['LATITUDE', 'LONGITUDE'])
-
-# Validate coordinate ranges for Dallas area
-dallas_bounds = {
-    'lat_min': 32.0, 'lat_max': 33.5,
-    'lon_min': -97.5, 'lon_max': -96.0
-}
-
-valid_coords = (
-    (tax_unmatched['LATITUDE'] >= dallas_bounds['lat_min']) &
-    (tax_unmatched['LATITUDE'] <= dallas_bounds['lat_max']) &
-    (tax_unmatched['LONGITUDE'] >= dallas_bounds['lon_min']) &
-    (tax_unmatched['LONGITUDE'] <= dallas_bounds['lon_max'])
-)
-
-tax_unmatched = tax_unmatched[valid_coords]
+# Remove records with missing, invalid or out-of-county coordinates
+with step('clean_coordinates', rows_in=len(tax_unmatched)) as s:
+    if os.path.exists(args.county_boundaries):
+        print(f"Keeping records inside county {args.county_fips} of {args.county_boundaries}")
+        tax_unmatched = clean_coordinates(tax_unmatched, counties=read_counties(args.county_boundaries),
+                                          county_fips=args.county_fips)
+    else:
+        print(f"No county boundaries at {args.county_boundaries}, checking coordinates against the Dallas area box")
+        tax_unmatched = clean_coordinates(tax_unmatched)
+    s['rows_out'] = len(tax_unmatched)
 
 print(f"Records after coordinate validation: {len(tax_unmatched)}")
 
+# Drop tax records that are a SNAP store at (nearly) the same spot under another
+# address spelling; flagged pairs are saved for review
+with step('spatial_dedup', rows_in=len(tax_unmatched)) as s:
+    spatial_duplicates = find_spatial_duplicates(
+        tax_unmatched, snap, args.dedup_radius_miles, args.min_name_similarity
+    )
+    count_rows('spatial_dedup', len(tax_unmatched), len(tax_unmatched) - len(spatial_duplicates))
+    tax_unmatched = tax_unmatched.drop(index=spatial_duplicates.index)
+    spatial_duplicates.to_csv("../local-data/spatial_duplicates.csv", index=False)
+    s['rows_out'] = len(tax_unmatched)
+print(f"Spatial duplicates of SNAP stores removed: {len(spatial_duplicates)}")
+print(f"Records after spatial deduplication: {len(tax_unmatched)}")
+
+# Added tax records keep the RECORD_ID the crosswalk gave their permit in earlier
+# runs; new ones get an id hashed from the permit numbers and address
+crosswalk = load_crosswalk()
+tax_keys = tax_source_keys(tax_unmatched)
+tax_ids = assign_record_ids(tax_keys, tax_unmatched['TAX_COMPOSITE_KEY'], crosswalk)
+
 if len(tax_unmatched) > 0:
     print(f"Latitude range: {tax_unmatched['LATITUDE'].min():.4f} to {tax_unmatched['LATITUDE'].max():.4f}")
     print(f"Longitude range: {tax_unmatched['LONGITUDE'].min():.4f} to {tax_unmatched['LONGITUDE'].max():.4f}")
-    
+
     print(f"\nStore types being added:")
     store_type_counts = tax_unmatched['STORE_TYPE'].value_counts()
     print(store_type_counts)
-    
-    def gen_id(): 
-        return uuid.uuid4().int >> 64
-
-    # Create new records with SNAP schema
-    tax_unmatched['RECORD_ID'] = [gen_id() for _ in range(len(tax_unmatched))]
-    
-    # Map tax columns to SNAP columns
-    tax_mapped = pd.DataFrame({
-        'RECORD_ID': tax_unmatched['RECORD_ID'],
-        'STORE_NAME': tax_unmatched['OUTLET_NAME'],
-        'STORE_STREET_ADDRESS': tax_unmatched['OUTLET_ADDRESS'],
-        'ADDITONAL_ADDRESS': '',  # Note: keeping original typo for consistency
-        'CITY': tax_unmatched['OUTLET_CITY'],
-        'STATE': tax_unmatched['OUTLET_STATE'],
-        'ZIP_CODE': tax_unmatched['OUTLET_ZIP_CODE'],
-        'ZIP4': '',
-        'COUNTY': 'DALLAS',
-        'STORE_TYPE': tax_unmatched['STORE_TYPE'],
-        'LATITUDE': tax_unmatched['LATITUDE'],
-        'LONGITUDE': tax_unmatched['LONGITUDE'],
-        'INCENTIVE_PROGRAM': '',
-        'GRANTEE_NAME': '',
-        'OBJECTID': None
-    })
-    
-    # Ensure all columns exist in both datasets before concatenation
-    snap_columns = set(snap.columns)
-    mapped_columns = set(tax_mapped.columns)
-    
-    # Add missing columns to tax_mapped
-    for col in snap_columns - mapped_columns:
-        if col != 'SNAP_COMPOSITE_KEY':  
-            tax_mapped[col] = None
-    
-    # Add missing columns to snap
-    for col in mapped_columns - snap_columns:
-        snap[col] = None
-    
-    # Reorder columns to match
-    common_columns = list(snap_columns | mapped_columns)
-    if 'SNAP_COMPOSITE_KEY' in common_columns:
-        common_columns.remove('SNAP_COMPOSITE_KEY')
-    
-    snap_reordered = snap[common_columns]
-    tax_mapped_reordered = tax_mapped[common_columns]
-    
-    # Combine datasets
-    merged_data = pd.concat([snap_reordered, tax_mapped_reordered], ignore_index=True)
-    
+
+    # Create new records with SNAP schema and combine the datasets
+    with step('combine', rows_in=len(snap) + len(tax_unmatched)) as s:
+        tax_mapped = tax_to_snap_schema(tax_unmatched, tax_ids)
+        merged_data = combine_records(snap, tax_mapped)
+        s['rows_out'] = len(merged_data)
+
     print(f"\nFinal dataset:")
     print(f"Original SNAP records: {len(snap)}")
     print(f"Added tax records: {len(tax_mapped)}")
@@ -158,12 +132,20 @@ if len(tax_unmatched) > 0:
     print(f"\nStore types in final dataset:")
     final_store_counts = merged_data['STORE_TYPE'].value_counts()
     print(final_store_counts)
-    
+
     # Save merged data
-    merged_data.to_csv("../local-data/merged_data.csv", index=False)
-    print(f"\nMerged data saved to ../local-data/merged_data.csv")
-    
+    with step('write', rows_in=len(merged_data)):
+        output = write_artifact(merged_data, 'merged_data')
+    print(f"\nMerged data saved to {output}")
+
 else:
     print("\nNo valid records to add after filtering.")
-    snap.to_csv("../local-data/merged_data.csv", index=False)
-    print("Saved original SNAP data as merged_data.csv")
\ No newline at end of file
+    write_artifact(snap.drop(columns='SNAP_COMPOSITE_KEY'), 'merged_data')
+    print(f"Saved original SNAP data as {artifact_path('merged_data')}")
+
+crosswalk = update_crosswalk(
+    crosswalk, pd.concat([snap['RECORD_ID'], tax_ids]), pd.concat([snap_source_keys(snap), tax_keys]),
+    pd.concat([snap['SNAP_COMPOSITE_KEY'], tax_unmatched['TAX_COMPOSITE_KEY']]), args.snapshot
+)
+print(f"RECORD_ID crosswalk saved to {save_crosswalk(crosswalk)} ({len(crosswalk)} records)")
+print(f"Run report saved to {write_run_report()}")
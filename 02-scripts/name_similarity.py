@@ -0,0 +1,135 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Words that say nothing about which store it is
+STOPWORDS = {
+    'THE', 'INC', 'LLC', 'LTD', 'CORP', 'CO', 'COMPANY', 'STORE', 'STORES', 'NO', 'AND',
+}
+
+_NON_ALNUM = re.compile(r'[^A-Z0-9]+')
+# Store numbers: any token with three or more digits ('32914B', '04267'), so short
+# numbers that are part of a name ('7-ELEVEN', '99 RANCH') survive
+_STORE_NUMBER = re.compile(r'^\w*\d\w*\d\w*\d\w*$')
+# Record linkage reads two-digit tokens as store numbers too ('FIESTA MART 58')
+_LINKAGE_STORE_NUMBER = re.compile(r'^\w*\d\w*\d\w*$')
+
+# Words that say what kind of store it is, not which one. Linkage compares
+# names on their other words, so 'FOOD MART' doesn't match every '<X> FOOD MART'.
+GENERIC_WORDS = {
+    'FOOD', 'FOODS', 'MART', 'MARKET', 'MARKETS', 'MERCADO', 'SUPERMERCADO', 'CARNICERIA',
+    'GROCERY', 'GROCERIES', 'SUPERMARKET', 'SUPERCENTER', 'CONVENIENCE', 'MINI', 'MEAT',
+    'DISCOUNT', 'DOLLAR', 'SHOP', 'SHOPPE', 'DELI', 'BAKERY', 'PHARMACY', 'FARMERS',
+}
+
+
+def normalize_store_name(name):
+    """
+    Uppercases a store name, drops apostrophes, splits on other punctuation
+    and drops store numbers and stopwords. Returns the remaining tokens
+    joined by single spaces.
+    '7-eleven Convenience Store 32914B' -> '7 ELEVEN CONVENIENCE'
+    """
+    tokens = _NON_ALNUM.split(str(name).upper().replace("'", ''))
+    return ' '.join(
+        token for token in tokens
+        if token and token not in STOPWORDS and not _STORE_NUMBER.match(token)
+    )
+
+
+def store_numbers(name, pattern=_STORE_NUMBER):
+    """
+    Returns the store numbers in a name as digit strings without leading zeros.
+    'TOM THUMB #01973' -> {'1973'}; '7-ELEVEN 34530A' -> {'34530'}
+    """
+    tokens = _NON_ALNUM.split(str(name).upper())
+    return frozenset(
+        re.sub(r'\D', '', token).lstrip('0') for token in tokens if pattern.match(token)
+    )
+
+
+def _trigrams(normalized):
+    padded = f'  {normalized} ' if normalized else ''
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _jaccard(a, b):
+    union = len(a | b)
+    return len(a & b) / union if union else 0.0
+
+
+def _score_name_pairs(names_a, names_b, features, score):
+    """
+    Scores aligned pairs of names with score(features(a), features(b)),
+    building the features once per distinct name and scoring once per
+    distinct name pair.
+    """
+    names_a = pd.Series(names_a).fillna('').astype(str).to_numpy(dtype=object)
+    names_b = pd.Series(names_b).fillna('').astype(str).to_numpy(dtype=object)
+    codes, uniques = pd.factorize(np.concatenate([names_a, names_b]))
+    codes_a, codes_b = codes[:len(names_a)], codes[len(names_a):]
+    unique_features = [features(name) for name in uniques]
+
+    n_names = len(uniques)
+    pair_codes, unique_pairs = pd.factorize(codes_a.astype(np.int64) * n_names + codes_b)
+    unique_scores = np.array([
+        score(unique_features[a], unique_features[b])
+        for a, b in zip(unique_pairs // n_names, unique_pairs % n_names)
+    ], dtype=float)
+    return unique_scores[pair_codes]
+
+
+def pair_similarity(names_a, names_b):
+    """
+    Scores aligned pairs of store names between 0 and 1: the larger of the
+    token overlap coefficient (shared tokens over the smaller token set) and
+    the trigram Jaccard similarity. Names that both carry store numbers
+    with none in common ('TOM THUMB #1973' / 'TOM THUMB #2526') score 0.
+    The overlap coefficient scores a name contained in another as 1, which
+    suits the spatial dedup, where the stores must also stand together.
+    """
+    def features(name):
+        normalized = normalize_store_name(name)
+        return frozenset(normalized.split()), _trigrams(normalized), store_numbers(name)
+
+    def score(a, b):
+        (tokens_a, trigrams_a, numbers_a), (tokens_b, trigrams_b, numbers_b) = a, b
+        if numbers_a and numbers_b and not numbers_a & numbers_b:
+            return 0.0
+        overlap = (len(tokens_a & tokens_b) / min(len(tokens_a), len(tokens_b))
+                   if tokens_a and tokens_b else 0.0)
+        return max(overlap, _jaccard(trigrams_a, trigrams_b))
+
+    return _score_name_pairs(names_a, names_b, features, score)
+
+
+def linkage_similarity(names_a, names_b):
+    """
+    Symmetric score of aligned pairs of store names between 0 and 1 for
+    record linkage: the larger of the token Jaccard similarity and the
+    trigram Jaccard similarity, so a short name doesn't match every longer
+    name containing it. Tokens are compared without GENERIC_WORDS unless
+    one name has nothing else ('7-ELEVEN #34530A' / '7-Eleven Convenience
+    Store 34530' score 1, 'FOOD MART' / 'SHELL FOOD MART' 0.67). Store
+    numbers, two digits or more, must be on both sides and share one:
+    'FIESTA MART 58' / 'FIESTA MART 210' and 'SPROUTS #103' / 'SPROUTS'
+    score 0.
+    """
+    def features(name):
+        tokens = [token for token in normalize_store_name(name).split()
+                  if not _LINKAGE_STORE_NUMBER.match(token)]
+        distinctive = frozenset(token for token in tokens if token not in GENERIC_WORDS)
+        return (frozenset(tokens), distinctive, _trigrams(' '.join(tokens)),
+                store_numbers(name, _LINKAGE_STORE_NUMBER))
+
+    def score(a, b):
+        (tokens_a, distinctive_a, trigrams_a, numbers_a) = a
+        (tokens_b, distinctive_b, trigrams_b, numbers_b) = b
+        if (numbers_a or numbers_b) and not numbers_a & numbers_b:
+            return 0.0
+        if distinctive_a and distinctive_b:
+            tokens_a, tokens_b = distinctive_a, distinctive_b
+        return max(_jaccard(tokens_a, tokens_b), _jaccard(trigrams_a, trigrams_b))
+
+    return _score_name_pairs(names_a, names_b, features, score)
@@ -0,0 +1,77 @@
+import pandas as pd
+
+from artifacts import write_table
+from run_report import count_rows
+
+# Columns from the Active Sales Tax Permit Holders file that the pipeline
+# uses downstream. Everything is read as text so codes keep their digits.
+PERMIT_COLUMNS = [
+    'Taxpayer Number', 'Taxpayer Name', 'Outlet Number', 'Outlet Name',
+    'Outlet Address', 'Outlet City', 'Outlet State', 'Outlet Zip Code',
+    'Outlet County Code', 'Outlet NAICS Code', 'Outlet Permit Issue Date',
+    'Outlet First Sales Date'
+]
+
+FOOD_RETAIL_NAICS_PREFIX = '445'
+DALLAS_COUNTY_CODE = 57
+CHUNK_SIZE = 250_000
+
+
+def normalize_county_codes(county_codes):
+    """
+    Accepts county codes as ints or strings ('57', '57.0') and returns a set of ints.
+    """
+    return {int(float(code)) for code in county_codes}
+
+
+def read_food_permits(file_path, county_codes=(DALLAS_COUNTY_CODE,), columns=PERMIT_COLUMNS,
+                      chunk_size=CHUNK_SIZE):
+    """
+    Streams the statewide permit file in chunks and keeps food retailers
+    (NAICS 445*) in the requested counties.
+    Only `columns` are parsed, all as strings, so peak memory is one chunk
+    plus the matching rows regardless of the file size.
+    Returns the matching rows with a numeric OUTLET_COUNTY_CODE.
+    """
+    county_codes = normalize_county_codes(county_codes)
+    usecols = list(dict.fromkeys(list(columns) + ['Outlet County Code', 'Outlet NAICS Code']))
+
+    kept = []
+    rows_read = 0
+    reader = pd.read_csv(
+        file_path, usecols=usecols, dtype={col: str for col in usecols}, chunksize=chunk_size
+    )
+    for chunk in reader:
+        rows_read += len(chunk)
+        is_food = chunk['Outlet NAICS Code'].fillna('').str.strip().str.startswith(FOOD_RETAIL_NAICS_PREFIX)
+        in_county = pd.to_numeric(chunk['Outlet County Code'], errors='coerce').isin(county_codes)
+        count_rows('naics_445', len(chunk), is_food.sum())
+        count_rows('county', is_food.sum(), (is_food & in_county).sum())
+        chunk = chunk[is_food & in_county]
+        if len(chunk) > 0:
+            kept.append(chunk)
+
+    if kept:
+        df = pd.concat(kept, ignore_index=True)
+    else:
+        df = pd.DataFrame(columns=usecols)
+    df['Outlet County Code'] = pd.to_numeric(df['Outlet County Code'], errors='coerce').astype('Int64')
+    df.columns = df.columns.str.upper().str.replace(' ', '_')
+
+    print(f"Permit rows read: {rows_read}, food retail rows kept: {len(df)}")
+    return df
+
+
+def write_county_extracts(df, output_pattern):
+    """
+    Writes one file per county from a multi-county permit frame.
+    output_pattern is formatted with the county code, e.g. 'food_permits_{}.parquet';
+    its extension picks Parquet or CSV.
+    Returns the list of files written.
+    """
+    written = []
+    for county_code, county_df in df.groupby('OUTLET_COUNTY_CODE'):
+        output_file = output_pattern.format(county_code)
+        write_table(county_df, output_file)
+        written.append(output_file)
+    return written
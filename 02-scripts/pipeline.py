@@ -0,0 +1,260 @@
+import argparse
+import ast
+import glob
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from artifacts import DATA_DIR, resolve_artifact
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_PATH = os.path.join(DATA_DIR, '.pipeline_state.json')
+
+# Each stage runs one script from 02-scripts. 'inputs' and 'outputs' are artifact
+# names (see artifacts.py); 'files' are raw source files the stage reads. A stage
+# depends on every stage producing one of its inputs. foodRetailLocations is
+# produced outside the pipeline from merged_data, so it is a source here.
+STAGES = {
+    'sales_tax': {
+        'script': 'sales_tax.py',
+        'files': [os.path.join(DATA_DIR, 'Active_Sales_Tax_Permit_Holders_20250828.csv')]
+                 + sorted(glob.glob(os.path.join(DATA_DIR, 'tiger', '*.geojson'))),
+        'inputs': [],
+        'outputs': ['batch_input', 'geocoded_results', 'final_geocoded_output'],
+    },
+    'merge': {
+        'script': 'merge.py',
+        'files': [os.path.join(DATA_DIR, 'SNAP_Retailer_Location_data.csv'),
+                  os.path.join(DATA_DIR, 'boundaries', 'counties.geojson')],
+        'inputs': ['final_geocoded_output'],
+        'outputs': ['merged_data'],
+    },
+    'classify': {
+        'script': 'categorizing_store_type.py',
+        'files': [],
+        'inputs': ['foodRetailLocations'],
+        'outputs': ['CuisineRetailLocations2'],
+    },
+    'density': {
+        'script': 'store_density.py',
+        'files': [],
+        'inputs': ['CuisineRetailLocations2'],
+        'outputs': ['store_density'],
+    },
+    'geographies': {
+        'script': 'store_geographies.py',
+        'files': [os.path.join(DATA_DIR, 'boundaries', 'counties.geojson'),
+                  os.path.join(DATA_DIR, 'boundaries', 'tracts.geojson')],
+        'inputs': ['foodRetailLocations'],
+        'outputs': ['store_geographies'],
+    },
+    'property_size': {
+        'script': 'property_size_merge.py',
+        'files': [os.path.join(DATA_DIR, 'ACCOUNT_INFO.csv'), os.path.join(DATA_DIR, 'COM_DETAIL.CSV')],
+        'inputs': ['foodRetailLocations'],
+        'outputs': ['property_size_merged'],
+    },
+}
+
+_print_lock = threading.Lock()
+
+
+def upstream(name, stages=STAGES):
+    """
+    Names of the stages producing any of a stage's inputs.
+    """
+    inputs = set(stages[name]['inputs'])
+    return [other for other, stage in stages.items() if other != name and inputs & set(stage['outputs'])]
+
+
+def local_modules(script, scripts_dir=SCRIPTS_DIR):
+    """
+    The script and every 02-scripts module it imports, directly or indirectly.
+    """
+    found, queue = set(), [script]
+    while queue:
+        file_name = queue.pop()
+        if file_name in found:
+            continue
+        found.add(file_name)
+        with open(os.path.join(scripts_dir, file_name)) as f:
+            tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module:
+                names = [node.module]
+            else:
+                continue
+            for module in names:
+                if os.path.exists(os.path.join(scripts_dir, f'{module}.py')):
+                    queue.append(f'{module}.py')
+    return sorted(found)
+
+
+def file_digest(path, memo):
+    """
+    SHA-256 of a file's content, or None if it doesn't exist. Digests are
+    memoized by path, size and modification time, so unchanged large inputs
+    aren't hashed again on every run.
+    """
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    cached = memo.get(key)
+    if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+        return cached['sha256']
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    memo[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+    return memo[key]['sha256']
+
+
+def fingerprint(name, args, memo, stages=STAGES):
+    """
+    Hash of everything a stage's result depends on: its code (the script and
+    the local modules it imports), its input files and its arguments.
+    """
+    stage = stages[name]
+    code = {module: file_digest(os.path.join(SCRIPTS_DIR, module), memo)
+            for module in local_modules(stage['script'])}
+    inputs = {path: file_digest(path, memo)
+              for path in stage['files'] + [resolve_artifact(n) for n in stage['inputs']]}
+    payload = json.dumps({'code': code, 'inputs': inputs, 'args': args}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def outputs_exist(name, stages=STAGES):
+    return all(os.path.exists(resolve_artifact(output)) for output in stages[name]['outputs'])
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {'stages': {}, 'files': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_PATH):
+    # Write to a temporary file first, so an interrupted run never leaves a truncated state
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def run_stage(name, args, stages=STAGES):
+    """
+    Runs a stage's script from 02-scripts, prefixing each line it prints with
+    the stage name. Returns True when it exits cleanly and wrote its outputs.
+    """
+    command = [sys.executable, stages[name]['script']] + args
+    process = subprocess.Popen(command, cwd=SCRIPTS_DIR, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, text=True)
+    for line in process.stdout:
+        with _print_lock:
+            print(f"[{name}] {line}", end='')
+    return process.wait() == 0 and outputs_exist(name, stages)
+
+
+def run_pipeline(selected, stage_args, force=False, dry_run=False, max_workers=2, stages=STAGES):
+    """
+    Runs the selected stages in dependency order, starting each as soon as the
+    selected stages upstream of it have finished, up to max_workers at a time.
+    A stage is skipped when its fingerprint matches the last successful run and
+    its outputs exist.
+    Returns {stage: 'ran' | 'skipped' | 'would run' | 'failed' | 'blocked'}.
+    """
+    state = load_state()
+    results = {}
+    pending = [name for name in stages if name in selected]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        while pending or running:
+            for name in list(pending):
+                deps = [dep for dep in upstream(name, stages) if dep in selected]
+                if any(results.get(dep) in ('failed', 'blocked') for dep in deps):
+                    results[name] = 'blocked'
+                    pending.remove(name)
+                    continue
+                if any(dep not in results for dep in deps):
+                    continue
+                pending.remove(name)
+
+                # Upstream that only would run is going to rewrite this stage's inputs, so the
+                # outputs on disk say nothing about whether this stage is up to date
+                if dry_run and any(results[dep] == 'would run' for dep in deps):
+                    print(f"[{name}] would run (upstream would run)")
+                    results[name] = 'would run'
+                    continue
+
+                # Fingerprint once upstream has finished, so it covers their fresh outputs
+                args = stage_args.get(name, [])
+                stage_fingerprint = fingerprint(name, args, state['files'], stages)
+                unchanged = state['stages'].get(name) == stage_fingerprint and outputs_exist(name, stages)
+                if unchanged and not force:
+                    print(f"[{name}] unchanged, skipped")
+                    results[name] = 'skipped'
+                elif dry_run:
+                    print(f"[{name}] would run")
+                    results[name] = 'would run'
+                else:
+                    print(f"[{name}] running {stages[name]['script']}")
+                    running[executor.submit(run_stage, name, args, stages)] = (name, stage_fingerprint)
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, stage_fingerprint = running.pop(future)
+                if future.result():
+                    # Record the fingerprint of the inputs the stage actually ran on
+                    state['stages'][name] = stage_fingerprint
+                    save_state(state)
+                    results[name] = 'ran'
+                else:
+                    results[name] = 'failed'
+                print(f"[{name}] {results[name]}")
+
+    save_state(state)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the pipeline stages whose code or inputs changed since their last run"
+    )
+    parser.add_argument('stages', nargs='*',
+                        help=f"Stages to consider: {', '.join(STAGES)} (default: all)")
+    parser.add_argument('--force', action='store_true', help="Run the stages even if unchanged")
+    parser.add_argument('--dry-run', action='store_true', help="Only show what would run")
+    parser.add_argument('--workers', type=int, default=2, help="Stages run at the same time")
+    parser.add_argument('--permits', help="Permit file for sales_tax (passed through as --permits)")
+    parser.add_argument('--args', nargs=2, action='append', default=[], metavar=('STAGE', 'ARGS'),
+                        help="Extra arguments for a stage's script, "
+                             "e.g. --args merge '--min-name-similarity 0.8'")
+    args = parser.parse_args()
+
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    stage_args = {name: shlex.split(extra) for name, extra in args.args}
+    if args.permits:
+        STAGES['sales_tax']['files'] = [args.permits] + STAGES['sales_tax']['files'][1:]
+        stage_args['sales_tax'] = ['--permits', args.permits] + stage_args.get('sales_tax', [])
+
+    results = run_pipeline(args.stages or list(STAGES), stage_args, force=args.force,
+                           dry_run=args.dry_run, max_workers=args.workers)
+    print("\n" + ", ".join(f"{name}: {result}" for name, result in results.items()))
+    sys.exit(1 if any(result in ('failed', 'blocked') for result in results.values()) else 0)
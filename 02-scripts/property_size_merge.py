@@ -1,43 +1,33 @@
-import pandas as pd
+import argparse
+
+from appraisal_enrichment import APPRAISAL_CHUNK_SIZE, enrich_with_appraisal
+from artifacts import read_artifact, write_artifact
+from run_report import start_run, step, write_run_report
+
+parser = argparse.ArgumentParser(description="Add Dallas CAD commercial property details to retail locations")
+parser.add_argument('--account-info', default='../local-data/ACCOUNT_INFO.csv')
+parser.add_argument('--com-detail', default='../local-data/COM_DETAIL.CSV')
+parser.add_argument('--chunk-size', type=int, default=APPRAISAL_CHUNK_SIZE,
+                    help="Appraisal rows read at a time")
+args = parser.parse_args()
+start_run('property_size')
 
 # merge on ACCOUNT_NUM
 # Account_INFO must create a full address line to match enriched data foodRetailLocations.csv
-foodRetailLocations = pd.read_csv('../local-data/foodRetailLocations.csv')
-accountINFO = pd.read_csv('../local-data/ACCOUNT_INFO.csv')
-comDetail = pd.read_csv('../local-data/COM_DETAIL.CSV')
-
+with step('load') as s:
+    foodRetailLocations = read_artifact('foodRetailLocations')
+    s['rows_out'] = len(foodRetailLocations)
 foodRetailLocations.columns = foodRetailLocations.columns.str.upper().str.replace(' ', '_')
-accountINFO.columns = accountINFO.columns.str.upper().str.replace(' ', '_') 
-comDetail.columns = comDetail.columns.str.upper().str.replace(' ', '_')
-
-extraDetail = pd.merge(comDetail, accountINFO, on='ACCOUNT_NUM', how='left')
-
-
-# Standardize address fields to uppercase for better matching
-detail_upper_cols = ['STORE_STREET_ADDRESS', 'CITY', 'STATE']
-for col in detail_upper_cols:
-    if col in extraDetail.columns:
-        extraDetail[col] = extraDetail[col].astype(str).str.upper()
-
-food_upper_cols = ['OUTLET_ADDRESS', 'OUTLET_CITY', 'OUTLET_STATE']
-for col in food_upper_cols:
-    if col in foodRetailLocations.columns:
-        foodRetailLocations[col] = foodRetailLocations[col].astype(str).str.upper()
-
-# Create composite keys for matching
-extraDetail['SNAP_COMPOSITE_KEY'] = (
-    extraDetail['STREET_NUM'].astype(str) + " " +
-    extraDetail['FULL_STREET_NAME'].astype(str) + " " +
-    extraDetail['PROPERTY_CITY'].astype(str)
-)
-
-foodRetailLocations['FOOD_COMPOSITE_KEY'] = (
-    foodRetailLocations['STORE_STREET_ADDRESS'].astype(str) + " " +
-    foodRetailLocations['CITY'].astype(str)
-)
 
-finalMerged = pd.merge(foodRetailLocations, extraDetail, left_on='FOOD_COMPOSITE_KEY', right_on='SNAP_COMPOSITE_KEY', how='left', suffixes=('_SNAP', '_FOOD'))
+# Only appraisal records at a retailer's address (hashed, normalized street address + city)
+# are kept while streaming the county-wide files; one property record per address
+with step('enrich', rows_in=len(foodRetailLocations)) as s:
+    finalMerged = enrich_with_appraisal(foodRetailLocations, args.account_info, args.com_detail, args.chunk_size)
+    s['rows_out'] = len(finalMerged)
+print(f"Retail locations: {len(foodRetailLocations)}, enriched rows: {len(finalMerged)}")
 
 # Save merged data
-finalMerged.to_csv("../local-data/property_size_merged.csv", index=False)
-print(f"\nMerged data saved to ../local-data/property_size_merged.csv")
\ No newline at end of file
+with step('write', rows_in=len(finalMerged)):
+    output = write_artifact(finalMerged, 'property_size_merged')
+print(f"\nMerged data saved to {output}")
+print(f"Run report saved to {write_run_report()}")
@@ -0,0 +1,127 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from artifacts import DATA_DIR, read_table, resolve_artifact, write_artifact
+
+# Artifact recording which source record each RECORD_ID stands for, kept
+# across runs and snapshots
+CROSSWALK_ARTIFACT = 'record_id_crosswalk'
+CROSSWALK_COLUMNS = ['RECORD_ID', 'SOURCE', 'SOURCE_KEY', 'ADDRESS_KEY', 'FIRST_SEEN', 'LAST_SEEN']
+
+# Ids minted for tax records are at least 2**62, far above the USDA SNAP
+# RECORD_IDs (7 digits), and below 2**63, so they stay positive int64
+_MINTED_ID_BASE = 1 << 62
+
+
+def tax_source_keys(tax):
+    """
+    Source identifier of each tax permit outlet: 'TAX:<taxpayer>-<outlet>',
+    missing where either permit number is, since those permits can't be
+    told apart by their numbers.
+    """
+    def clean(col):
+        return pd.to_numeric(tax[col], errors='coerce').astype('Int64').astype(str).fillna('')
+
+    taxpayer, outlet = clean('TAXPAYER_NUMBER'), clean('OUTLET_NUMBER')
+    return ('TAX:' + taxpayer + '-' + outlet).where((taxpayer != '') & (outlet != ''))
+
+
+def snap_source_keys(snap):
+    """
+    Source identifier of each SNAP store: 'SNAP:<USDA RECORD_ID>'.
+    """
+    return 'SNAP:' + pd.to_numeric(snap['RECORD_ID'], errors='coerce').astype('Int64').astype(str)
+
+
+def mint_record_ids(source_keys, address_keys):
+    """
+    RECORD_IDs derived from a hash of each record's source identifier and
+    hashed address key, so the same permit at the same address gets the same
+    id on every run. The address keeps ids apart where the permit numbers
+    are missing; records with neither told apart are numbered in order.
+    Raises a ValueError if two different records get the same id.
+    """
+    content = (source_keys.astype(str).fillna('') + '|'
+               + pd.Series(address_keys, index=source_keys.index).astype(str).fillna(''))
+    repeats = content.groupby(content, sort=False).cumcount()
+    content = content.where(repeats == 0, content + '|' + repeats.astype(str))
+    hashes = pd.util.hash_array(content.to_numpy(dtype=object))
+    ids = pd.Series((hashes % np.uint64(_MINTED_ID_BASE)).astype(np.int64) + _MINTED_ID_BASE,
+                    index=source_keys.index)
+    if ids.duplicated().any():
+        raise ValueError(f"Minted RECORD_ID collision for {content[ids.duplicated(keep=False)].tolist()}")
+    return ids
+
+
+def load_crosswalk(data_dir=DATA_DIR):
+    """
+    Reads the RECORD_ID crosswalk, or returns an empty one before the first run.
+    """
+    path = resolve_artifact(CROSSWALK_ARTIFACT, data_dir)
+    if not os.path.exists(path):
+        return pd.DataFrame({col: pd.Series(dtype='int64' if col == 'RECORD_ID' else object)
+                             for col in CROSSWALK_COLUMNS})
+    return read_table(path)
+
+
+def assign_record_ids(source_keys, address_keys, crosswalk):
+    """
+    RECORD_IDs for source records: the id the crosswalk already gives a
+    source identifier, so a store keeps its id when its address is
+    corrected, or a newly minted one. Records without a source identifier
+    are never looked up; their ids come from the address key alone.
+    Raises a ValueError if a minted id is one the crosswalk already gives
+    another record.
+    """
+    known = crosswalk.dropna(subset='SOURCE_KEY').drop_duplicates('SOURCE_KEY', keep='last')
+    # Looked up by position and filled in as int64: going through floats would round the 63-bit ids
+    positions = pd.Index(known['SOURCE_KEY']).get_indexer(source_keys)
+    positions[source_keys.isna().to_numpy()] = -1
+    ids = np.append(known['RECORD_ID'].to_numpy(dtype=np.int64), 0)[positions]
+    missing = positions < 0
+    address_keys = pd.Series(address_keys, index=source_keys.index)
+    minted = mint_record_ids(source_keys[missing], address_keys[missing])
+    taken = minted[minted.isin(crosswalk['RECORD_ID'])]
+    if len(taken):
+        raise ValueError(f"Minted RECORD_IDs already in the crosswalk: {taken.tolist()}")
+    ids[missing] = minted.to_numpy()
+    return pd.Series(ids, index=source_keys.index)
+
+
+def lookup_record_ids(source_keys, crosswalk):
+    """
+    RECORD_IDs the crosswalk gives source identifiers, leaving out unknown ones.
+    """
+    return crosswalk.loc[crosswalk['SOURCE_KEY'].isin(source_keys.dropna()), 'RECORD_ID']
+
+
+def update_crosswalk(crosswalk, record_ids, source_keys, address_keys, snapshot):
+    """
+    Adds the published records to the crosswalk: known source identifiers
+    get their current address key and LAST_SEEN = snapshot, new ones are
+    appended with FIRST_SEEN = LAST_SEEN = snapshot. Identifiers that are no
+    longer published are kept, so their ids are never reused. Records
+    without a source identifier are left out: there is nothing to look
+    their ids up by on the next run.
+    """
+    source_keys = pd.Series(source_keys).reset_index(drop=True)
+    seen = pd.DataFrame({
+        'RECORD_ID': np.asarray(record_ids, dtype=np.int64),
+        'SOURCE': source_keys.str.split(':', n=1).str[0].to_numpy(),
+        'SOURCE_KEY': source_keys.to_numpy(),
+        'ADDRESS_KEY': pd.Series(address_keys).astype(str).to_numpy(),
+        'LAST_SEEN': snapshot,
+    })[source_keys.notna().to_numpy()].drop_duplicates('SOURCE_KEY', keep='last')
+    crosswalk = crosswalk.dropna(subset='SOURCE_KEY')
+
+    first_seen = crosswalk.drop_duplicates('SOURCE_KEY', keep='last').set_index('SOURCE_KEY')['FIRST_SEEN']
+    seen['FIRST_SEEN'] = seen['SOURCE_KEY'].map(first_seen).fillna(snapshot)
+    unchanged = crosswalk[~crosswalk['SOURCE_KEY'].isin(seen['SOURCE_KEY'])]
+    updated = pd.concat([unchanged, seen[CROSSWALK_COLUMNS]], ignore_index=True)
+    return updated.sort_values(['SOURCE', 'SOURCE_KEY'], kind='stable').reset_index(drop=True)
+
+
+def save_crosswalk(crosswalk, data_dir=DATA_DIR):
+    return write_artifact(crosswalk[CROSSWALK_COLUMNS], CROSSWALK_ARTIFACT, data_dir)
@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+
+from address_normalize import normalize_street, zip5
+from name_similarity import linkage_similarity
+from spatial_index import haversine_miles
+
+# A tax record links to a SNAP store in one of its blocks whose name is at least
+# this similar; stricter than the spatial dedup, which also requires proximity
+LINKAGE_MIN_NAME_SIMILARITY = 0.8
+
+# Geohash precision 6 cells are about 0.75 x 0.38 miles at Dallas' latitude
+GEOHASH_PRECISION = 6
+
+# A geohash cell alone doesn't say two records are at one place: pairs that
+# share no ZIP and house number must have the same house number or be this close
+LINKAGE_MAX_MILES = 0.1
+
+BLOCK_COLUMNS = ['ZIP_STREET_NUMBER', 'GEOHASH']
+
+
+def geohash_cells(lat, lon, precision=GEOHASH_PRECISION):
+    """
+    Returns the geohash cell of each point as an integer: the precision * 5
+    bits of the base-32 geohash, interleaving longitude and latitude bits.
+    Points with missing coordinates get -1.
+    """
+    lat = pd.to_numeric(pd.Series(lat), errors='coerce').to_numpy(dtype=float)
+    lon = pd.to_numeric(pd.Series(lon), errors='coerce').to_numpy(dtype=float)
+    missing = np.isnan(lat) | np.isnan(lon)
+
+    n_bits = precision * 5
+    lon_bits, lat_bits = (n_bits + 1) // 2, n_bits // 2
+    lon_q = np.clip(np.floor((np.nan_to_num(lon) + 180) / 360 * 2 ** lon_bits), 0, 2 ** lon_bits - 1)
+    lat_q = np.clip(np.floor((np.nan_to_num(lat) + 90) / 180 * 2 ** lat_bits), 0, 2 ** lat_bits - 1)
+    lon_q, lat_q = lon_q.astype(np.int64), lat_q.astype(np.int64)
+
+    # Geohash bits alternate longitude, latitude, ... starting from the top bit of each
+    cells = np.zeros(len(lat), dtype=np.int64)
+    for i in range(n_bits):
+        if i % 2 == 0:
+            bit = (lon_q >> (lon_bits - 1 - i // 2)) & 1
+        else:
+            bit = (lat_q >> (lat_bits - 1 - i // 2)) & 1
+        cells = (cells << 1) | bit
+    return np.where(missing, -1, cells)
+
+
+def street_numbers(address):
+    """
+    Returns the leading house number of each normalized street address, or ''.
+    """
+    return normalize_street(address).str.extract(r'^(\d+)\b', expand=False).fillna('')
+
+
+def blocking_keys(address, zip_code, lat, lon, precision=GEOHASH_PRECISION):
+    """
+    Builds the blocking keys of each record: ZIP5 plus house number, and the
+    coarse geohash cell. Keys that can't be built (no ZIP, no house number,
+    no coordinates) are left missing so those records sit out that block.
+    """
+    # Both as str, so the keys build the same from CSV (object) and Parquet (string) columns
+    zips = zip5(zip_code.reset_index(drop=True)).astype(str)
+    numbers = street_numbers(address.reset_index(drop=True)).astype(str)
+    zip_street = (zips + '|' + numbers).where((zips != '') & (numbers != ''))
+    cells = pd.Series(geohash_cells(lat, lon, precision)).replace(-1, np.nan)
+    return pd.DataFrame({'ZIP_STREET_NUMBER': zip_street, 'GEOHASH': cells})
+
+
+def blocked_pairs(tax_blocks, snap_blocks):
+    """
+    Joins tax and SNAP records that share any blocking key.
+    Returns the distinct (tax position, SNAP position) pairs.
+    """
+    parts = []
+    for col in BLOCK_COLUMNS:
+        left = pd.DataFrame({'KEY': tax_blocks[col], 'TAX_POS': np.arange(len(tax_blocks))}).dropna()
+        right = pd.DataFrame({'KEY': snap_blocks[col], 'SNAP_POS': np.arange(len(snap_blocks))}).dropna()
+        parts.append(left.merge(right, on='KEY')[['TAX_POS', 'SNAP_POS']])
+    pairs = pd.concat(parts, ignore_index=True).drop_duplicates()
+    return pairs['TAX_POS'].to_numpy(), pairs['SNAP_POS'].to_numpy()
+
+
+def link_records(tax, snap, min_name_similarity=LINKAGE_MIN_NAME_SIMILARITY,
+                 precision=GEOHASH_PRECISION, max_miles=LINKAGE_MAX_MILES):
+    """
+    Links tax records to SNAP stores by name within blocks, so chain stores
+    whose permit and SNAP names differ ('7-ELEVEN #34530A' / '7-Eleven
+    Convenience Store 34530') are recognised even when the addresses don't
+    produce the same composite key. Only record pairs sharing a ZIP and
+    house number or a geohash cell are scored, so the work grows with block
+    sizes rather than with |tax| x |SNAP|. Pairs that only share a geohash
+    cell must also have the same house number or be within max_miles.
+    Returns (candidates, stats): every pair scoring at least
+    min_name_similarity, best first within each tax record (index label
+    TAX_INDEX), and a dict with the number of pairs scored.
+    """
+    tax_blocks = blocking_keys(tax['OUTLET_ADDRESS'], tax['OUTLET_ZIP_CODE'],
+                               tax['LATITUDE'], tax['LONGITUDE'], precision)
+    snap_blocks = blocking_keys(snap['STORE_STREET_ADDRESS'], snap['ZIP_CODE'],
+                                snap['LATITUDE'], snap['LONGITUDE'], precision)
+    tax_pos, snap_pos = blocked_pairs(tax_blocks, snap_blocks)
+
+    tax_numbers = street_numbers(tax['OUTLET_ADDRESS'].reset_index(drop=True)).to_numpy()[tax_pos]
+    snap_numbers = street_numbers(snap['STORE_STREET_ADDRESS'].reset_index(drop=True)).to_numpy()[snap_pos]
+    distances = haversine_miles(
+        pd.to_numeric(tax['LATITUDE'], errors='coerce').to_numpy(dtype=float)[tax_pos],
+        pd.to_numeric(tax['LONGITUDE'], errors='coerce').to_numpy(dtype=float)[tax_pos],
+        pd.to_numeric(snap['LATITUDE'], errors='coerce').to_numpy(dtype=float)[snap_pos],
+        pd.to_numeric(snap['LONGITUDE'], errors='coerce').to_numpy(dtype=float)[snap_pos],
+    )
+    colocated = ((tax_numbers == snap_numbers) & (tax_numbers != '')) | (distances <= max_miles)
+    tax_pos, snap_pos, distances = tax_pos[colocated], snap_pos[colocated], distances[colocated]
+
+    scores = linkage_similarity(
+        tax['OUTLET_NAME'].to_numpy()[tax_pos], snap['STORE_NAME'].to_numpy()[snap_pos]
+    )
+    candidates = pd.DataFrame({
+        'TAX_INDEX': tax.index.to_numpy()[tax_pos],
+        'OUTLET_NAME': tax['OUTLET_NAME'].to_numpy()[tax_pos],
+        'OUTLET_ADDRESS': tax['OUTLET_ADDRESS'].to_numpy()[tax_pos],
+        'OUTLET_ZIP_CODE': tax['OUTLET_ZIP_CODE'].to_numpy()[tax_pos],
+        'SNAP_RECORD_ID': snap['RECORD_ID'].to_numpy()[snap_pos],
+        'SNAP_STORE_NAME': snap['STORE_NAME'].to_numpy()[snap_pos],
+        'SNAP_STORE_STREET_ADDRESS': snap['STORE_STREET_ADDRESS'].to_numpy()[snap_pos],
+        'SNAP_ZIP_CODE': snap['ZIP_CODE'].to_numpy()[snap_pos],
+        'DISTANCE_MILES': distances,
+        'NAME_SIMILARITY': scores,
+    })
+    candidates = candidates[candidates['NAME_SIMILARITY'] >= min_name_similarity]
+    candidates = candidates.sort_values(['TAX_INDEX', 'NAME_SIMILARITY'], ascending=[True, False],
+                                        kind='stable').set_index('TAX_INDEX')
+
+    stats = {
+        'pairs_scored': len(tax_pos),
+        'all_pairs': len(tax) * len(snap),
+        'candidates': len(candidates),
+        'linked_records': candidates.index.nunique(),
+    }
+    return candidates, stats
@@ -0,0 +1,203 @@
+import pandas as pd
+
+from address_normalize import address_key
+from artifacts import strip_bom
+from boundaries import DALLAS_COUNTY_FIPS, assign_boundaries
+from name_similarity import pair_similarity
+from run_report import count_rows
+from spatial_index import build_grid_index, query_radius
+
+# Enhanced NAICS to store type mapping
+NAICS_TO_STORE_TYPE = {
+    445110: 'Supermarket',
+    445120: 'Convenience Store',
+    445210: 'Meat Market',
+    445220: 'Seafood Market',
+    445230: 'Produce Market',
+    445291: 'Bakery',
+    445292: 'Confectionery',
+    445299: 'Specialty Food',
+    445310: 'Liquor Store',
+    445000: 'Food Store',
+    445100: 'Grocery Store'
+}
+
+# Columns of the geocoded permits that the merge uses
+TAX_COLUMNS = [
+    'TAXPAYER_NUMBER', 'OUTLET_NUMBER', 'OUTLET_NAME', 'OUTLET_ADDRESS', 'OUTLET_CITY', 'OUTLET_STATE',
+    'OUTLET_ZIP_CODE', 'OUTLET_NAICS_CODE', 'Latitude', 'Longitude'
+]
+
+# A tax record is a duplicate of a SNAP store within this distance whose name is at
+# least this similar (about 250 ft, to allow for rooftop vs street-side geocodes)
+DEDUP_RADIUS_MILES = 0.05
+DEDUP_MIN_NAME_SIMILARITY = 0.75
+
+# Validate coordinate ranges for Dallas area when no county boundaries are available
+DALLAS_BOUNDS = {
+    'lat_min': 32.0, 'lat_max': 33.5,
+    'lon_min': -97.5, 'lon_max': -96.0
+}
+
+
+def standardize_columns(df):
+    """
+    Uppercases column names and replaces spaces with underscores, dropping
+    any byte order mark left on the first header.
+    """
+    df.columns = strip_bom(df.columns).str.upper().str.replace(' ', '_')
+    return df
+
+
+def prepare_snap(snap):
+    """
+    Standardizes SNAP retailer columns and builds SNAP_COMPOSITE_KEY, a hashed
+    key of the normalized street address, city and state.
+    """
+    snap = standardize_columns(snap)
+    for col in ['STORE_STREET_ADDRESS', 'CITY', 'STATE']:
+        if col in snap.columns:
+            snap[col] = snap[col].astype(str).str.upper()
+
+    snap['SNAP_COMPOSITE_KEY'] = address_key(snap['STORE_STREET_ADDRESS'], snap['CITY'], snap['STATE'])
+    return snap
+
+
+def prepare_tax(tax):
+    """
+    Standardizes geocoded tax permit columns, builds TAX_COMPOSITE_KEY (same
+    hashed address key as SNAP) and maps NAICS codes to STORE_TYPE.
+    """
+    tax = standardize_columns(tax)
+    for col in ['OUTLET_ADDRESS', 'OUTLET_CITY', 'OUTLET_STATE']:
+        if col in tax.columns:
+            tax[col] = tax[col].astype(str).str.upper()
+
+    tax['TAX_COMPOSITE_KEY'] = address_key(tax['OUTLET_ADDRESS'], tax['OUTLET_CITY'], tax['OUTLET_STATE'])
+
+    # Convert NAICS codes to numeric and map to store types, unmapped as 'Other'
+    tax['OUTLET_NAICS_CODE_NUMERIC'] = pd.to_numeric(tax['OUTLET_NAICS_CODE'], errors='coerce')
+    tax['STORE_TYPE'] = tax['OUTLET_NAICS_CODE_NUMERIC'].map(NAICS_TO_STORE_TYPE)
+    tax['STORE_TYPE'] = tax['STORE_TYPE'].fillna('Other')
+    return tax
+
+
+def find_unmatched_tax(tax, snap):
+    """
+    Returns the tax records whose composite key does not appear in SNAP.
+    """
+    unmatched = tax[~tax['TAX_COMPOSITE_KEY'].isin(snap['SNAP_COMPOSITE_KEY'])].copy()
+    count_rows('address_key_match', len(tax), len(unmatched))
+    return unmatched
+
+
+def clean_coordinates(tax_unmatched, bounds=DALLAS_BOUNDS, counties=None, county_fips=DALLAS_COUNTY_FIPS):
+    """
+    Drops records with missing, non-numeric or out-of-area coordinates: those
+    outside the county_fips polygon when counties (see boundaries.read_counties)
+    are given, else those outside the bounds box.
+    """
+    rows_in = len(tax_unmatched)
+    tax_unmatched = tax_unmatched.dropna(subset=['LATITUDE', 'LONGITUDE'])
+    tax_unmatched['LATITUDE'] = pd.to_numeric(tax_unmatched['LATITUDE'], errors='coerce')
+    tax_unmatched['LONGITUDE'] = pd.to_numeric(tax_unmatched['LONGITUDE'], errors='coerce')
+    tax_unmatched = tax_unmatched.dropna(subset=['LATITUDE', 'LONGITUDE'])
+    count_rows('coordinates_present', rows_in, len(tax_unmatched))
+
+    if counties is not None:
+        county = assign_boundaries(counties, tax_unmatched['LATITUDE'], tax_unmatched['LONGITUDE'])
+        valid_coords = pd.Series(county == county_fips, index=tax_unmatched.index).fillna(False)
+        count_rows('county_polygon', len(tax_unmatched), valid_coords.sum())
+        return tax_unmatched[valid_coords]
+
+    valid_coords = (
+        (tax_unmatched['LATITUDE'] >= bounds['lat_min']) &
+        (tax_unmatched['LATITUDE'] <= bounds['lat_max']) &
+        (tax_unmatched['LONGITUDE'] >= bounds['lon_min']) &
+        (tax_unmatched['LONGITUDE'] <= bounds['lon_max'])
+    )
+    count_rows('dallas_bounds', len(tax_unmatched), valid_coords.sum())
+    return tax_unmatched[valid_coords]
+
+
+def find_spatial_duplicates(tax_unmatched, snap, radius_miles=DEDUP_RADIUS_MILES,
+                            min_name_similarity=DEDUP_MIN_NAME_SIMILARITY):
+    """
+    Finds tax records that sit within radius_miles of a SNAP store with a
+    similar name, i.e. the same store under a different address spelling.
+    SNAP coordinates go into a grid index, so each tax record only measures
+    distances to SNAP stores in neighbouring cells.
+    Returns one row per flagged tax record (index label TAX_INDEX) with its
+    closest similar SNAP store, the distance and the name score.
+    """
+    snap = snap.dropna(subset=['LATITUDE', 'LONGITUDE'])
+    index = build_grid_index(snap['LATITUDE'].to_numpy(), snap['LONGITUDE'].to_numpy(), radius_miles)
+    tax_pos, snap_pos, distances = query_radius(
+        index, tax_unmatched['LATITUDE'].to_numpy(), tax_unmatched['LONGITUDE'].to_numpy(), radius_miles
+    )
+
+    scores = pair_similarity(
+        tax_unmatched['OUTLET_NAME'].to_numpy()[tax_pos], snap['STORE_NAME'].to_numpy()[snap_pos]
+    )
+    pairs = pd.DataFrame({
+        'TAX_INDEX': tax_unmatched.index.to_numpy()[tax_pos],
+        'OUTLET_NAME': tax_unmatched['OUTLET_NAME'].to_numpy()[tax_pos],
+        'OUTLET_ADDRESS': tax_unmatched['OUTLET_ADDRESS'].to_numpy()[tax_pos],
+        'SNAP_RECORD_ID': snap['RECORD_ID'].to_numpy()[snap_pos],
+        'SNAP_STORE_NAME': snap['STORE_NAME'].to_numpy()[snap_pos],
+        'SNAP_STORE_STREET_ADDRESS': snap['STORE_STREET_ADDRESS'].to_numpy()[snap_pos],
+        'DISTANCE_MILES': distances,
+        'NAME_SIMILARITY': scores,
+    })
+    pairs = pairs[pairs['NAME_SIMILARITY'] >= min_name_similarity]
+    pairs = pairs.sort_values(['TAX_INDEX', 'DISTANCE_MILES'], kind='stable')
+    return pairs.drop_duplicates('TAX_INDEX').set_index('TAX_INDEX')
+
+
+def tax_to_snap_schema(tax_unmatched, record_ids):
+    """
+    Maps unmatched tax records onto the SNAP retailer schema, with the given
+    RECORD_IDs (see record_ids.assign_record_ids).
+    """
+    return pd.DataFrame({
+        'RECORD_ID': record_ids,
+        'STORE_NAME': tax_unmatched['OUTLET_NAME'],
+        'STORE_STREET_ADDRESS': tax_unmatched['OUTLET_ADDRESS'],
+        'ADDITONAL_ADDRESS': '',  # Note: keeping original typo for consistency
+        'CITY': tax_unmatched['OUTLET_CITY'],
+        'STATE': tax_unmatched['OUTLET_STATE'],
+        'ZIP_CODE': tax_unmatched['OUTLET_ZIP_CODE'],
+        'ZIP4': '',
+        'COUNTY': 'DALLAS',
+        'STORE_TYPE': tax_unmatched['STORE_TYPE'],
+        'LATITUDE': tax_unmatched['LATITUDE'],
+        'LONGITUDE': tax_unmatched['LONGITUDE'],
+        'INCENTIVE_PROGRAM': '',
+        'GRANTEE_NAME': '',
+        'OBJECTID': None
+    })
+
+
+def combine_records(snap, tax_mapped):
+    """
+    Aligns the SNAP and mapped tax columns and stacks them into one dataset.
+    """
+    snap_columns = set(snap.columns)
+    mapped_columns = set(tax_mapped.columns)
+
+    # Add missing columns to tax_mapped
+    for col in snap_columns - mapped_columns:
+        if col != 'SNAP_COMPOSITE_KEY':
+            tax_mapped[col] = None
+
+    # Add missing columns to snap
+    for col in mapped_columns - snap_columns:
+        snap[col] = None
+
+    # Reorder columns to match: SNAP's order, then the tax-only ones, so every
+    # run writes the same layout
+    common_columns = list(dict.fromkeys(list(snap.columns) + list(tax_mapped.columns)))
+    if 'SNAP_COMPOSITE_KEY' in common_columns:
+        common_columns.remove('SNAP_COMPOSITE_KEY')
+
+    return pd.concat([snap[common_columns], tax_mapped[common_columns]], ignore_index=True)
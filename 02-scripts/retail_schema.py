@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+from artifacts import read_artifact, read_table
+
+# Columns with a handful of distinct values, kept as categoricals: each row
+# holds a small code and every distinct value is stored once
+CATEGORICAL_COLUMNS = [
+    'COUNTY', 'STATE', 'CITY', 'STORE_TYPE', 'INCENTIVE_PROGRAM', 'GRANTEE_NAME',
+    'CUISINE_TYPE', 'CATEGORY', 'SUBCATEGORY', 'SUB_SUBCATEGORY'
+]
+
+# Free text columns. Those whose values repeat (chain names, shared
+# addresses) often enough become categoricals too; the rest stay strings.
+TEXT_COLUMNS = ['STORE_NAME', 'STORE_STREET_ADDRESS', 'ADDITONAL_ADDRESS', 'ZIP4']
+
+# A text column is stored as a categorical when it has at most this many
+# distinct values per row
+TEXT_CATEGORY_MAX_DISTINCT = 0.5
+
+# Whole-number columns, stored in the smallest nullable integer type that fits
+INTEGER_COLUMNS = ['RECORD_ID', 'OBJECTID', 'ZIP_CODE']
+
+# float32 keeps about 7 significant digits: under a meter at Texas longitudes
+COORDINATE_COLUMNS = ['LATITUDE', 'LONGITUDE']
+
+# Web mercator X/Y from the SNAP file, the same positions as LATITUDE/LONGITUDE
+PROJECTED_COLUMNS = ['X', 'Y']
+
+
+def compact_stores(df, drop_projected=True):
+    """
+    Retail locations in their compact in-memory form: low-cardinality and
+    repetitive text as categoricals, whole numbers downcast to the smallest
+    nullable integer, coordinates as float32 and, unless drop_projected is
+    False, without the projected X/Y columns. Columns not in the schema are
+    left as they are.
+    """
+    df = df.drop(columns=[col for col in PROJECTED_COLUMNS if drop_projected and col in df.columns])
+    compact = {}
+    for col in df.columns:
+        values = df[col]
+        if col in CATEGORICAL_COLUMNS:
+            values = values.astype('category')
+        elif col in TEXT_COLUMNS:
+            if values.nunique() <= TEXT_CATEGORY_MAX_DISTINCT * len(values):
+                values = values.astype('category')
+            else:
+                values = values.astype('string')
+        elif col in INTEGER_COLUMNS:
+            numbers = pd.to_numeric(values, errors='coerce')
+            present = numbers.dropna()
+            # 63-bit ids of tax rows read back as floats can round past the int64 range
+            if (present % 1 == 0).all() and (present.abs() < 2 ** 63).all():
+                values = pd.to_numeric(numbers.astype('Int64'), downcast='integer')
+        elif col in COORDINATE_COLUMNS:
+            values = pd.to_numeric(values, errors='coerce').astype(np.float32)
+        compact[col] = values
+    return pd.DataFrame(compact, index=df.index)
+
+
+def read_stores(name='foodRetailLocations', columns=None, path=None):
+    """
+    Reads a retail locations artifact, or the file at path, in compact form
+    (see compact_stores), optionally only some columns.
+    """
+    df = read_artifact(name, columns) if path is None else read_table(path, columns)
+    return compact_stores(df)
+
+
+def memory_mb(df):
+    """
+    In-memory size of a DataFrame in MB, counting the contents of strings.
+    """
+    return df.memory_usage(deep=True).sum() / 1e6
@@ -0,0 +1,113 @@
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+from artifacts import DATA_DIR
+
+REPORT_DIR = os.path.join(DATA_DIR, 'run_reports')
+
+# The report of the script being run. Steps, row counts and metrics are added
+# as it goes and write_run_report saves it; library code can record into it
+# whether or not the calling script writes a report.
+_run = {}
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def start_run(name):
+    """
+    Starts a new report for a script run, e.g. start_run('merge').
+    """
+    _run.clear()
+    _run.update({
+        'run': name,
+        'argv': sys.argv[1:],
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        '_wall_start': time.perf_counter(),
+        '_cpu_start': time.process_time(),
+        'steps': [],
+        'filters': {},
+        'metrics': {},
+    })
+
+
+@contextmanager
+def step(name, rows_in=None):
+    """
+    Times a step of the run: wall and CPU seconds, the process's peak
+    resident memory when it ended and how much the step raised it. The
+    yielded dict takes the step's rows_out and any other counts:
+
+        with step('classify', rows_in=len(df)) as s:
+            ...
+            s['rows_out'] = len(df)
+    """
+    entry = {'step': name}
+    if rows_in is not None:
+        entry['rows_in'] = int(rows_in)
+    peak_before = _peak_rss_mb()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield entry
+    finally:
+        entry['wall_seconds'] = round(time.perf_counter() - wall_start, 3)
+        entry['cpu_seconds'] = round(time.process_time() - cpu_start, 3)
+        entry['peak_rss_mb'] = _peak_rss_mb()
+        entry['peak_rss_growth_mb'] = round(entry['peak_rss_mb'] - peak_before, 1)
+        if 'steps' in _run:
+            _run['steps'].append(entry)
+
+
+def count_rows(name, rows_in, rows_out):
+    """
+    Records the rows going into and kept by a filter. Counts for the same
+    filter add up, so chunked readers can record each chunk.
+    """
+    counts = _run.setdefault('filters', {}).setdefault(name, {'rows_in': 0, 'rows_out': 0})
+    counts['rows_in'] += int(rows_in)
+    counts['rows_out'] += int(rows_out)
+
+
+def record(section, values):
+    """
+    Adds values (a dict of JSON-serializable numbers and labels) to a
+    section of the report's metrics, e.g. record('geocoding', {...}).
+    """
+    _run.setdefault('metrics', {}).setdefault(section, {}).update(values)
+
+
+def run_report():
+    """
+    The current report, with the run's total wall and CPU time so far and
+    each filter's dropped rows.
+    """
+    report = {key: value for key, value in _run.items() if not key.startswith('_')}
+    if '_wall_start' in _run:
+        report['wall_seconds'] = round(time.perf_counter() - _run['_wall_start'], 3)
+        report['cpu_seconds'] = round(time.process_time() - _run['_cpu_start'], 3)
+    report['peak_rss_mb'] = _peak_rss_mb()
+    report['filters'] = {name: dict(counts, rows_dropped=counts['rows_in'] - counts['rows_out'])
+                         for name, counts in _run.get('filters', {}).items()}
+    return report
+
+
+def write_run_report(report_dir=REPORT_DIR):
+    """
+    Writes the current report to report_dir as <run>_<start time>.json and
+    returns its path.
+    """
+    report = run_report()
+    os.makedirs(report_dir, exist_ok=True)
+    path = os.path.join(report_dir, f"{report['run']}_{report['started'].replace(':', '')}.json")
+    with open(path + '.tmp', 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+        f.write('\n')
+    os.replace(path + '.tmp', path)
+    return path
@@ -1,68 +1,89 @@
-import pandas as pd
-import requests
+import argparse
 
-# Load Raw Data
-print("==== LOADING RAW DATA ====")
-file_path = "../local-data/Active_Sales_Tax_Permit_Holders_20250828.csv"
-df = pd.read_csv(file_path, low_memory=False)
+from artifacts import artifact_path, write_artifact
+from census_geocoder import BATCH_SIZE, CENSUS_BATCH_URL, CHECKPOINT_DIR, MAX_WORKERS, geocode_permits
+from geocode_cache import CACHE_PATH, TTL_DAYS
+from permit_ingest import DALLAS_COUNTY_CODE, read_food_permits, write_county_extracts
+from run_report import start_run, step, write_run_report
+from tiger_geocoder import fill_unmatched, geocode_offline, read_address_ranges, tiger_files
+
+parser = argparse.ArgumentParser(description="Filter and geocode food retail sales tax permits")
+parser.add_argument('--permits', default="../local-data/Active_Sales_Tax_Permit_Holders_20250828.csv",
+                    help="Active Sales Tax Permit Holders CSV")
+parser.add_argument('--counties', nargs='+', default=[DALLAS_COUNTY_CODE],
+                    help="Outlet county codes to keep (default: 57, Dallas)")
+parser.add_argument('--geocoder-url', default=CENSUS_BATCH_URL,
+                    help="addressbatch endpoint, e.g. a local stand-in server for testing")
+parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                    help="Addresses per geocoder request (service maximum 10,000)")
+parser.add_argument('--workers', type=int, default=MAX_WORKERS,
+                    help="Concurrent geocoder requests")
+parser.add_argument('--checkpoint-dir', default=CHECKPOINT_DIR,
+                    help="Where finished batches are kept so interrupted runs can resume")
+parser.add_argument('--cache', default=CACHE_PATH,
+                    help="SQLite geocode cache keyed by normalized address")
+parser.add_argument('--cache-ttl-days', type=int, default=TTL_DAYS,
+                    help="Re-geocode cached matches older than this")
+parser.add_argument('--refresh-cache', action='store_true',
+                    help="Clear the geocode cache before looking addresses up")
+parser.add_argument('--tiger', nargs='+', default=tiger_files(),
+                    help="TIGER/Line address range files (GeoJSON) to geocode the addresses the Census "
+                         "geocoder leaves unmatched (default: local-data/tiger/*.geojson)")
+parser.add_argument('--offline', action='store_true',
+                    help="Geocode every address from the TIGER files, without the cache or the Census geocoder")
+args = parser.parse_args()
+if args.offline and not args.tiger:
+    parser.error("--offline needs TIGER address range files (--tiger or local-data/tiger/)")
+start_run('sales_tax')
 
-# Standardize Cols
-print("==== PROCESSING RAW DATA ====")
-cols_to_str = ['Outlet County Code', 'Outlet NAICS Code']
-for col in cols_to_str:
-    df[col] = df[col].fillna(0).astype(str)
-df.columns = df.columns.str.upper().str.replace(' ', '_')
+# Load Raw Data, streaming the statewide file and keeping food retail (NAICS 445*)
+# in the requested counties
+print("==== LOADING RAW DATA ====")
+with step('load_permits') as s:
+    df = read_food_permits(args.permits, args.counties)
+    s['rows_out'] = len(df)
 
-# Select Food Retail on NAICS in Dallas County
-df = df[df['OUTLET_NAICS_CODE'].str.startswith('445')]
-df = df[df['OUTLET_COUNTY_CODE'] == '57.0']
+# One filtered extract per county from the single pass above
+with step('county_extracts', rows_in=len(df)):
+    for extract in write_county_extracts(df, artifact_path("food_permits_county_{}")):
+        print(f"Saved {extract}")
 
 # Create a Unique ID for each record
 df = df.reset_index(drop=True)
 df['ID'] = df.index.astype(str)
 
-# Census Geocoding requires the columns below as csv for batch processing
-print("==== CREATING BATCH DF ====")
-batch_df = pd.DataFrame({
-    0: df['ID'],
-    1: df['OUTLET_ADDRESS'],
-    2: df['OUTLET_CITY'],
-    3: df['OUTLET_STATE'],
-    4: df['OUTLET_ZIP_CODE'].astype(str)
-})
-batch_file = "../local-data/batch_input.csv"
-batch_df.to_csv(batch_file, index=False, header=False)
-
-# Now that we have our configured package, we can send a POST request to geocode batch processing
-# pass locations to get just geocoding response
-print("==== SEDNING PACKAGE AS POST REQUEST TO CENSUS GEOCODER ====")
-url = "https://geocoding.geo.census.gov/geocoder/locations/addressbatch"
-files = {'addressFile': open(batch_file, 'rb')}
-data = {
-    'returntype': 'locations',
-    'benchmark': 'Public_AR_Current'
-}
-response = requests.post(url, files=files, data=data)
-
-# Now we have the responses so lets save them and parse them
-print("==== SAVING AND PARSING RESULTS ====")
-output_file = "../local-data/geocoded_results.csv"
-with open(output_file, 'wb') as f:
-    f.write(response.content)
-geocoded_df = pd.read_csv(output_file, header=None)
-geocoded_df.columns = [
-    'ID', 'Input_Address', 'Match_Status', 'Match_Type', 'Matched_Address',
-    'Coordinates', 'TIGER_Line_ID', 'Side'
-]
-
-# seperate cordinates into individual columns
-geocoded_df[['Longitude', 'Latitude']] = geocoded_df['Coordinates'].str.split(',', expand=True)
+tiger_index = None
+if args.tiger:
+    with step('index_tiger') as s:
+        tiger_index = read_address_ranges(args.tiger)
+        s['rows_out'] = len(tiger_index['ranges'])
+    print(f"Indexed {len(tiger_index['ranges'])} TIGER address ranges from {len(args.tiger)} file(s)")
 
-# Merge the data with the original dataframe on ID
-df['ID'] = df['ID'].astype(str)
-geocoded_df['ID'] = geocoded_df['ID'].astype(str)
-final_df = df.merge(geocoded_df[['ID', 'Latitude', 'Longitude', 'Match_Status', 'Match_Type']], on='ID', how='left')
+# Look every address up in the local geocode cache first; only misses are written to
+# batch_input.parquet and sent to the geocoder in service-sized, checkpointed batches.
+# Addresses it can't match are interpolated from the TIGER address ranges, if given.
+# Offline, every address is written to batch_input.parquet and interpolated.
+with step('geocode', rows_in=len(df)) as s:
+    if args.offline:
+        print("==== GEOCODING FROM TIGER ADDRESS RANGES ====")
+        final_df = geocode_offline(df, tiger_index, batch_file=artifact_path("batch_input"),
+                                   results_file=artifact_path("geocoded_results"))
+    else:
+        final_df = geocode_permits(
+            df, cache_path=args.cache, ttl_days=args.cache_ttl_days, refresh_cache=args.refresh_cache,
+            url=args.geocoder_url, batch_size=args.batch_size, max_workers=args.workers,
+            checkpoint_dir=args.checkpoint_dir,
+            batch_file=artifact_path("batch_input"), results_file=artifact_path("geocoded_results")
+        )
+        if tiger_index is not None:
+            final_df = fill_unmatched(final_df, tiger_index)
+    s['rows_out'] = len(final_df)
+print(f"Geocoded: {(final_df['Match_Status'] == 'Match').sum()} of {len(final_df)} permits")
+if 'Geocoder' in final_df.columns:
+    print(final_df['Geocoder'].value_counts().to_string())
 
 # Save the final Data File
-final_df.to_csv("../local-data/final_geocoded_output.csv", index=False)
-print("Geocoding complete. Results saved to final_geocoded_output.csv")
\ No newline at end of file
+with step('write', rows_in=len(final_df)):
+    output = write_artifact(final_df, 'final_geocoded_output')
+print(f"Geocoding complete. Results saved to {output}")
+print(f"Run report saved to {write_run_report()}")
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+# Identity of a record within each source snapshot
+PERMIT_KEY = ['TAXPAYER_NUMBER', 'OUTLET_NUMBER']
+SNAP_KEY = ['RECORD_ID']
+
+CHANGE_ADDED = 'added'
+CHANGE_REMOVED = 'removed'
+CHANGE_MODIFIED = 'modified'
+
+
+def diff_snapshots(previous, current, key_cols, compare_cols=None):
+    """
+    Compares two snapshots of the same source on key_cols.
+    Rows are hashed over compare_cols (default: every column both snapshots
+    share) so modified records are found without comparing cell by cell.
+    Returns the changed rows with a CHANGE column: added and modified rows
+    carry current values, removed rows carry previous values.
+    """
+    if compare_cols is None:
+        compare_cols = [col for col in current.columns if col in previous.columns]
+
+    previous = previous.drop_duplicates(key_cols, keep='last')
+    current = current.drop_duplicates(key_cols, keep='last')
+
+    def row_hashes(df):
+        hashes = pd.util.hash_pandas_object(df[compare_cols].astype(str), index=False)
+        return df[key_cols].assign(_ROW_HASH=hashes.to_numpy())
+
+    joined = row_hashes(previous).merge(
+        row_hashes(current), on=key_cols, how='outer', suffixes=('_PREV', '_CURR'), indicator=True
+    )
+    added = joined.loc[joined['_merge'] == 'right_only', key_cols]
+    removed = joined.loc[joined['_merge'] == 'left_only', key_cols]
+    modified = joined.loc[
+        (joined['_merge'] == 'both') & (joined['_ROW_HASH_PREV'] != joined['_ROW_HASH_CURR']),
+        key_cols
+    ]
+
+    return pd.concat([
+        current.merge(added, on=key_cols).assign(CHANGE=CHANGE_ADDED),
+        current.merge(modified, on=key_cols).assign(CHANGE=CHANGE_MODIFIED),
+        previous.merge(removed, on=key_cols).assign(CHANGE=CHANGE_REMOVED),
+    ], ignore_index=True)
+
+
+def previous_versions(previous, changes, key_cols):
+    """
+    Returns the previous-snapshot rows of every modified or removed record.
+    """
+    changed_keys = changes.loc[changes['CHANGE'] != CHANGE_ADDED, key_cols]
+    return previous.drop_duplicates(key_cols, keep='last').merge(changed_keys, on=key_cols)
+
+
+def retail_row_keys(df):
+    """
+    Identifies rows of foodRetailLocations-shaped data across refreshes by
+    their RECORD_ID: the USDA id for SNAP rows, the crosswalk id for rows
+    added from tax permits (see record_ids). Ids outside the int64 range,
+    left by runs from before the ids were stable, come back missing.
+    """
+    ids = pd.to_numeric(df['RECORD_ID'], errors='coerce')
+    if ids.dtype.kind == 'f':
+        ids = ids.where(ids.abs() < 2 ** 63)
+    return ids.astype('Int64')
+
+
+def patch_rows(df, drop_keys, new_rows):
+    """
+    Updates df by RECORD_ID: rows with the id of a new row are replaced where
+    they stand, other rows whose id is in drop_keys are removed and the
+    remaining new_rows are appended, keeping df's column order.
+    """
+    new_rows = new_rows.reindex(columns=df.columns)
+    keys = retail_row_keys(df)
+    new_keys = retail_row_keys(new_rows)
+    replaced = keys.isin(new_keys).to_numpy(dtype=bool, na_value=False)
+    kept = ~replaced & ~keys.isin(drop_keys).to_numpy(dtype=bool, na_value=False)
+
+    # A new row takes the position of the row it replaces; new stores go after the end
+    replaced_at = pd.Series(np.flatnonzero(replaced), index=keys[replaced].to_numpy()).groupby(level=0).first()
+    new_order = new_keys.map(replaced_at).to_numpy(dtype=float, na_value=np.nan)
+    new_order = np.where(np.isnan(new_order), len(df) + np.arange(len(new_rows)), new_order)
+
+    patched = pd.concat([df[kept], new_rows], ignore_index=True)
+    order = np.concatenate([np.flatnonzero(kept), new_order])
+    return patched.iloc[np.argsort(order, kind='stable')].reset_index(drop=True)
+
+
+def summarize_changes(changes, source, key_cols, name_col, address_cols):
+    """
+    Flattens one source's change set into the shared change-log layout:
+    SOURCE, CHANGE, SOURCE_KEY, NAME, ADDRESS, CITY, STATE, ZIP.
+    """
+    address, city, state, zip_code = address_cols
+    source_key = changes[key_cols[0]].astype(str)
+    for col in key_cols[1:]:
+        source_key = source_key + '-' + changes[col].astype(str)
+    return pd.DataFrame({
+        'SOURCE': source,
+        'CHANGE': changes['CHANGE'],
+        'SOURCE_KEY': source_key,
+        'NAME': changes[name_col],
+        'ADDRESS': changes[address],
+        'CITY': changes[city],
+        'STATE': changes[state],
+        'ZIP': changes[zip_code],
+    })
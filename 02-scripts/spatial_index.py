@@ -0,0 +1,367 @@
+import numpy as np
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE_LAT = 69.0
+
+# Polygon index defaults: bounding boxes are bucketed into grid cells about
+# 3.5 miles on a side, and edges into latitude bands about 360 feet high,
+# so a point meets only the few edges of a polygon that cross its band
+POLYGON_CELL_DEGREES = 0.05
+EDGE_BAND_DEGREES = 0.001
+
+# Points located per pass, bounding the (point, polygon) and (point, edge) pair arrays
+LOCATE_CHUNK_POINTS = 200_000
+
+
+def haversine_miles(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in miles between arrays of points (degrees).
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=float)) for a in (lat1, lon1, lat2, lon2))
+    return _haversine_radians(lat1, lon1, np.cos(lat1), lat2, lon2, np.cos(lat2))
+
+
+def _haversine_radians(lat1, lon1, cos_lat1, lat2, lon2, cos_lat2):
+    # Takes radians and precomputed latitude cosines, so repeated points skip the conversions
+    a = np.sin((lat2 - lat1) / 2) ** 2 + cos_lat1 * cos_lat2 * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+
+
+def build_grid_index(lat, lon, cell_miles):
+    """
+    Buckets points into a uniform lat/lon grid with cells about cell_miles wide.
+    Points are sorted by cell, so each cell's members are one contiguous
+    slice found with a binary search.
+    Returns a dict with the grid parameters, the sorted cell ids and the
+    original positions of the points in that order.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    # Longitude degrees shrink towards the poles; size cells for the most
+    # poleward latitude in the data so a cell is never narrower than cell_miles
+    min_cos = np.cos(np.radians(np.max(np.abs(lat)))) if len(lat) else 1.0
+    index = {
+        'cell_lat': cell_miles / MILES_PER_DEGREE_LAT,
+        'cell_lon': cell_miles / (MILES_PER_DEGREE_LAT * max(min_cos, 0.01)),
+        'cell_miles': cell_miles,
+        'lat': lat,
+        'lon': lon,
+    }
+    rows, cols = _cells(index, lat, lon)
+    cell_ids = _cell_id(rows, cols)
+    order = np.argsort(cell_ids, kind='stable')
+    index['cell_ids'] = cell_ids[order]
+    index['order'] = order
+    return index
+
+
+def _cells(index, lat, lon):
+    rows = np.floor(np.asarray(lat, dtype=float) / index['cell_lat']).astype(np.int64)
+    cols = np.floor(np.asarray(lon, dtype=float) / index['cell_lon']).astype(np.int64)
+    return rows, cols
+
+
+def _cell_id(rows, cols):
+    # Rows and columns both fit comfortably in 32 bits at any useful cell size
+    return (rows << 32) + (cols & 0xFFFFFFFF)
+
+
+def candidate_pairs(index, lat, lon, rings=1):
+    """
+    Returns (query position, point position) pairs for every indexed point
+    in the grid cells within `rings` cells of each query point.
+    """
+    rows, cols = _cells(index, lat, lon)
+    query_parts, point_parts = [], []
+    for d_row in range(-rings, rings + 1):
+        for d_col in range(-rings, rings + 1):
+            cell_ids = _cell_id(rows + d_row, cols + d_col)
+            starts = np.searchsorted(index['cell_ids'], cell_ids, side='left')
+            ends = np.searchsorted(index['cell_ids'], cell_ids, side='right')
+            counts = ends - starts
+            if counts.sum() == 0:
+                continue
+            # Expand each [start, end) range into individual positions
+            queries = np.repeat(np.arange(len(cell_ids)), counts)
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            query_parts.append(queries)
+            point_parts.append(index['order'][np.repeat(starts, counts) + offsets])
+    if not query_parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(query_parts), np.concatenate(point_parts)
+
+
+def points_near(index, lat, lon, rings):
+    """
+    Positions of the indexed points in the grid cells within `rings` cells
+    of a single point, looked up in one vectorized pass, for interactive
+    queries where candidate_pairs' loop over cell offsets dominates.
+    """
+    rows, cols = _cells(index, [lat], [lon])
+    offsets = np.arange(-rings, rings + 1)
+    cell_ids = _cell_id(rows[0] + np.repeat(offsets, len(offsets)), cols[0] + np.tile(offsets, len(offsets)))
+    starts = np.searchsorted(index['cell_ids'], cell_ids, side='left')
+    counts = np.searchsorted(index['cell_ids'], cell_ids, side='right') - starts
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return index['order'][np.repeat(starts, counts) + local]
+
+
+def query_radius(index, lat, lon, radius_miles):
+    """
+    Finds every indexed point within radius_miles of each query point.
+    Returns (query positions, point positions, distances in miles).
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    rings = int(np.ceil(radius_miles / index['cell_miles']))
+    queries, points = candidate_pairs(index, lat, lon, rings)
+    distances = haversine_miles(lat[queries], lon[queries], index['lat'][points], index['lon'][points])
+    within = distances <= radius_miles
+    return queries[within], points[within], distances[within]
+
+
+def nearest_within(lat, lon, target_lat, target_lon, radii_miles=(), cell_miles=0.25):
+    """
+    Finds the nearest target to each point and counts the targets within
+    each of radii_miles.
+    Points are bucketed into grid cells and every target is first measured
+    from each cell's center: a target d miles from the center is between
+    d - h and d + h miles from every point in the cell (h is the distance
+    from the center to the cell's corners). Only targets that could be the
+    nearest, or that straddle a radius, are then measured point by point.
+    Returns (nearest target positions, nearest distances in miles, counts
+    with one column per radius). Points with missing coordinates get -1,
+    NaN and zero counts.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    target_lat = np.asarray(target_lat, dtype=float)
+    target_lon = np.asarray(target_lon, dtype=float)
+    radii = np.asarray(radii_miles, dtype=float)
+
+    nearest = np.full(len(lat), -1, dtype=np.int64)
+    distance = np.full(len(lat), np.nan)
+    counts = np.zeros((len(lat), len(radii)), dtype=np.int64)
+    valid = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+    if len(valid) == 0 or len(target_lat) == 0:
+        return nearest, distance, counts
+
+    grid = build_grid_index(lat[valid], lon[valid], cell_miles)
+    cell_ids = grid['cell_ids']
+    starts = np.flatnonzero(np.r_[True, cell_ids[1:] != cell_ids[:-1]])
+    sizes = np.diff(np.r_[starts, len(cell_ids)])
+    # Positions (into valid) of the points in cell order
+    points = grid['order']
+
+    rows, cols = _cells(grid, grid['lat'][points[starts]], grid['lon'][points[starts]])
+    center_lat = (rows + 0.5) * grid['cell_lat']
+    center_lon = (cols + 0.5) * grid['cell_lon']
+    half_diagonal = np.max([
+        haversine_miles(center_lat, center_lon, center_lat + d_lat * grid['cell_lat'] / 2,
+                        center_lon + d_lon * grid['cell_lon'] / 2)
+        for d_lat in (-1, 1) for d_lon in (-1, 1)
+    ], axis=0) * 1.001
+
+    # Radians and latitude cosines of the points (in cell order), centers and targets
+    point_lat, point_lon = np.radians(grid['lat'][points]), np.radians(grid['lon'][points])
+    point_cos = np.cos(point_lat)
+    center_lat, center_lon = np.radians(center_lat), np.radians(center_lon)
+    center_cos = np.cos(center_lat)
+    target_lat, target_lon = np.radians(target_lat), np.radians(target_lon)
+    target_cos = np.cos(target_lat)
+    sorted_nearest = np.empty(len(points), dtype=np.int64)
+    sorted_distance = np.empty(len(points))
+    sorted_counts = np.zeros((len(points), len(radii)), dtype=np.int64)
+
+    # Each chunk of cells holds a (cells x targets) distance matrix of about a million entries
+    chunk = max(1, 1_000_000 // len(target_lat))
+    for first in range(0, len(starts), chunk):
+        cells = np.arange(first, min(first + chunk, len(starts)))
+        center_distance = _haversine_radians(
+            center_lat[cells, None], center_lon[cells, None], center_cos[cells, None],
+            target_lat[None, :], target_lon[None, :], target_cos[None, :]
+        )
+        h = half_diagonal[cells, None]
+        low, high = center_distance - h, center_distance + h
+
+        # The chunk's points are one contiguous span in cell order
+        span = slice(starts[cells[0]], starts[cells[-1]] + sizes[cells[-1]])
+
+        needed = low <= high.min(axis=1, keepdims=True)
+        straddles = []
+        for j, radius in enumerate(radii):
+            inside = high <= radius
+            sorted_counts[span, j] = np.repeat(inside.sum(axis=1), sizes[cells])
+            straddles.append((low <= radius) & ~inside)
+            needed |= straddles[-1]
+
+        # Pair every point of a cell with each of the cell's needed targets, point by
+        # point, so each point's pairs are contiguous
+        _, pair_targets = np.nonzero(needed)
+        n_targets = needed.sum(axis=1)
+        n_pairs = sizes[cells] * n_targets
+        local = np.arange(n_pairs.sum()) - np.repeat(np.cumsum(n_pairs) - n_pairs, n_pairs)
+        cell_of_pair = np.repeat(np.arange(len(cells)), n_pairs)
+        target_slot = (np.cumsum(n_targets) - n_targets)[cell_of_pair] + local % n_targets[cell_of_pair]
+        pair_points = starts[cells][cell_of_pair] + local // n_targets[cell_of_pair]
+        pair_targets = pair_targets[target_slot]
+        pair_distances = _haversine_radians(
+            point_lat[pair_points], point_lon[pair_points], point_cos[pair_points],
+            target_lat[pair_targets], target_lon[pair_targets], target_cos[pair_targets]
+        )
+
+        # Every point has at least one candidate, so reduceat over each point's run works
+        point_pairs = np.repeat(n_targets, sizes[cells])
+        point_starts = np.cumsum(point_pairs) - point_pairs
+        closest = np.minimum.reduceat(pair_distances, point_starts)
+        is_closest = pair_distances == np.repeat(closest, point_pairs)
+        first_closest = np.minimum.reduceat(
+            np.where(is_closest, np.arange(len(pair_points)), len(pair_points)), point_starts
+        )
+        sorted_nearest[span] = pair_targets[first_closest]
+        sorted_distance[span] = closest
+
+        for j, radius in enumerate(radii):
+            within = straddles[j][cell_of_pair, pair_targets] & (pair_distances <= radius)
+            sorted_counts[span, j] += np.add.reduceat(within.astype(np.int64), point_starts)
+
+    nearest[valid[points]] = sorted_nearest
+    distance[valid[points]] = sorted_distance
+    counts[valid[points]] = sorted_counts
+    return nearest, distance, counts
+
+
+def points_in_polygon(lat, lon, rings):
+    """
+    Which points lie inside a polygon given as a list of rings of
+    (lon, lat) vertices, GeoJSON order: the outer boundary first, then any
+    holes. Uses the even-odd rule, so points inside a hole are outside.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    inside = np.zeros(len(lat), dtype=bool)
+    for ring in rings:
+        ring = np.asarray(ring, dtype=float)
+        x1, y1 = ring[:, 0], ring[:, 1]
+        x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+        # Only edges spanning a point's latitude can cross its eastward ray
+        for ex1, ey1, ex2, ey2 in zip(x1, y1, x2, y2):
+            if ey1 == ey2:
+                continue
+            spans = (ey1 > lat) != (ey2 > lat)
+            crossing_lon = ex1 + (lat - ey1) * (ex2 - ex1) / (ey2 - ey1)
+            inside ^= spans & (lon < crossing_lon)
+    return inside
+
+
+def _expand_ranges(starts, counts):
+    # Every position in the ranges [start, start + count), with the range each came from
+    owners = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owners, np.repeat(starts, counts) + offsets
+
+
+def build_polygon_index(polygons, cell_degrees=POLYGON_CELL_DEGREES, band_degrees=EDGE_BAND_DEGREES):
+    """
+    Indexes polygons, each a list of rings of (lon, lat) vertices in GeoJSON
+    order, for locate_points. Each polygon's bounding box is registered in
+    every grid cell it covers, and each of its edges in every latitude band
+    the edge spans, both as sorted keys found with a binary search.
+    """
+    bounds = np.empty((len(polygons), 4))
+    edge_parts = []
+    for position, rings in enumerate(polygons):
+        vertices = [np.asarray(ring, dtype=float)[:, :2] for ring in rings]
+        outer = vertices[0]
+        bounds[position] = outer[:, 0].min(), outer[:, 0].max(), outer[:, 1].min(), outer[:, 1].max()
+        for ring in vertices:
+            # Each vertex to the next, closing the ring; a repeated closing vertex gives a zero-length edge
+            edges = np.column_stack([ring, np.roll(ring, -1, axis=0)])
+            edges = edges[edges[:, 1] != edges[:, 3]]
+            edge_parts.append(np.column_stack([np.full(len(edges), position), edges]))
+    edges = np.concatenate(edge_parts) if edge_parts else np.empty((0, 5))
+    edge_polygons = edges[:, 0].astype(np.int64)
+
+    # Edges by (polygon, latitude band), one entry per band an edge spans
+    low_band = np.floor(np.minimum(edges[:, 2], edges[:, 4]) / band_degrees).astype(np.int64)
+    high_band = np.floor(np.maximum(edges[:, 2], edges[:, 4]) / band_degrees).astype(np.int64)
+    owners, bands = _expand_ranges(low_band, high_band - low_band + 1)
+    band_keys = _cell_id(edge_polygons[owners], bands)
+    band_order = np.argsort(band_keys, kind='stable')
+
+    # Polygons by grid cell, one entry per cell a bounding box covers
+    first_row = np.floor(bounds[:, 2] / cell_degrees).astype(np.int64)
+    first_col = np.floor(bounds[:, 0] / cell_degrees).astype(np.int64)
+    n_rows = np.floor(bounds[:, 3] / cell_degrees).astype(np.int64) - first_row + 1
+    n_cols = np.floor(bounds[:, 1] / cell_degrees).astype(np.int64) - first_col + 1
+    cell_polygons, local = _expand_ranges(np.zeros(len(polygons), dtype=np.int64), n_rows * n_cols)
+    cell_keys = _cell_id(first_row[cell_polygons] + local // n_cols[cell_polygons],
+                         first_col[cell_polygons] + local % n_cols[cell_polygons])
+    cell_order = np.argsort(cell_keys, kind='stable')
+
+    return {
+        'cell_degrees': cell_degrees,
+        'band_degrees': band_degrees,
+        'bounds': bounds,
+        'cell_keys': cell_keys[cell_order],
+        'cell_polygons': cell_polygons[cell_order],
+        'band_keys': band_keys[band_order],
+        'band_edges': owners[band_order],
+        'edges': edges[:, 1:],
+    }
+
+
+def locate_points(index, lat, lon):
+    """
+    Position of the polygon (see build_polygon_index) containing each point,
+    or -1 for points outside every polygon or missing coordinates. A point
+    is tested only against the polygons whose bounding box holds it, and
+    for each of those only against the edges in its latitude band, with the
+    even-odd rule of points_in_polygon. Where polygons overlap, or a point
+    lies on a shared border, the first polygon wins.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    located = np.full(len(lat), -1, dtype=np.int64)
+    for first in range(0, len(lat), LOCATE_CHUNK_POINTS):
+        chunk = slice(first, first + LOCATE_CHUNK_POINTS)
+        located[chunk] = _locate_chunk(index, lat[chunk], lon[chunk])
+    return located
+
+
+def _locate_chunk(index, lat, lon):
+    located = np.full(len(lat), -1, dtype=np.int64)
+    valid = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+    lat, lon = lat[valid], lon[valid]
+
+    # (point, polygon) pairs from the point's grid cell, kept where the bounding box holds the point
+    cell_keys = _cell_id(np.floor(lat / index['cell_degrees']).astype(np.int64),
+                         np.floor(lon / index['cell_degrees']).astype(np.int64))
+    starts = np.searchsorted(index['cell_keys'], cell_keys, side='left')
+    counts = np.searchsorted(index['cell_keys'], cell_keys, side='right') - starts
+    points, entries = _expand_ranges(starts, counts)
+    polygons = index['cell_polygons'][entries]
+    bounds = index['bounds'][polygons]
+    in_box = ((lon[points] >= bounds[:, 0]) & (lon[points] <= bounds[:, 1])
+              & (lat[points] >= bounds[:, 2]) & (lat[points] <= bounds[:, 3]))
+    points, polygons = points[in_box], polygons[in_box]
+
+    # (pair, edge) pairs from the polygon's edges in the point's latitude band
+    band_keys = _cell_id(polygons, np.floor(lat[points] / index['band_degrees']).astype(np.int64))
+    starts = np.searchsorted(index['band_keys'], band_keys, side='left')
+    counts = np.searchsorted(index['band_keys'], band_keys, side='right') - starts
+    pairs, entries = _expand_ranges(starts, counts)
+    x1, y1, x2, y2 = index['edges'][index['band_edges'][entries]].T
+    pair_lat, pair_lon = lat[points[pairs]], lon[points[pairs]]
+    spans = (y1 > pair_lat) != (y2 > pair_lat)
+    crossing_lon = x1 + (pair_lat - y1) * (x2 - x1) / (y2 - y1)
+    crossings = np.bincount(pairs, weights=spans & (pair_lon < crossing_lon), minlength=len(points))
+    inside = crossings % 2 == 1
+
+    # The first polygon for points inside several
+    points, polygons = points[inside], polygons[inside]
+    order = np.lexsort((polygons, points))
+    points, polygons = points[order], polygons[order]
+    first_of_point = np.r_[True, points[1:] != points[:-1]] if len(points) else np.empty(0, dtype=bool)
+    located[valid[points[first_of_point]]] = polygons[first_of_point]
+    return located
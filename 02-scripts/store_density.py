@@ -0,0 +1,32 @@
+import argparse
+import time
+
+from artifacts import read_artifact, read_table, write_artifact
+from density_grid import DENSITY_GROUP_COLUMNS, DENSITY_ZOOMS, density_pyramid, totals
+
+parser = argparse.ArgumentParser(
+    description="Pre-aggregate store counts per quadtree cell, store type and cuisine category"
+)
+parser.add_argument('--stores', help="Retail locations file (default: the CuisineRetailLocations2 artifact)")
+parser.add_argument('--zooms', nargs='+', type=int, default=list(DENSITY_ZOOMS),
+                    help="Quadtree zoom levels to count at")
+args = parser.parse_args()
+
+# Coordinates at full precision: float32 could move a store into a neighbouring cell
+columns = ['LATITUDE', 'LONGITUDE'] + DENSITY_GROUP_COLUMNS
+stores = read_table(args.stores, columns) if args.stores else read_artifact('CuisineRetailLocations2', columns)
+print(f"Stores: {len(stores)}, without coordinates: {stores['LATITUDE'].isna().sum()}")
+
+start = time.perf_counter()
+pyramid = density_pyramid(stores, args.zooms)
+print(f"Counted at zooms {', '.join(map(str, sorted(args.zooms)))} in {time.perf_counter() - start:.1f}s")
+for zoom, rows in pyramid.groupby('ZOOM'):
+    print(f"  zoom {zoom}: {rows['CELL'].nunique()} cells, {len(rows)} rows")
+
+print("\nBy store type:")
+print(totals(pyramid, 'STORE_TYPE').to_string())
+print("\nBy main category:")
+print(totals(pyramid, 'CATEGORY').to_string())
+
+output = write_artifact(pyramid, 'store_density')
+print(f"\nDensity pyramid saved to {output}")
@@ -0,0 +1,41 @@
+import argparse
+import time
+
+import pandas as pd
+
+from artifacts import read_artifact, read_table, write_artifact
+from boundaries import COUNTIES_FILE, TRACTS_FILE, assign_boundaries, read_counties, read_tracts
+
+parser = argparse.ArgumentParser(
+    description="Assign each store the county FIPS code and census tract GEOID of its location"
+)
+parser.add_argument('--stores', help="Retail locations file (default: the foodRetailLocations artifact)")
+parser.add_argument('--counties', default=COUNTIES_FILE, help="County boundaries (GeoJSON)")
+parser.add_argument('--tracts', default=TRACTS_FILE, help="Census tract boundaries (GeoJSON)")
+args = parser.parse_args()
+
+# Coordinates at full precision: float32 could move a store across a tract edge
+columns = ['RECORD_ID', 'LATITUDE', 'LONGITUDE']
+stores = read_table(args.stores, columns) if args.stores else read_artifact('foodRetailLocations', columns)
+print(f"Stores: {len(stores)}, without coordinates: {stores['LATITUDE'].isna().sum()}")
+
+start = time.perf_counter()
+counties = read_counties(args.counties)
+tracts = read_tracts(args.tracts)
+print(f"Read {len(set(counties['geoids']))} counties and {len(set(tracts['geoids']))} tracts "
+      f"in {time.perf_counter() - start:.1f}s")
+
+start = time.perf_counter()
+geographies = pd.DataFrame({
+    'RECORD_ID': stores['RECORD_ID'],
+    'COUNTY_FIPS': assign_boundaries(counties, stores['LATITUDE'], stores['LONGITUDE']),
+    'TRACT_GEOID': assign_boundaries(tracts, stores['LATITUDE'], stores['LONGITUDE']),
+})
+print(f"Located stores in {time.perf_counter() - start:.1f}s")
+print(f"Stores outside every county: {geographies['COUNTY_FIPS'].isna().sum()}")
+print(f"Stores outside every tract: {geographies['TRACT_GEOID'].isna().sum()}")
+print("\nStores by county:")
+print(geographies['COUNTY_FIPS'].value_counts().to_string())
+
+output = write_artifact(geographies, 'store_geographies')
+print(f"\nStore geographies saved to {output}")
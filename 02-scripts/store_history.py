@@ -0,0 +1,166 @@
+import glob
+import os
+import re
+
+import pandas as pd
+
+from artifacts import DATA_DIR, read_table, write_table
+from snapshot_delta import CHANGE_ADDED, CHANGE_REMOVED, diff_snapshots, retail_row_keys
+
+# One change log per recorded snapshot of foodRetailLocations, in a folder named
+# by its date: HISTORY_DIR/SNAPSHOT=YYYY-MM-DD/changes.parquet. The first
+# snapshot records every store as opened, later ones only what changed.
+HISTORY_DIR = os.path.join(DATA_DIR, 'store_history')
+CHANGES_FILE = 'changes.parquet'
+SNAPSHOT_PATTERN = re.compile(r'^SNAPSHOT=(\d{4}-\d{2}-\d{2})$')
+
+# Store attributes kept in the change logs. A change to any of them is a
+# modification; other columns of the published file are not tracked.
+TEXT_COLUMNS = ['STORE_NAME', 'STORE_TYPE', 'STORE_STREET_ADDRESS', 'CITY', 'STATE', 'ZIP_CODE', 'COUNTY']
+COORDINATE_COLUMNS = ['LATITUDE', 'LONGITUDE']
+TRACKED_COLUMNS = TEXT_COLUMNS + COORDINATE_COLUMNS
+
+CHANGE_OPENED = 'opened'
+CHANGE_CLOSED = 'closed'
+CHANGE_MODIFIED = 'modified'
+
+# diff_snapshots change names as recorded in the log
+_CHANGE_NAMES = {CHANGE_ADDED: CHANGE_OPENED, CHANGE_REMOVED: CHANGE_CLOSED}
+
+HISTORY_COLUMNS = ['RECORD_ID', 'CHANGE'] + TRACKED_COLUMNS
+
+
+def snapshot_dir(snapshot, history_dir=HISTORY_DIR):
+    return os.path.join(history_dir, f'SNAPSHOT={snapshot}')
+
+
+def recorded_snapshots(history_dir=HISTORY_DIR):
+    """
+    Dates (YYYY-MM-DD) of the snapshots with a change log, oldest first.
+    """
+    snapshots = []
+    for path in glob.glob(os.path.join(history_dir, 'SNAPSHOT=*', CHANGES_FILE)):
+        match = SNAPSHOT_PATTERN.match(os.path.basename(os.path.dirname(path)))
+        if match:
+            snapshots.append(match.group(1))
+    return sorted(snapshots)
+
+
+def history_rows(stores):
+    """
+    foodRetailLocations-shaped rows in the change log layout: RECORD_ID as
+    Int64, tracked text columns as strings (ZIP codes without a decimal
+    part) and coordinates as floats. Rows without a usable RECORD_ID are
+    left out, since they can't be followed from one snapshot to the next.
+    """
+    stores = stores.reindex(columns=['RECORD_ID'] + TRACKED_COLUMNS)
+    rows = {'RECORD_ID': retail_row_keys(stores)}
+    for col in TEXT_COLUMNS:
+        values = stores[col]
+        if col == 'ZIP_CODE':
+            numbers = pd.to_numeric(values, errors='coerce')
+            values = values.where(numbers.isna(), numbers.astype('Int64').astype(str))
+        rows[col] = values.astype('string').str.strip()
+    for col in COORDINATE_COLUMNS:
+        rows[col] = pd.to_numeric(stores[col], errors='coerce').astype(float)
+    rows = pd.DataFrame(rows, index=stores.index)
+    return rows[rows['RECORD_ID'].notna()].reset_index(drop=True)
+
+
+def untracked_stores(stores):
+    """
+    Number of stores history_rows leaves out for want of a usable RECORD_ID,
+    e.g. the random ids of tax rows published before the ids were stable.
+    """
+    return int(retail_row_keys(stores).isna().sum())
+
+
+def read_changes(after=None, until=None, history_dir=HISTORY_DIR):
+    """
+    Change log rows of the snapshots recorded after `after` (exclusive) and
+    up to `until` (inclusive), either bound optional, with a SNAPSHOT column.
+    Only those snapshots' files are read.
+    """
+    snapshots = [s for s in recorded_snapshots(history_dir)
+                 if (after is None or s > after) and (until is None or s <= until)]
+    changes = [read_table(os.path.join(snapshot_dir(s, history_dir), CHANGES_FILE)).assign(SNAPSHOT=s)
+               for s in snapshots]
+    if not changes:
+        return pd.DataFrame({col: pd.Series(dtype='Int64' if col == 'RECORD_ID' else object)
+                             for col in HISTORY_COLUMNS + ['SNAPSHOT']})
+    changes = pd.concat(changes, ignore_index=True)
+    changes['RECORD_ID'] = changes['RECORD_ID'].astype('Int64')
+    return changes
+
+
+def as_of(snapshot, history_dir=HISTORY_DIR):
+    """
+    The stores open on a date: each store's latest change up to it, leaving
+    out those whose latest change is a closure. Carries the SNAPSHOT the
+    store's attributes were last recorded in.
+    """
+    changes = read_changes(until=snapshot, history_dir=history_dir)
+    latest = changes.drop_duplicates('RECORD_ID', keep='last')
+    state = latest[latest['CHANGE'] != CHANGE_CLOSED]
+    return state.drop(columns='CHANGE').reset_index(drop=True)
+
+
+def record_snapshot(stores, snapshot, history_dir=HISTORY_DIR):
+    """
+    Records a snapshot of the retail locations as its changes from the state
+    of the previous recorded snapshot. Recording the latest snapshot again
+    replaces its change log; snapshots are only ever added at the end, so
+    recording one older than the latest raises a ValueError. Returns the
+    changes.
+    """
+    snapshots = recorded_snapshots(history_dir)
+    if snapshots and snapshot < snapshots[-1]:
+        raise ValueError(f"Snapshot {snapshot} is older than the latest recorded one, {snapshots[-1]}")
+
+    previous = [s for s in snapshots if s < snapshot]
+    if previous:
+        previous_state = history_rows(as_of(previous[-1], history_dir))
+    else:
+        previous_state = history_rows(pd.DataFrame(columns=['RECORD_ID'] + TRACKED_COLUMNS))
+    current = history_rows(stores)
+
+    changes = diff_snapshots(previous_state, current, ['RECORD_ID'], TRACKED_COLUMNS)
+    changes['CHANGE'] = changes['CHANGE'].replace(_CHANGE_NAMES)
+    changes = changes[HISTORY_COLUMNS].sort_values('RECORD_ID', kind='stable').reset_index(drop=True)
+
+    os.makedirs(snapshot_dir(snapshot, history_dir), exist_ok=True)
+    write_table(changes, os.path.join(snapshot_dir(snapshot, history_dir), CHANGES_FILE))
+    return changes
+
+
+def openings_and_closures(start, end, history_dir=HISTORY_DIR, include_modified=False, **filters):
+    """
+    Stores opened or closed in snapshots after start and up to end, e.g.
+    openings_and_closures('2024-10-01', '2025-10-01', ZIP_CODE=['75216']).
+    Keyword filters name a tracked text column and a value or list of
+    values to keep, matched without regard to case or surrounding spaces
+    (CITY='Dallas' keeps 'DALLAS'); None keeps every value. Closures are
+    matched on the store's last recorded attributes.
+    """
+    changes = read_changes(after=start, until=end, history_dir=history_dir)
+    if not include_modified:
+        changes = changes[changes['CHANGE'] != CHANGE_MODIFIED]
+    for col, values in filters.items():
+        if col not in TEXT_COLUMNS:
+            raise ValueError(f"Can't filter on {col}; filter columns: {', '.join(TEXT_COLUMNS)}")
+        if values is None:
+            continue
+        values = values if pd.api.types.is_list_like(values) else [values]
+        wanted = {str(value).strip().upper() for value in values}
+        changes = changes[changes[col].astype('string').str.upper().isin(wanted).fillna(False)]
+    return changes.reset_index(drop=True)
+
+
+def count_changes(changes, by):
+    """
+    Openings and closures per group of the by columns, with the net change.
+    """
+    counts = pd.crosstab([changes[col].fillna('') for col in by], changes['CHANGE'])
+    counts = counts.reindex(columns=[CHANGE_OPENED, CHANGE_CLOSED], fill_value=0)
+    counts['NET'] = counts[CHANGE_OPENED] - counts[CHANGE_CLOSED]
+    return counts.sort_values('NET', kind='stable').reset_index()
@@ -0,0 +1,321 @@
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from artifacts import resolve_artifact
+from retail_schema import read_stores
+from spatial_index import build_grid_index, haversine_miles, points_in_polygon, points_near
+
+# Columns with an attribute index; query parameters of the same name in lower case filter on them
+FILTER_COLUMNS = ['STORE_TYPE', 'CUISINE_TYPE', 'CATEGORY', 'ZIP_CODE']
+
+# Columns returned for each store
+RESULT_COLUMNS = ['RECORD_ID', 'STORE_NAME', 'STORE_TYPE', 'CUISINE_TYPE', 'CATEGORY',
+                  'STORE_STREET_ADDRESS', 'CITY', 'ZIP_CODE', 'LATITUDE', 'LONGITUDE']
+
+SERVICE_CELL_MILES = 0.5
+
+# Nearest-store searches grow their radius up to this many grid cells, then
+# measure every matching store instead
+MAX_SEARCH_RINGS = 16
+
+# Filters matching at most this many stores are answered by measuring each of them
+BRUTE_FORCE_STORES = 5_000
+
+# Largest result a radius or polygon query returns
+MAX_RESULTS = 10_000
+
+# Largest radius a radius query accepts
+MAX_RADIUS_MILES = 100
+
+# Seconds between checks for a newly published dataset
+RELOAD_INTERVAL = 5
+
+
+def load_store_index(path, cell_miles=SERVICE_CELL_MILES):
+    """
+    Loads a retail locations file into the in-memory indexes the service
+    queries: a grid index of the stores with coordinates, the positions of
+    each value of the FILTER_COLUMNS, and the result columns. Stores are read
+    in compact form (see retail_schema) and each result column is kept as
+    codes into its distinct values, so a repeated name or city is held once.
+    """
+    stores = read_stores(path=path)
+    stores = stores.dropna(subset=['LATITUDE', 'LONGITUDE']).reset_index(drop=True)
+    if 'ZIP_CODE' in stores.columns:
+        stores['ZIP_CODE'] = stores['ZIP_CODE'].astype('string').str.zfill(5).astype('category')
+
+    attributes = {}
+    for col in FILTER_COLUMNS:
+        if col in stores.columns:
+            attributes[col] = {str(value): positions
+                               for value, positions in stores.groupby(col).indices.items()}
+
+    stat = os.stat(path)
+    return {
+        'path': path,
+        'signature': (stat.st_size, stat.st_mtime_ns),
+        'loaded_at': time.time(),
+        'grid': build_grid_index(stores['LATITUDE'], stores['LONGITUDE'], cell_miles),
+        'attributes': attributes,
+        'size': len(stores),
+        'columns': {col: _result_column(stores[col]) for col in RESULT_COLUMNS if col in stores.columns},
+    }
+
+
+def _result_column(values):
+    # Returns (codes, distinct values), with None as the last distinct value
+    # so that the -1 code of missing values picks it. Coordinates are nearly
+    # all distinct and are kept as plain floats instead (codes None).
+    if values.name in ('LATITUDE', 'LONGITUDE'):
+        # float32 steps are about 7.6e-6 degrees at Dallas' longitude (under a meter), so
+        # the 6th decimal is approximate; rounding only drops the float32 -> float64 noise
+        return None, np.round(values.to_numpy(dtype=float), 6)
+    codes, uniques = pd.factorize(values)
+    return codes, np.append(np.asarray(uniques, dtype=object), None)
+
+
+def filter_positions(index, filters):
+    """
+    Sorted positions of the stores matching every filter ({column: [values]}),
+    or None when there are no filters. Unknown columns raise ValueError.
+    """
+    positions = None
+    for col, values in filters.items():
+        if col not in index['attributes']:
+            raise ValueError(f"Can't filter on {col}; indexed columns: {', '.join(index['attributes'])}")
+        # Each value's positions are sorted and values don't overlap
+        parts = [index['attributes'][col].get(value, np.empty(0, dtype=np.int64)) for value in values]
+        matches = parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts))
+        positions = matches if positions is None else positions[_mask(index, matches)[positions]]
+    return positions
+
+
+def _mask(index, positions):
+    if positions is None:
+        return None
+    mask = np.zeros(index['size'], dtype=bool)
+    mask[positions] = True
+    return mask
+
+
+def _results(index, positions, distances=None):
+    columns = {col: (values[positions] if codes is None else values[codes[positions]]).tolist()
+               for col, (codes, values) in index['columns'].items()}
+    if distances is not None:
+        columns['MILES'] = [round(miles, 4) for miles in distances.tolist()]
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
+def _closest(positions, distances, limit):
+    order = np.lexsort((positions, distances))[:limit]
+    return positions[order], distances[order]
+
+
+def nearest_stores(index, lat, lon, k=5, filters=None):
+    """
+    The k stores nearest to a point among those matching filters, closest
+    first. Filters matching few stores are answered by measuring each of
+    them; otherwise the search radius doubles from one grid cell until k
+    matching stores lie within it.
+    """
+    grid = index['grid']
+    positions = filter_positions(index, filters or {})
+    if positions is None or len(positions) > BRUTE_FORCE_STORES:
+        mask = _mask(index, positions)
+        rings = 1
+        while rings <= MAX_SEARCH_RINGS:
+            near = points_near(grid, lat, lon, rings)
+            if mask is not None:
+                near = near[mask[near]]
+            distances = haversine_miles(lat, lon, grid['lat'][near], grid['lon'][near])
+            # Only stores within the searched radius are certain to be the closest
+            within = distances <= rings * grid['cell_miles']
+            if within.sum() >= k:
+                return _results(index, *_closest(near[within], distances[within], k))
+            rings *= 2
+        if positions is None:
+            positions = np.arange(index['size'])
+
+    distances = haversine_miles(lat, lon, grid['lat'][positions], grid['lon'][positions])
+    return _results(index, *_closest(positions, distances, k))
+
+
+def stores_within(index, lat, lon, miles, filters=None):
+    """
+    The stores within miles of a point among those matching filters, closest
+    first. Radii over MAX_SEARCH_RINGS grid cells measure every matching
+    store instead of gathering the cells. Raises ValueError unless miles is
+    positive and at most MAX_RADIUS_MILES.
+    """
+    if not 0 < miles <= MAX_RADIUS_MILES:
+        raise ValueError(f"miles must be above 0 and at most {MAX_RADIUS_MILES}")
+    grid = index['grid']
+    positions = filter_positions(index, filters or {})
+    rings = int(np.ceil(miles / grid['cell_miles']))
+    if rings > MAX_SEARCH_RINGS:
+        near = np.arange(index['size']) if positions is None else positions
+    else:
+        mask = _mask(index, positions)
+        near = points_near(grid, lat, lon, rings)
+        if mask is not None:
+            near = near[mask[near]]
+    distances = haversine_miles(lat, lon, grid['lat'][near], grid['lon'][near])
+    within = distances <= miles
+    return _results(index, *_closest(near[within], distances[within], MAX_RESULTS))
+
+
+def stores_in_polygon(index, geometry, filters=None):
+    """
+    The stores inside a GeoJSON Polygon or MultiPolygon geometry among those
+    matching filters.
+    """
+    if geometry.get('type') == 'Polygon':
+        polygons = [geometry['coordinates']]
+    elif geometry.get('type') == 'MultiPolygon':
+        polygons = geometry['coordinates']
+    else:
+        raise ValueError("Geometry must be a GeoJSON Polygon or MultiPolygon")
+
+    mask = _mask(index, filter_positions(index, filters or {}))
+    grid = index['grid']
+    inside = np.zeros(index['size'], dtype=bool)
+    for rings in polygons:
+        outer = np.asarray(rings[0], dtype=float)
+        # Only the stores in the polygon's bounding box are tested edge by edge
+        candidates = np.flatnonzero(
+            (grid['lon'] >= outer[:, 0].min()) & (grid['lon'] <= outer[:, 0].max())
+            & (grid['lat'] >= outer[:, 1].min()) & (grid['lat'] <= outer[:, 1].max())
+        )
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        inside[candidates[points_in_polygon(grid['lat'][candidates], grid['lon'][candidates], rings)]] = True
+    return _results(index, np.flatnonzero(inside)[:MAX_RESULTS])
+
+
+# The index being served. Requests take the reference once, so a reload
+# swapping in a new one never changes the data under a running query.
+_serving = {'index': None}
+
+
+def watch_dataset(path=None, interval=RELOAD_INTERVAL, cell_miles=SERVICE_CELL_MILES):
+    """
+    Reloads the index whenever the dataset file changes, or, without a path,
+    whenever the pipeline publishes a new CuisineRetailLocations2 artifact.
+    The new index is built completely before it replaces the old one, and a
+    file that fails to load keeps the old one in service.
+    """
+    while True:
+        time.sleep(interval)
+        try:
+            current = path or resolve_artifact('CuisineRetailLocations2')
+            stat = os.stat(current)
+            serving = _serving['index']
+            if current == serving['path'] and (stat.st_size, stat.st_mtime_ns) == serving['signature']:
+                continue
+            _serving['index'] = load_store_index(current, cell_miles)
+            print(f"Reloaded {current}: {_serving['index']['size']} stores")
+        except Exception as e:
+            print(f"Reload failed, still serving the previous data: {e}")
+
+
+def _float_param(params, name):
+    if name not in params:
+        raise ValueError(f"Missing parameter: {name}")
+    value = float(params[name][0])
+    if not math.isfinite(value):
+        raise ValueError(f"Invalid {name}: {params[name][0]}")
+    return value
+
+
+def _filters(params):
+    # ?store_type=Supermarket&cuisine_type=Mexican,Tex-Mex
+    return {col: [v for value in params[col.lower()] for v in value.split(',')]
+            for col in FILTER_COLUMNS if col.lower() in params}
+
+
+class StoreRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET  /nearest?lat=&lon=[&k=5]               nearest stores
+    GET  /radius?lat=&lon=&miles=               stores within a distance
+    POST /polygon  {"geometry": {...}}          stores inside a GeoJSON (Multi)Polygon
+    GET  /health                                dataset loaded and its size
+    All queries take store_type, cuisine_type, category and zip_code filters
+    (comma-separated values), as query parameters or, for /polygon, a
+    "filters" object in the body.
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        index = _serving['index']
+        try:
+            if url.path == '/nearest':
+                k = int(params.get('k', ['5'])[0])
+                body = nearest_stores(index, _float_param(params, 'lat'), _float_param(params, 'lon'),
+                                      max(1, min(k, MAX_RESULTS)), _filters(params))
+            elif url.path == '/radius':
+                body = stores_within(index, _float_param(params, 'lat'), _float_param(params, 'lon'),
+                                     _float_param(params, 'miles'), _filters(params))
+            elif url.path == '/health':
+                body = {'path': index['path'], 'stores': index['size'],
+                        'loaded_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(index['loaded_at']))}
+            else:
+                return self._send(404, {'error': f"Unknown path: {url.path}"})
+        except ValueError as e:
+            return self._send(400, {'error': str(e)})
+        self._send(200, body)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/polygon':
+            return self._send(404, {'error': f"Unknown path: {url.path}"})
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            filters = {col.upper(): values if isinstance(values, list) else [values]
+                       for col, values in request.get('filters', {}).items()}
+            body = stores_in_polygon(_serving['index'], request.get('geometry', {}), filters)
+        except (ValueError, KeyError, TypeError, IndexError) as e:
+            return self._send(400, {'error': str(e)})
+        self._send(200, body)
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # One line per request would dominate the time of fast queries
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local JSON service for nearest, radius and polygon store queries")
+    parser.add_argument('--stores', help="Retail locations file "
+                                         "(default: the CuisineRetailLocations2 artifact)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8750)
+    parser.add_argument('--reload-interval', type=float, default=RELOAD_INTERVAL,
+                        help="Seconds between checks for a new version of the dataset")
+    args = parser.parse_args()
+
+    path = args.stores or resolve_artifact('CuisineRetailLocations2')
+    start = time.perf_counter()
+    _serving['index'] = load_store_index(path)
+    print(f"Loaded {_serving['index']['size']} stores from {path} in {time.perf_counter() - start:.1f}s")
+
+    threading.Thread(target=watch_dataset, args=(args.stores, args.reload_interval), daemon=True).start()
+    server = ThreadingHTTPServer((args.host, args.port), StoreRequestHandler)
+    print(f"Serving on http://{args.host}:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,391 @@
+import argparse
+import csv
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from artifacts import read_table, write_table
+from permit_ingest import DALLAS_COUNTY_CODE
+from retail_merge import NAICS_TO_STORE_TYPE
+
+# Row counts the benchmarks run at
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000, '5m': 5_000_000}
+
+SYNTHETIC_DIR = "../local-data/synthetic"
+
+# Real store names, streets, cities, ZIP codes and store types are sampled from
+# the Dallas extract, so name matching and keyword classification see realistic text
+SEED_FILE = "../local-data/foodRetailLocations.csv"
+
+# (county code, county name, city, latitude, longitude, first ZIP, share of stores)
+# for a statewide spread; county codes are the Comptroller's alphabetical numbers
+TEXAS_METROS = [
+    (101, 'HARRIS', 'HOUSTON', 29.76, -95.37, 77002, 0.26),
+    (57, 'DALLAS', 'DALLAS', 32.78, -96.80, 75201, 0.15),
+    (220, 'TARRANT', 'FORT WORTH', 32.75, -97.33, 76102, 0.10),
+    (15, 'BEXAR', 'SAN ANTONIO', 29.42, -98.49, 78201, 0.10),
+    (227, 'TRAVIS', 'AUSTIN', 30.27, -97.74, 78701, 0.08),
+    (71, 'EL PASO', 'EL PASO', 31.76, -106.49, 79901, 0.05),
+    (43, 'COLLIN', 'PLANO', 33.02, -96.70, 75023, 0.05),
+    (108, 'HIDALGO', 'MCALLEN', 26.20, -98.23, 78501, 0.06),
+    (61, 'DENTON', 'DENTON', 33.21, -97.13, 76201, 0.05),
+    (79, 'FORT BEND', 'SUGAR LAND', 29.62, -95.63, 77478, 0.05),
+    (152, 'LUBBOCK', 'LUBBOCK', 33.58, -101.85, 79401, 0.05),
+]
+
+# Column order of the published files the pipeline reads
+PERMIT_FILE_COLUMNS = [
+    'Taxpayer Number', 'Taxpayer Name', 'Taxpayer Address', 'Taxpayer City', 'Taxpayer State',
+    'Taxpayer Zip Code', 'Taxpayer County Code', 'Taxpayer Organization Type', 'Outlet Number',
+    'Outlet Name', 'Outlet Address', 'Outlet City', 'Outlet State', 'Outlet Zip Code',
+    'Outlet County Code', 'Outlet NAICS Code', 'Outlet Inside/Outside City Limits Indicator',
+    'Outlet Permit Issue Date', 'Outlet First Sales Date'
+]
+SNAP_FILE_COLUMNS = [
+    'X', 'Y', 'ObjectId', 'Record_ID', 'Store_Name', 'Store_Street_Address', 'Additonal_Address',
+    'City', 'State', 'Zip_Code', 'Zip4', 'County', 'Store_Type', 'Latitude', 'Longitude',
+    'Incentive_Program', 'Grantee_Name'
+]
+
+# Shares of the generated rows
+FOOD_PERMIT_SHARE = 0.4        # permits that are food retail (NAICS 445*); the rest are filler
+NON_SNAP_SHARE = 0.3           # food permits of stores not in the SNAP file
+ADDRESS_VARIANT_SHARE = 0.2    # tax addresses spelled differently from SNAP's (normalization undoes it)
+HOUSE_NUMBER_SHIFT_SHARE = 0.1  # tax addresses a few numbers off SNAP's (left to linkage and dedup)
+GEOCODE_MATCH_SHARE = 0.85     # geocoder responses that are matches (the rest ties or no match)
+COMMERCIAL_SHARE = 0.3         # appraisal accounts that are commercial
+
+FILLER_NAICS = ['722511', '722513', '448140', '453998', '811111', '541110', '812112', '452319']
+STREET_SUFFIXES = {'ST': 'STREET', 'RD': 'ROAD', 'AVE': 'AVENUE', 'BLVD': 'BOULEVARD',
+                   'DR': 'DRIVE', 'LN': 'LANE', 'PKWY': 'PARKWAY', 'HWY': 'HIGHWAY'}
+
+# Web mercator sphere radius in meters, for the SNAP X/Y columns
+_MERCATOR_RADIUS = 6378137.0
+
+
+def _seed(seed_file=SEED_FILE):
+    stores = read_table(seed_file)
+    streets = stores['STORE_STREET_ADDRESS'].astype(str).str.replace(r'^\d+\s+', '', regex=True)
+    return {
+        'names': stores['STORE_NAME'].dropna().astype(str).to_numpy(),
+        'streets': streets[streets.str.len() > 0].to_numpy(),
+        'cities': stores['CITY'].dropna().astype(str).to_numpy(),
+        'zips': pd.to_numeric(stores['ZIP_CODE'], errors='coerce').dropna().astype(int).to_numpy(),
+        'store_types': stores['STORE_TYPE'].dropna().astype(str).to_numpy(),
+        'lat': pd.to_numeric(stores['LATITUDE'], errors='coerce').dropna().to_numpy(),
+        'lon': pd.to_numeric(stores['LONGITUDE'], errors='coerce').dropna().to_numpy(),
+    }
+
+
+def _join(*parts):
+    # Element-wise concatenation of arrays and scalars as strings
+    result = None
+    for part in parts:
+        part = part if np.isscalar(part) else pd.Series(np.asarray(part)).astype(str)
+        result = part if result is None else result + part
+    return np.asarray(result, dtype=object)
+
+
+def synthetic_stores(n, rng, seed, geography='dallas'):
+    """
+    n synthetic food stores: STORE_NAME, STREET_NUM, STREET, STORE_STREET_ADDRESS,
+    CITY, STATE, ZIP_CODE, COUNTY_CODE, COUNTY, STORE_TYPE, NAICS, LATITUDE, LONGITUDE.
+    geography 'dallas' puts every store in Dallas County, around the seed
+    stores, so every Dallas-only stage works on all n; 'statewide' spreads
+    them over the TEXAS_METROS.
+    """
+    names = rng.choice(seed['names'], n)
+    # Chains get a store number, so the same name appears at many addresses
+    numbered = (rng.random(n) < 0.3) & ~pd.Series(names).str.contains(r'\d').to_numpy()
+    names = np.where(numbered, _join(names, ' #', rng.integers(1, 9999, n)), names)
+
+    street_num = rng.integers(100, 20000, n)
+    street = rng.choice(seed['streets'], n)
+    stores = pd.DataFrame({
+        'STORE_NAME': names,
+        'STREET_NUM': street_num,
+        'STREET': street,
+        'STORE_STREET_ADDRESS': _join(street_num, ' ', street),
+        'STATE': 'TX',
+        'STORE_TYPE': rng.choice(seed['store_types'], n),
+    })
+
+    if geography == 'dallas':
+        anchor = rng.integers(0, len(seed['lat']), n)
+        stores['CITY'] = rng.choice(seed['cities'], n)
+        stores['ZIP_CODE'] = rng.choice(seed['zips'], n)
+        stores['COUNTY_CODE'] = DALLAS_COUNTY_CODE
+        stores['COUNTY'] = 'DALLAS'
+        stores['LATITUDE'] = seed['lat'][anchor] + rng.normal(0, 0.01, n)
+        stores['LONGITUDE'] = seed['lon'][anchor] + rng.normal(0, 0.01, n)
+    elif geography == 'statewide':
+        shares = np.array([metro[6] for metro in TEXAS_METROS])
+        metro = rng.choice(len(TEXAS_METROS), n, p=shares / shares.sum())
+        column = lambda i: np.array([m[i] for m in TEXAS_METROS])[metro]
+        stores['CITY'] = column(2)
+        stores['ZIP_CODE'] = column(5) + rng.integers(0, 60, n)
+        stores['COUNTY_CODE'] = column(0)
+        stores['COUNTY'] = column(1)
+        stores['LATITUDE'] = column(3) + rng.normal(0, 0.12, n)
+        stores['LONGITUDE'] = column(4) + rng.normal(0, 0.12, n)
+    else:
+        raise ValueError(f"Unknown geography: {geography}")
+
+    naics_by_type = {store_type: str(code) for code, store_type in NAICS_TO_STORE_TYPE.items()}
+    stores['NAICS'] = stores['STORE_TYPE'].map(naics_by_type).fillna('445299')
+    stores['LATITUDE'] = stores['LATITUDE'].round(6)
+    stores['LONGITUDE'] = stores['LONGITUDE'].round(6)
+    return stores
+
+
+def _spelling_variants(street, rng, share):
+    # Spells out the street suffix ('MAIN ST' -> 'MAIN STREET') on a share of the rows
+    street = pd.Series(street, dtype=object)
+    suffix = street.str.extract(r'\s(\w+)$', expand=False).map(STREET_SUFFIXES)
+    change = (rng.random(len(street)) < share) & suffix.notna().to_numpy()
+    street[change] = street[change].str.replace(r'\s\w+$', '', regex=True) + ' ' + suffix[change]
+    return street.to_numpy()
+
+
+def snap_file(stores, rng):
+    """
+    SNAP retailer file rows (SNAP_FILE_COLUMNS) for the stores.
+    """
+    n = len(stores)
+    lat, lon = stores['LATITUDE'].to_numpy(), stores['LONGITUDE'].to_numpy()
+    return pd.DataFrame({
+        'X': np.radians(lon) * _MERCATOR_RADIUS,
+        'Y': np.log(np.tan(np.pi / 4 + np.radians(lat) / 2)) * _MERCATOR_RADIUS,
+        'ObjectId': np.arange(1, n + 1),
+        'Record_ID': 1_000_000 + rng.permutation(n),
+        'Store_Name': stores['STORE_NAME'].to_numpy(),
+        'Store_Street_Address': stores['STORE_STREET_ADDRESS'].to_numpy(),
+        'Additonal_Address': np.where(rng.random(n) < 0.1, _join('STE ', rng.integers(100, 999, n)), ''),
+        'City': stores['CITY'].to_numpy(),
+        'State': 'TX',
+        'Zip_Code': stores['ZIP_CODE'].to_numpy(),
+        'Zip4': rng.integers(1000, 9999, n),
+        'County': stores['COUNTY'].to_numpy(),
+        'Store_Type': stores['STORE_TYPE'].to_numpy(),
+        'Latitude': lat,
+        'Longitude': lon,
+        'Incentive_Program': '',
+        'Grantee_Name': '',
+    }, columns=SNAP_FILE_COLUMNS)
+
+
+def permit_file(stores, other_stores, n, rng):
+    """
+    n rows of the Active Sales Tax Permit Holders file. A FOOD_PERMIT_SHARE of
+    them are food stores: mostly SNAP stores, with some addresses spelled
+    differently or a few house numbers off, and a NON_SNAP_SHARE from
+    other_stores. The rest are non-food outlets at the same kind of addresses.
+    """
+    n_food = min(len(stores), int(n * FOOD_PERMIT_SHARE))
+    n_other = min(len(other_stores), int(n_food * NON_SNAP_SHARE))
+    food = pd.concat([stores.sample(n_food - n_other, random_state=rng.integers(2 ** 31)),
+                      other_stores.sample(n_other, random_state=rng.integers(2 ** 31))], ignore_index=True)
+    filler = stores.sample(n - n_food, replace=True, random_state=rng.integers(2 ** 31))
+    outlets = pd.concat([food, filler], ignore_index=True)
+    naics = np.concatenate([food['NAICS'].to_numpy(), rng.choice(FILLER_NAICS, n - n_food)])
+    names = np.concatenate([food['STORE_NAME'].to_numpy(),
+                            _join(rng.choice(['ACME', 'LONE STAR', 'METRO', 'PRIME', 'TEXAS'], n - n_food),
+                                  ' ', rng.choice(['SERVICES', 'AUTO', 'DESIGN', 'SUPPLY', 'SALON'], n - n_food),
+                                  ' LLC')])
+    street_num = outlets['STREET_NUM'].to_numpy() + np.where(rng.random(n) < HOUSE_NUMBER_SHIFT_SHARE, 2, 0)
+    address = _join(street_num, ' ', _spelling_variants(outlets['STREET'].to_numpy(), rng, ADDRESS_VARIANT_SHARE))
+
+    order = rng.permutation(n)
+    taxpayer = rng.integers(10_000_000_000, 39_999_999_999, n)
+    issued = pd.Timestamp('2000-01-01') + pd.to_timedelta(rng.integers(0, 9000, n), unit='D')
+    permits = pd.DataFrame({
+        'Taxpayer Number': taxpayer,
+        'Taxpayer Name': names,
+        'Taxpayer Address': address,
+        'Taxpayer City': outlets['CITY'].to_numpy(),
+        'Taxpayer State': 'TX',
+        'Taxpayer Zip Code': outlets['ZIP_CODE'].to_numpy(),
+        'Taxpayer County Code': outlets['COUNTY_CODE'].to_numpy(),
+        'Taxpayer Organization Type': rng.choice(['CL', 'IS', 'CT', 'PB'], n),
+        'Outlet Number': rng.integers(1, 40, n),
+        'Outlet Name': names,
+        'Outlet Address': address,
+        'Outlet City': outlets['CITY'].to_numpy(),
+        'Outlet State': 'TX',
+        'Outlet Zip Code': outlets['ZIP_CODE'].to_numpy(),
+        'Outlet County Code': outlets['COUNTY_CODE'].to_numpy(),
+        'Outlet NAICS Code': naics,
+        'Outlet Inside/Outside City Limits Indicator': rng.choice(['Y', 'N'], n, p=[0.8, 0.2]),
+        'Outlet Permit Issue Date': issued.strftime('%m/%d/%Y'),
+        'Outlet First Sales Date': issued.strftime('%m/%d/%Y'),
+    }, columns=PERMIT_FILE_COLUMNS)
+    permits = permits.iloc[order].reset_index(drop=True)
+    permits['LATITUDE'] = outlets['LATITUDE'].to_numpy()[order]
+    permits['LONGITUDE'] = outlets['LONGITUDE'].to_numpy()[order]
+    return permits
+
+
+def geocoder_response(permits, rng):
+    """
+    Census addressbatch response lines (bytes, no header) for the permits,
+    in the order the service returns them: matches with coordinates and a
+    TIGER line, ties and no matches with only ID, address and status.
+    """
+    n = len(permits)
+    input_address = _join(permits['Outlet Address'].to_numpy(), ', ', permits['Outlet City'].to_numpy(),
+                          ', TX, ', permits['Outlet Zip Code'].to_numpy())
+    status = rng.choice(['Match', 'Tie', 'No_Match'], n,
+                        p=[GEOCODE_MATCH_SHARE, (1 - GEOCODE_MATCH_SHARE) / 3, 2 * (1 - GEOCODE_MATCH_SHARE) / 3])
+    lon = (permits['LONGITUDE'] + rng.normal(0, 0.0002, n)).round(6).astype(str).to_numpy()
+    lat = (permits['LATITUDE'] + rng.normal(0, 0.0002, n)).round(6).astype(str).to_numpy()
+    head = _join('"', np.arange(n), '","', input_address, '","', status, '"')
+    match = _join(head, ',"', rng.choice(['Exact', 'Non_Exact'], n, p=[0.8, 0.2]), '","',
+                  pd.Series(input_address).str.upper().to_numpy(), '","', lon, ',', lat, '","',
+                  rng.integers(10_000_000, 700_000_000, n), '","', rng.choice(['L', 'R'], n), '"')
+    lines = np.where(status == 'Match', match, head)
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def final_geocoded_output(permits, rng):
+    """
+    The geocoded food permits as sales_tax.py writes them (uppercased permit
+    columns, ID, Latitude, Longitude, Match_Status, Match_Type).
+    """
+    food = permits[permits['Outlet NAICS Code'].str.startswith('445')].reset_index(drop=True)
+    n = len(food)
+    matched = rng.random(n) < GEOCODE_MATCH_SHARE
+    output = food[PERMIT_FILE_COLUMNS].copy()
+    output.columns = output.columns.str.upper().str.replace(' ', '_')
+    output = output.astype(str)
+    output['ID'] = np.arange(n).astype(str)
+    output['Latitude'] = np.where(matched, food['LATITUDE'], np.nan)
+    output['Longitude'] = np.where(matched, food['LONGITUDE'], np.nan)
+    output['Match_Status'] = np.where(matched, 'Match', 'No_Match')
+    output['Match_Type'] = np.where(matched, 'Exact', None)
+    return output
+
+
+def food_retail_locations(snap):
+    """
+    The stores in the merged schema (uppercased SNAP columns) that
+    classification, enrichment and map export read.
+    """
+    stores = snap.copy()
+    stores.columns = stores.columns.str.upper()
+    stores['ZIP4'] = stores['ZIP4'].astype(str)
+    return stores
+
+
+def appraisal_files(stores, n, rng):
+    """
+    Returns (ACCOUNT_INFO, COM_DETAIL) with n accounts: one commercial account
+    at each store address (up to COMMERCIAL_SHARE of n), and residential and
+    other commercial accounts elsewhere. Commercial accounts have one to three
+    COM_DETAIL rows, so addresses with several buildings occur.
+    """
+    n_store = min(len(stores), int(n * COMMERCIAL_SHARE))
+    at_store = stores.sample(n_store, random_state=rng.integers(2 ** 31))
+    elsewhere = stores.sample(n - n_store, replace=True, random_state=rng.integers(2 ** 31))
+    accounts = pd.concat([at_store, elsewhere], ignore_index=True)
+    street_num = np.concatenate([at_store['STREET_NUM'].to_numpy(), rng.integers(100, 20000, n - n_store)])
+    commercial = np.concatenate([np.ones(n_store, dtype=bool), rng.random(n - n_store) < 0.1])
+
+    account_num = pd.Series(rng.choice(10 ** 12, n, replace=False)).astype(str).str.zfill(17).to_numpy()
+    account_info = pd.DataFrame({
+        'ACCOUNT_NUM': account_num,
+        'APPRAISAL_YR': 2025,
+        'DIVISION_CD': np.where(commercial, 'COM', 'RES'),
+        'BIZ_NAME': np.where(commercial, accounts['STORE_NAME'].to_numpy(), ''),
+        'OWNER_NAME1': rng.choice(['SMITH JOHN', 'GARCIA MARIA', 'NGUYEN THANH', 'PROPERTIES LP', 'HOLDINGS LLC'], n),
+        'STREET_NUM': street_num,
+        'STREET_HALF_NUM': '',
+        'FULL_STREET_NAME': accounts['STREET'].to_numpy(),
+        'UNIT_ID': np.where(rng.random(n) < 0.1, rng.integers(100, 999, n).astype(str), ''),
+        'PROPERTY_CITY': accounts['CITY'].to_numpy(),
+        'PROPERTY_ZIPCODE': accounts['ZIP_CODE'].to_numpy(),
+    })
+
+    buildings = rng.choice([1, 2, 3], commercial.sum(), p=[0.75, 0.2, 0.05])
+    detail_accounts = np.repeat(account_num[commercial], buildings)
+    m = len(detail_accounts)
+    com_detail = pd.DataFrame({
+        'TAX_OBJ_ID': rng.choice(10 ** 9, m, replace=False),
+        'ACCOUNT_NUM': detail_accounts,
+        'APPRAISAL_YR': 2025,
+        'BLDG_CLASS_DESC': rng.choice(['RETAIL STORE', 'SUPERMARKET', 'CONVENIENCE STORE', 'STRIP CENTER'], m),
+        'YEAR_BUILT': rng.integers(1950, 2024, m),
+        'GROSS_BLDG_AREA': rng.lognormal(8.5, 0.9, m).round(),
+        'NUM_STORIES': rng.choice([1, 2], m, p=[0.9, 0.1]),
+        'NET_LEASE_AREA': rng.lognormal(8.3, 0.9, m).round(),
+    })
+    return account_info, com_detail
+
+
+def generate(n, output_dir, geography='dallas', random_seed=0, seed_file=SEED_FILE):
+    """
+    Writes a full set of synthetic pipeline inputs with n rows each to
+    output_dir/local-data, laid out like the real local-data directory so the
+    scripts can run against it unchanged:
+    Active_Sales_Tax_Permit_Holders.csv, SNAP_Retailer_Location_data.csv,
+    geocoder_response.csv, final_geocoded_output.parquet,
+    foodRetailLocations.parquet, ACCOUNT_INFO.csv and COM_DETAIL.CSV.
+    Returns {file name: rows}.
+    """
+    rng = np.random.default_rng(random_seed)
+    data_dir = os.path.join(output_dir, 'local-data')
+    os.makedirs(data_dir, exist_ok=True)
+    os.makedirs(os.path.join(output_dir, 'work'), exist_ok=True)
+
+    # The SNAP stores, then the stores only the permit file has
+    all_stores = synthetic_stores(n + int(n * FOOD_PERMIT_SHARE * NON_SNAP_SHARE), rng, _seed(seed_file), geography)
+    stores, other_stores = all_stores.iloc[:n], all_stores.iloc[n:]
+    permits = permit_file(stores, other_stores, n, rng)
+    snap = snap_file(stores, rng)
+    account_info, com_detail = appraisal_files(stores, n, rng)
+    geocoded = final_geocoded_output(permits, rng)
+
+    permits.drop(columns=['LATITUDE', 'LONGITUDE']).to_csv(
+        os.path.join(data_dir, 'Active_Sales_Tax_Permit_Holders.csv'), index=False)
+    # The SNAP download starts with a byte order mark
+    snap.to_csv(os.path.join(data_dir, 'SNAP_Retailer_Location_data.csv'), index=False, encoding='utf-8-sig')
+    with open(os.path.join(data_dir, 'geocoder_response.csv'), 'wb') as f:
+        f.write(geocoder_response(permits, rng))
+    write_table(geocoded, os.path.join(data_dir, 'final_geocoded_output.parquet'))
+    write_table(food_retail_locations(snap), os.path.join(data_dir, 'foodRetailLocations.parquet'))
+    account_info.to_csv(os.path.join(data_dir, 'ACCOUNT_INFO.csv'), index=False, quoting=csv.QUOTE_NONNUMERIC)
+    com_detail.to_csv(os.path.join(data_dir, 'COM_DETAIL.CSV'), index=False)
+
+    return {
+        'Active_Sales_Tax_Permit_Holders.csv': len(permits),
+        'SNAP_Retailer_Location_data.csv': len(snap),
+        'geocoder_response.csv': len(permits),
+        'final_geocoded_output.parquet': len(geocoded),
+        'foodRetailLocations.parquet': len(snap),
+        'ACCOUNT_INFO.csv': len(account_info),
+        'COM_DETAIL.CSV': len(com_detail),
+    }
+
+
+def scale_dir(scale, geography='dallas', base_dir=SYNTHETIC_DIR):
+    return os.path.join(base_dir, f'{geography}_{scale}')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic pipeline inputs at scale")
+    parser.add_argument('scales', nargs='+', choices=list(SCALES))
+    parser.add_argument('--geography', choices=['dallas', 'statewide'], default='dallas',
+                        help="dallas: every store in Dallas County, so Dallas-only stages see all rows; "
+                             "statewide: spread over Texas metros")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output-dir', default=SYNTHETIC_DIR)
+    args = parser.parse_args()
+
+    for scale in args.scales:
+        start = time.perf_counter()
+        output_dir = scale_dir(scale, args.geography, args.output_dir)
+        rows = generate(SCALES[scale], output_dir, args.geography, args.seed)
+        print(f"{scale} ({args.geography}) written to {output_dir} in {time.perf_counter() - start:.1f}s")
+        for file_name, count in rows.items():
+            print(f"  {file_name}: {count} rows")
@@ -0,0 +1,25 @@
+import pandas as pd
+
+from density_grid import DENSITY_GROUP_COLUMNS, cell_counts, density_pyramid, totals
+
+STORES = pd.DataFrame({
+    'LATITUDE': [32.78, 32.781, None],
+    'LONGITUDE': [-96.80, -96.801, None],
+    'STORE_TYPE': ['Supermarket', 'Convenience Store', 'Supermarket'],
+    'CATEGORY': ['Americas', None, 'Asia'],
+    'CUISINE_TYPE': ['Mexican', None, 'Chinese'],
+})
+
+
+def test_density_pyramid_sums_every_zoom():
+    pyramid = density_pyramid(STORES, zooms=(8, 14))
+    assert pyramid.groupby('ZOOM')['STORES'].sum().tolist() == [3, 3]
+    assert totals(pyramid, 'STORE_TYPE').to_dict() == {'Supermarket': 2, 'Convenience Store': 1}
+    assert cell_counts(pyramid, 14, STORE_TYPE='Supermarket')['STORES'].sum() == 2
+
+
+def test_density_pyramid_without_stores():
+    pyramid = density_pyramid(STORES.iloc[:0])
+    assert pyramid.empty
+    assert pyramid.columns.tolist() == ['ZOOM', 'CELL'] + DENSITY_GROUP_COLUMNS + ['STORES']
+    assert totals(pyramid, 'STORE_TYPE').empty
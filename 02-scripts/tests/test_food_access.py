@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+from food_access import STORE_COLUMNS, point_access
+
+POINTS = pd.DataFrame({
+    'TRACT': ['48113000100', '48113000200'],
+    'POPULATION': [100, 200],
+    'LATITUDE': [32.78, 32.90],
+    'LONGITUDE': [-96.80, -96.60],
+})
+
+
+def test_point_access_finds_nearest_supermarket():
+    supermarkets = pd.DataFrame([[7, 'Corner Market', 'Supermarket', 32.781, -96.80]], columns=STORE_COLUMNS)
+    points = point_access(POINTS, supermarkets)
+    assert points['NEAREST_STORE_RECORD_ID'].tolist() == [7, 7]
+    assert points['NEAREST_STORE_NAME'].tolist() == ['Corner Market', 'Corner Market']
+    assert points['STORES_WITHIN_1MI'].tolist() == [1, 0]
+
+
+def test_point_access_without_supermarkets():
+    supermarkets = pd.DataFrame(columns=STORE_COLUMNS)
+    points = point_access(POINTS, supermarkets)
+    assert points['NEAREST_STORE_RECORD_ID'].isna().all()
+    assert points['NEAREST_STORE_NAME'].isna().all()
+    assert np.isnan(points['NEAREST_STORE_MILES']).all()
+    assert points['STORES_WITHIN_10MI'].tolist() == [0, 0]
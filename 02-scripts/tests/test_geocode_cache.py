@@ -0,0 +1,28 @@
+import pandas as pd
+
+from geocode_cache import address_keys, lookup, open_cache, store
+
+
+def test_address_variants_share_a_key():
+    keys = address_keys(
+        pd.Series(['123 North Main Street Ste 4', '123 N. Main St #5', '123 n main st', '125 N Main St']),
+        pd.Series(['Dallas', 'DALLAS ', 'dallas', 'Dallas']),
+        pd.Series(['TX', 'TX', 'tx', 'TX']),
+        pd.Series(['75201-1234', 75201, '75201', '75201']),
+    )
+    assert keys.tolist() == ['123 N MAIN ST|DALLAS|TX|75201'] * 3 + ['125 N MAIN ST|DALLAS|TX|75201']
+
+
+def test_cached_results_are_found_by_key(tmp_path):
+    cache = open_cache(str(tmp_path / 'geocode_cache.sqlite'))
+    keys = address_keys(pd.Series(['123 North Main Street']), pd.Series(['Dallas']), pd.Series(['TX']),
+                        pd.Series(['75201']))
+    results = pd.DataFrame({'Latitude': [32.78], 'Longitude': [-96.80], 'Match_Status': ['Match'],
+                            'Match_Type': ['Exact']}, index=keys)
+    store(cache, results, 'Public_AR_Current')
+
+    variant = address_keys(pd.Series(['123 N Main St Suite 200']), pd.Series(['DALLAS']), pd.Series(['TX']),
+                           pd.Series(['75201-0001']))
+    hits = lookup(cache, variant, 'Public_AR_Current')
+    assert hits.loc[variant.iat[0], 'Latitude'] == 32.78
+    assert lookup(cache, variant, 'Public_AR_Census2020').empty
@@ -0,0 +1,50 @@
+import os
+
+import pandas as pd
+import pytest
+
+import pipeline
+from artifacts import write_artifact
+
+# Three chained stages on real scripts; the dry runs below never start them
+STAGES = {
+    'first': {'script': 'export.py', 'files': ['../local-data/source.csv'], 'inputs': [], 'outputs': ['first_out']},
+    'second': {'script': 'export.py', 'files': [], 'inputs': ['first_out'], 'outputs': ['second_out']},
+    'third': {'script': 'export.py', 'files': [], 'inputs': ['second_out'], 'outputs': ['third_out']},
+}
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    # Scripts and the pipeline state use ../local-data relative to the working directory
+    (tmp_path / 'work').mkdir()
+    (tmp_path / 'local-data').mkdir()
+    monkeypatch.chdir(tmp_path / 'work')
+    (tmp_path / 'local-data' / 'source.csv').write_text('a\n1\n')
+    for stage in STAGES.values():
+        for output in stage['outputs']:
+            write_artifact(pd.DataFrame({'a': [1]}), output)
+
+    # Record every stage as up to date with what is on disk
+    state = pipeline.load_state()
+    for name in STAGES:
+        state['stages'][name] = pipeline.fingerprint(name, [], state['files'], STAGES)
+    pipeline.save_state(state)
+    return tmp_path / 'local-data'
+
+
+def test_dry_run_skips_unchanged_stages(data_dir):
+    results = pipeline.run_pipeline(list(STAGES), {}, dry_run=True, stages=STAGES)
+    assert results == {'first': 'skipped', 'second': 'skipped', 'third': 'skipped'}
+
+
+def test_dry_run_reports_downstream_of_a_change(data_dir):
+    (data_dir / 'source.csv').write_text('a\n2\n')
+    results = pipeline.run_pipeline(list(STAGES), {}, dry_run=True, stages=STAGES)
+    assert results == {'first': 'would run', 'second': 'would run', 'third': 'would run'}
+
+
+def test_dry_run_leaves_upstream_of_a_change_skipped(data_dir):
+    os.remove(data_dir / 'third_out.parquet')
+    results = pipeline.run_pipeline(list(STAGES), {}, dry_run=True, stages=STAGES)
+    assert results == {'first': 'skipped', 'second': 'skipped', 'third': 'would run'}
@@ -0,0 +1,53 @@
+import json
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+import pipeline
+from artifacts import read_artifact
+from permit_ingest import PERMIT_COLUMNS
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# One street in Dallas County (code 57), numbered 100-198 on its even side
+TIGER = {'type': 'FeatureCollection', 'features': [{
+    'type': 'Feature',
+    'properties': {'TLID': 1, 'FULLNAME': 'Main St', 'LFROMHN': '101', 'LTOHN': '199', 'RFROMHN': '100',
+                   'RTOHN': '198', 'ZIPL': '75201', 'ZIPR': '75201', 'PARITYL': 'O', 'PARITYR': 'E'},
+    'geometry': {'type': 'LineString', 'coordinates': [[-96.80, 32.78], [-96.79, 32.78]]},
+}]}
+
+
+def permit(outlet_number, address, naics='445110', county='57'):
+    return dict(zip(PERMIT_COLUMNS, [
+        '10000000001', 'Test Grocer LLC', outlet_number, 'Test Grocer', address, 'Dallas', 'TX', '75201',
+        county, naics, '01/01/2020', '01/01/2020'
+    ]))
+
+
+def test_offline_stage_writes_every_output(tmp_path, monkeypatch):
+    (tmp_path / 'work').mkdir()
+    (tmp_path / 'local-data').mkdir()
+    monkeypatch.chdir(tmp_path / 'work')
+    permits = pd.DataFrame([
+        permit('1', '150 Main St'),
+        permit('2', '9999 Nowhere Rd'),
+        permit('3', '120 Main St', naics='722511'),
+        permit('4', '130 Main St', county='43'),
+    ])
+    permits.to_csv(tmp_path / 'local-data' / 'permits.csv', index=False)
+    (tmp_path / 'local-data' / 'addrfeat.geojson').write_text(json.dumps(TIGER))
+
+    subprocess.run(
+        [sys.executable, os.path.join(SCRIPTS_DIR, 'sales_tax.py'), '--offline',
+         '--permits', '../local-data/permits.csv', '--tiger', '../local-data/addrfeat.geojson'],
+        check=True, capture_output=True
+    )
+
+    assert pipeline.outputs_exist('sales_tax')
+    batch = read_artifact('batch_input')
+    assert batch['OUTLET_ADDRESS'].tolist() == ['150 Main St', '9999 Nowhere Rd']
+    geocoded = read_artifact('final_geocoded_output')
+    assert geocoded['Match_Status'].tolist() == ['Match', 'No_Match']
@@ -0,0 +1,294 @@
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from address_normalize import normalize_city, normalize_street, zip5
+from artifacts import DATA_DIR, write_table
+from census_geocoder import BATCH_INPUT_COLUMNS, GEOCODER_COLUMNS, match_breakdown
+from run_report import record
+
+# TIGER/Line ADDRFEAT files of the counties served, converted to GeoJSON
+TIGER_DIR = os.path.join(DATA_DIR, 'tiger')
+
+# Match_Status values the Census batch geocoder gives unmatched addresses
+UNMATCHED_STATUSES = ['No_Match', 'Tie']
+
+# Address range properties of TIGER/Line features for each side of the street:
+# ADDRFEAT files use the *HN names, EDGES files the *ADD names
+RANGE_FIELDS = {
+    'L': {'from': ['LFROMHN', 'LFROMADD'], 'to': ['LTOHN', 'LTOADD'], 'zip': ['ZIPL'], 'parity': ['PARITYL']},
+    'R': {'from': ['RFROMHN', 'RFROMADD'], 'to': ['RTOHN', 'RTOADD'], 'zip': ['ZIPR'], 'parity': ['PARITYR']},
+}
+
+# Name of the geocoder that placed each permit, in the Geocoder column
+CENSUS_GEOCODER = 'Census'
+TIGER_GEOCODER = 'TIGER'
+
+
+def tiger_files(tiger_dir=TIGER_DIR):
+    """
+    The GeoJSON address range files in tiger_dir, if any.
+    """
+    return sorted(glob.glob(os.path.join(tiger_dir, '*.geojson')))
+
+
+def _first(properties, names):
+    for name in names:
+        if properties.get(name) not in (None, ''):
+            return properties[name]
+    return None
+
+
+def _house_number(value):
+    # Hyphenated (Queens style) and lettered numbers don't interpolate; they are skipped
+    value = str(value).strip() if value is not None else ''
+    return int(value) if value.isdigit() else None
+
+
+def read_address_ranges(file_paths):
+    """
+    Reads TIGER/Line address range edges (ADDRFEAT or EDGES files converted
+    to GeoJSON, one per county) into an index for geocode_addresses.
+    Every side of an edge with a numeric house number range becomes one
+    range row (TLID, SIDE, STREET, ZIP, FROM_HN, TO_HN, PARITY, EDGE); the
+    edges' vertices are kept end to end in flat arrays.
+    """
+    rows, lon, lat, edge_start = [], [], [], []
+    for file_path in file_paths:
+        with open(file_path) as f:
+            features = json.load(f)['features']
+        for feature in features:
+            geometry = feature.get('geometry') or {}
+            if geometry.get('type') == 'LineString':
+                line = geometry['coordinates']
+            elif geometry.get('type') == 'MultiLineString':
+                line = [vertex for part in geometry['coordinates'] for vertex in part]
+            else:
+                continue
+            properties = feature.get('properties') or {}
+            if len(line) < 2 or not properties.get('FULLNAME'):
+                continue
+            edge = len(edge_start)
+            added = False
+            for side, fields in RANGE_FIELDS.items():
+                from_hn = _house_number(_first(properties, fields['from']))
+                to_hn = _house_number(_first(properties, fields['to']))
+                if from_hn is None or to_hn is None:
+                    continue
+                rows.append((properties.get('TLID'), side, properties['FULLNAME'], _first(properties, fields['zip']),
+                             from_hn, to_hn, _first(properties, fields['parity']) or '', edge))
+                added = True
+            if added:
+                edge_start.append(len(lon))
+                lon.extend(vertex[0] for vertex in line)
+                lat.extend(vertex[1] for vertex in line)
+
+    ranges = pd.DataFrame(rows, columns=['TLID', 'SIDE', 'STREET', 'ZIP', 'FROM_HN', 'TO_HN', 'PARITY', 'EDGE'])
+    ranges['STREET'] = normalize_street(ranges['STREET'])
+    ranges['ZIP'] = zip5(ranges['ZIP'].fillna(''))
+    ranges['TLID'] = pd.to_numeric(ranges['TLID'], errors='coerce').astype('Int64')
+    return build_tiger_index(ranges, np.array(lon, dtype=float), np.array(lat, dtype=float),
+                             np.array(edge_start + [len(lon)], dtype=np.int64))
+
+
+def _street_keys(street, zip_code=None):
+    key = street.astype(str) if zip_code is None else street.astype(str) + '|' + zip_code.astype(str)
+    return pd.util.hash_array(key.to_numpy(dtype=object))
+
+
+def build_tiger_index(ranges, lon, lat, edge_bounds):
+    """
+    Street-name index over address ranges: range positions sorted by a hash
+    of STREET|ZIP and, for addresses whose ZIP finds nothing, of STREET
+    alone. Edge lengths are measured once, as running totals along the
+    flat vertex arrays (edge_bounds[i]:edge_bounds[i + 1] are edge i's
+    vertices), so interpolating a house number is a binary search.
+    """
+    # Planar distances with longitude degrees scaled to the latitude; edges are short
+    scale = np.cos(np.radians(np.nanmean(lat))) if len(lat) else 1.0
+    steps = np.hypot(np.diff(lon) * scale, np.diff(lat))
+    # Steps from one edge's last vertex to the next edge's first don't count
+    steps[edge_bounds[1:-1] - 1] = 0
+    distance = np.concatenate([[0.0], np.cumsum(steps)])
+
+    zip_keys = _street_keys(ranges['STREET'], ranges['ZIP'])
+    street_keys = _street_keys(ranges['STREET'])
+    zip_order = np.argsort(zip_keys, kind='stable')
+    street_order = np.argsort(street_keys, kind='stable')
+    return {
+        'ranges': ranges,
+        'zip_keys': zip_keys[zip_order],
+        'zip_order': zip_order,
+        'street_keys': street_keys[street_order],
+        'street_order': street_order,
+        'lon': lon,
+        'lat': lat,
+        'distance': distance,
+        'edge_bounds': edge_bounds,
+    }
+
+
+def _candidates(keys, order, wanted):
+    # (address position, range position) for every range whose key matches the address's
+    starts = np.searchsorted(keys, wanted, side='left')
+    counts = np.searchsorted(keys, wanted, side='right') - starts
+    addresses = np.repeat(np.arange(len(wanted)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return addresses, order[np.repeat(starts, counts) + offsets]
+
+
+def _in_range(index, addresses, candidates, house_numbers):
+    # Keeps the candidates whose range, on the side's odd or even numbers, holds the house number
+    ranges = index['ranges']
+    from_hn = ranges['FROM_HN'].to_numpy()[candidates]
+    to_hn = ranges['TO_HN'].to_numpy()[candidates]
+    parity = ranges['PARITY'].to_numpy(dtype=object)[candidates]
+    number = house_numbers[addresses]
+    keep = (number >= np.minimum(from_hn, to_hn)) & (number <= np.maximum(from_hn, to_hn))
+    keep &= (parity == 'B') | (number % 2 == from_hn % 2)
+    return addresses[keep], candidates[keep]
+
+
+def _interpolate(index, candidates, house_numbers):
+    # Position along the edge in proportion to where the number falls in its range
+    ranges = index['ranges']
+    from_hn = ranges['FROM_HN'].to_numpy()[candidates].astype(float)
+    to_hn = ranges['TO_HN'].to_numpy()[candidates].astype(float)
+    span = to_hn - from_hn
+    share = np.where(span != 0, (house_numbers - from_hn) / np.where(span != 0, span, 1), 0.5)
+
+    edges = ranges['EDGE'].to_numpy()[candidates]
+    first, last = index['edge_bounds'][edges], index['edge_bounds'][edges + 1] - 1
+    distance = index['distance']
+    target = distance[first] + share * (distance[last] - distance[first])
+    vertex = np.clip(np.searchsorted(distance, target, side='right') - 1, first, last - 1)
+    step = distance[vertex + 1] - distance[vertex]
+    along = np.where(step > 0, (target - distance[vertex]) / np.where(step > 0, step, 1), 0)
+    lon = index['lon'][vertex] + along * (index['lon'][vertex + 1] - index['lon'][vertex])
+    lat = index['lat'][vertex] + along * (index['lat'][vertex + 1] - index['lat'][vertex])
+    return lon, lat
+
+
+def geocode_addresses(index, ids, address, city, state, zip_code):
+    """
+    Geocodes addresses against the TIGER index with no network: the house
+    number is looked up among the ranges of the street in the address's ZIP
+    (Match_Type 'Exact') or, failing that, of the street anywhere in the
+    index ('Non_Exact'), and placed along the range's edge in proportion to
+    where it falls in the range. Numbers in ranges of several edges are a
+    'Tie' and get no coordinates, as from the Census geocoder.
+    Returns a DataFrame like parse_geocoder_response's: GEOCODER_COLUMNS
+    plus numeric Longitude and Latitude.
+    """
+    ids, address, city, state, zip_code = (pd.Series(col).reset_index(drop=True).astype(object)
+                                           for col in (ids, address, city, state, zip_code))
+    if len(ids) == 0:
+        return pd.DataFrame(columns=GEOCODER_COLUMNS, dtype=str).assign(Longitude=np.nan, Latitude=np.nan)
+    street_address = normalize_street(address)
+    parts = street_address.str.extract(r'^(\d+)\s+(.+)$')
+    house_numbers = pd.to_numeric(parts[0], errors='coerce').fillna(-1).astype(np.int64).to_numpy()
+    street = parts[1].fillna('')
+    zips = zip5(zip_code.fillna(''))
+
+    matched = np.full(len(ids), -1, dtype=np.int64)
+    match_type = np.full(len(ids), None, dtype=object)
+    tie = np.zeros(len(ids), dtype=bool)
+    searches = [('zip_keys', 'zip_order', _street_keys(street, zips), 'Exact'),
+                ('street_keys', 'street_order', _street_keys(street), 'Non_Exact')]
+    for keys, order, wanted, kind in searches:
+        pending = np.flatnonzero((matched < 0) & ~tie & (house_numbers >= 0))
+        addresses, candidates = _candidates(index[keys], index[order], wanted[pending])
+        addresses, candidates = _in_range(index, addresses, candidates, house_numbers[pending])
+        # A number can fall in the ranges of one edge only; more is a tie
+        edges = index['ranges']['EDGE'].to_numpy()[candidates]
+        pairs = pd.DataFrame({'address': addresses, 'edge': edges}).drop_duplicates()
+        distinct = pairs.drop_duplicates('address', keep=False)
+        found = pd.Series(candidates).groupby(addresses).first()
+        unique = found.index.isin(distinct['address'])
+        matched[pending[found.index[unique]]] = found.to_numpy()[unique]
+        match_type[pending[found.index[unique]]] = kind
+        tie[pending[found.index[~unique]]] = True
+
+    ranges = index['ranges']
+    hits = np.flatnonzero(matched >= 0)
+    lon, lat = np.full(len(ids), np.nan), np.full(len(ids), np.nan)
+    lon[hits], lat[hits] = _interpolate(index, matched[hits], house_numbers[hits])
+
+    def column(name, missing=None):
+        values = np.full(len(ids), missing, dtype=object)
+        values[hits] = ranges[name].to_numpy(dtype=object)[matched[hits]]
+        return pd.Series(values, dtype=object)
+
+    # The range's ZIP, or the input's when the range has none
+    matched_zip = column('ZIP', '').astype(str).where(lambda zips_found: zips_found != '', zips)
+    matched_address = (pd.Series(house_numbers).astype(str) + ' ' + column('STREET', '').astype(str) + ', '
+                       + normalize_city(city) + ', ' + normalize_city(state) + ', ' + matched_zip)
+    coordinates = (pd.Series(lon).round(6).astype(str) + ',' + pd.Series(lat).round(6).astype(str))
+    result = pd.DataFrame({
+        'ID': ids.astype(str),
+        'Input_Address': address.fillna('').astype(str) + ', ' + city.fillna('').astype(str) + ', '
+                         + state.fillna('').astype(str) + ', ' + zip_code.fillna('').astype(str),
+        'Match_Status': np.where(matched >= 0, 'Match', np.where(tie, 'Tie', 'No_Match')),
+        'Match_Type': match_type,
+        'Matched_Address': matched_address.where(matched >= 0),
+        'Coordinates': coordinates.where(matched >= 0),
+        'TIGER_Line_ID': pd.Series(column('TLID')).astype('Int64').astype('string'),
+        'Side': column('SIDE'),
+    })
+    result['Longitude'] = lon
+    result['Latitude'] = lat
+    return result[GEOCODER_COLUMNS + ['Longitude', 'Latitude']]
+
+
+def fill_unmatched(permits, index):
+    """
+    Geocodes the permits the Census geocoder left unmatched (No_Match, Tie
+    or never sent) against the TIGER index and fills in their Latitude,
+    Longitude, Match_Status and Match_Type. The Geocoder column records
+    which geocoder placed each permit.
+    """
+    permits = permits.copy()
+    permits['Geocoder'] = np.where(permits['Match_Status'] == 'Match', CENSUS_GEOCODER, None)
+    unmatched = np.flatnonzero(permits['Match_Status'].isna() | permits['Match_Status'].isin(UNMATCHED_STATUSES))
+    if len(unmatched) == 0:
+        return permits
+
+    local = geocode_addresses(
+        index, permits['ID'].iloc[unmatched], permits['OUTLET_ADDRESS'].iloc[unmatched],
+        permits['OUTLET_CITY'].iloc[unmatched], permits['OUTLET_STATE'].iloc[unmatched],
+        permits['OUTLET_ZIP_CODE'].iloc[unmatched]
+    )
+    record('geocoding', {'tiger_fallback': match_breakdown(local)})
+    found = (local['Match_Status'] == 'Match').to_numpy()
+    rows = permits.index[unmatched[found]]
+    for col in ['Latitude', 'Longitude', 'Match_Status', 'Match_Type']:
+        permits.loc[rows, col] = local.loc[found, col].to_numpy()
+    permits.loc[rows, 'Geocoder'] = TIGER_GEOCODER
+    return permits
+
+
+def geocode_offline(permits, index, batch_file=None, results_file=None):
+    """
+    Geocodes every permit outlet against the TIGER index alone, without the
+    cache or the Census geocoder. batch_file and results_file, when given,
+    receive the addresses geocoded (in the Census batch input columns) and
+    the results in the columns of the Census geocoder's parsed response.
+    Returns permits with Latitude, Longitude, Match_Status, Match_Type and Geocoder.
+    """
+    if batch_file is not None:
+        batch_df = permits[BATCH_INPUT_COLUMNS].copy()
+        batch_df['OUTLET_ZIP_CODE'] = batch_df['OUTLET_ZIP_CODE'].astype(str)
+        write_table(batch_df, batch_file)
+    local = geocode_addresses(index, permits['ID'], permits['OUTLET_ADDRESS'], permits['OUTLET_CITY'],
+                              permits['OUTLET_STATE'], permits['OUTLET_ZIP_CODE'])
+    record('geocoding', {'permits': match_breakdown(local)})
+    if results_file is not None:
+        write_table(local, results_file)
+    permits = permits.copy()
+    for col in ['Latitude', 'Longitude', 'Match_Status', 'Match_Type']:
+        permits[col] = local[col].to_numpy()
+    permits['Geocoder'] = np.where(local['Match_Status'] == 'Match', TIGER_GEOCODER, None)
+    return permits